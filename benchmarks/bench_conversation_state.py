@@ -0,0 +1,76 @@
+# benchmarks/bench_conversation_state.py
+# Mémoire par conversation active : ancien état {"node": TreeNode, "path": [...]} vs numéro de nœud
+# + rechargement au démarrage : chemins rejoués pas à pas vs identifiants de nœuds
+# Lancement : python -m benchmarks.bench_conversation_state [nb_utilisateurs]
+
+import sys
+import time
+import tracemalloc
+
+from structures.hashtable import HashTable
+from features.conversation_manager import ConversationManager, TreeNode
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return table, after - before
+
+
+def main(n=100_000):
+    back = TreeNode(question="Back : plutôt Python ou Node ? (python / node)")
+
+    def legacy():
+        # ce que stockait l'ancienne version pour un utilisateur au 2e niveau
+        table = HashTable()
+        for uid in range(n):
+            table.set(uid, {"node": back, "path": ["web", "back"]})
+        return table
+
+    def compiled():
+        cm2 = ConversationManager()
+        for uid in range(n):
+            cm2.start_conversation(uid)
+            cm2.handle_user_message(uid, "web")
+            cm2.handle_user_message(uid, "back")
+        # le suivi "sale" (sauvegarde delta) n'est pas de l'état de conversation
+        cm2._dirty = HashTable()
+        return cm2
+
+    _, old = measure(legacy)
+    cm2, new = measure(compiled)
+    print(f"{n} conversations actives")
+    print(f"  dict + TreeNode + path : {old / n:6.1f} o/utilisateur")
+    print(f"  numéro de nœud         : {new / n:6.1f} o/utilisateur")
+
+    start = time.perf_counter()
+    for uid in range(n):
+        cm2.start_conversation(uid)
+        cm2.handle_user_message(uid, "Backend" if uid % 2 else "front")
+    elapsed = time.perf_counter() - start
+    print(f"  réduction : {1 - new / old:.0%}")
+    print(f"  {elapsed / (2 * n) * 1e6:.2f} µs/message")
+
+    # rechargement : ancien format (chemin rejoué depuis la racine) vs identifiant stable
+    paths = [["python", "non", "django"], ["web", "back", "node"], ["musique", "instrument"]]
+    tree = cm2._tree
+    legacy_saved = {str(uid): {"path": paths[uid % 3]} for uid in range(n)}
+    saved = {str(uid): {"node": tree.names[tree.follow(paths[uid % 3])]} for uid in range(n)}
+    start = time.perf_counter()
+    for st in legacy_saved.values():
+        tree.follow(st["path"])
+    replay = time.perf_counter() - start
+    for label, data in (("chemins (index)", legacy_saved), ("identifiants", saved)):
+        cm3 = ConversationManager()
+        start = time.perf_counter()
+        cm3.load_from_data(data)
+        elapsed = time.perf_counter() - start
+        print(f"  chargement {label:16s}: {elapsed / n * 1e6:.2f} µs/utilisateur")
+    print(f"  (rejeu pas à pas      : {replay / n * 1e6:.2f} µs/utilisateur, sans l'insertion)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
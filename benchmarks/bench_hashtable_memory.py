@@ -0,0 +1,36 @@
+# benchmarks/bench_hashtable_memory.py
+# Compare la mémoire par entrée : HashTable (chaînage) vs OpenHashTable (adressage ouvert)
+# Lancement : python -m benchmarks.bench_hashtable_memory [nb_entrees]
+
+import sys
+import tracemalloc
+
+from structures.hashtable import HashTable
+from structures.open_hashtable import OpenHashTable
+
+
+def measure(table_cls, keys, value):
+    """Octets alloués par la table seule (clés et valeur créées avant la mesure)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = table_cls()
+    for k in keys:
+        table.set(k, value)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(table) == len(keys)
+    return after - before
+
+
+def main(n=200_000):
+    # faux ID Discord (snowflakes) créés avant la mesure
+    keys = [175928847299117063 + i * 4194304 for i in range(n)]
+    value = object()
+    print(f"{n} entrées")
+    for cls in (HashTable, OpenHashTable):
+        total = measure(cls, keys, value)
+        print(f"  {cls.__name__:<14} {total / 1024 / 1024:8.1f} Mo  {total / n:6.1f} o/entrée")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,37 @@
+# benchmarks/bench_linked_list_memory.py
+# Compare la mémoire par commande : LinkedList (un Node par commande) vs UnrolledLinkedList
+# Lancement : python -m benchmarks.bench_linked_list_memory [nb_commandes]
+
+import sys
+import tracemalloc
+
+from structures.linked_list import LinkedList, UnrolledLinkedList
+
+
+def measure(list_cls, values):
+    """Octets alloués par la liste seule (valeurs créées avant la mesure)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    lst = list_cls()
+    for v in values:
+        lst.append(v)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(lst) == len(values)
+    return after - before
+
+
+def main(n=100_000):
+    values = [f"!cmd {i}" for i in range(n)]
+    print(f"{n} commandes")
+    results = {}
+    for cls in (LinkedList, UnrolledLinkedList):
+        total = measure(cls, values)
+        results[cls] = total
+        print(f"  {cls.__name__:<19} {total / n:6.1f} o/commande")
+    gain = 1 - results[UnrolledLinkedList] / results[LinkedList]
+    print(f"  réduction : {gain:.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -5,6 +5,46 @@ import discord
 # Préfixe des commandes (par exemple: !helpme, !reset)
 COMMAND_PREFIX = "!"
 
+# Rétention de l'historique par utilisateur (None = illimité)
+# ⚠️ Activer une limite tronque les historiques existants dès le chargement suivant
+# (seules les N dernières commandes / les plus récentes que X secondes sont gardées).
+HISTORY_MAX_ENTRIES = None      # garder les N dernières commandes, ex: 1000
+HISTORY_MAX_AGE = None          # en secondes, ex: 30 * 24 * 3600 pour 30 jours
+
+# Stockage de l'historique : "memory" (RAM + journal + snapshots) ou "sqlite" (base sur disque)
+HISTORY_BACKEND = "memory"
+HISTORY_DB_PATH = "data/history.sqlite3"
+
+# Sauvegarde automatique : toutes les N secondes, ou après N modifications
+AUTOSAVE_INTERVAL = 60
+AUTOSAVE_EVERY = 200
+
+# Durée du bail du lock d'historique (secondes) : passé ce délai sans `!lockhistory`
+# de renouvellement, le lock passe au suivant de la file (None = jamais)
+LOCK_LEASE = 300
+# Attente maximale (secondes) d'une commande quand l'historique est verrouillé
+LOCK_WAIT_TIMEOUT = 30
+
+# Conversations en mémoire : au-delà de N sessions ou de X secondes d'inactivité,
+# la session la moins récemment utilisée repart sur disque (reprise au message suivant).
+# None / None = tout garder en mémoire
+CONVERSATION_MAX_SESSIONS = 50000
+CONVERSATION_SESSION_TTL = 24 * 3600
+
+# File d'ingestion des commandes (listener -> historique, écrite par lots en tâche de fond) :
+# au-delà de INGEST_QUEUE_SIZE commandes en attente, une nouvelle attend au plus
+# INGEST_PUT_TIMEOUT secondes qu'une place se libère, puis est perdue (comptée)
+INGEST_QUEUE_SIZE = 10000
+INGEST_BATCH_SIZE = 256
+INGEST_PUT_TIMEOUT = 2
+
+# !export : au-delà de N octets de texte, le fichier envoyé est compressé (.txt.gz)
+# (en octets plutôt qu'en commandes : atteignable même avec HISTORY_MAX_ENTRIES)
+EXPORT_GZIP_MIN_BYTES = 16 * 1024
+
+# Nombre de fichiers (shards) pour les données sur disque
+SHARD_COUNT = 16
+
 # Intents (permissions que ton bot demande à Discord)
 INTENTS = discord.Intents.default()
 INTENTS.message_content = True   # nécessaire pour lire le contenu des messages
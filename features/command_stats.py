@@ -0,0 +1,164 @@
+# features/command_stats.py
+# Statistiques de commandes tenues à jour au fil de l'eau (aucun parcours d'historique)
+# - par utilisateur : total et fréquence de chaque commande
+# - global : total par commande et classement des utilisateurs
+# Les compteurs globaux sont des FrequencyCounter : +1 en O(1), top-k en O(k).
+# Par utilisateur, un simple dict {commande: nombre} : il n'a que quelques commandes
+# distinctes, les trier à la lecture coûte moins que des paliers gardés pour chacun.
+#
+# Les compteurs comptent depuis le début (la rétention de l'historique ne les réduit pas) ;
+# vider son historique remet ses compteurs à zéro.
+# Persistance par utilisateur, comme l'historique : dump_delta() ne copie que les utilisateurs
+# modifiés depuis la sauvegarde précédente ({user_id: {"seq", "counts"} | None}, pour
+# utils.sharded_store.ShardedJsonStore.save_delta). `seq` = dernier numéro du journal
+# d'historique compté pour cet utilisateur : au démarrage, la relecture du journal ne
+# recompte que les enregistrements plus récents (counts_record).
+
+import heapq
+
+from structures.hashtable import HashTable
+from structures.frequency_counter import FrequencyCounter
+from features.history_storage import parse_user_id as _parse_user_id, unpack_entries
+
+
+def command_name(command_str):
+    """Nom de la commande, sans ses arguments ("!play song" -> "!play")."""
+    parts = (command_str or "").split(maxsplit=1)
+    return parts[0].lower() if parts else ""
+
+
+class CommandStats:
+    def __init__(self, table_cls=HashTable):
+        self._table_cls = table_cls
+        self._per_user = table_cls()                 # user_id -> {commande: nombre}
+        self.users = FrequencyCounter(table_cls)     # user_id -> total (classement)
+        self.commands = FrequencyCounter(table_cls)  # commande -> total, tous utilisateurs
+        self._seqs = table_cls()                     # user_id -> seq sauvegardé (load)
+        self.seq = 0                                 # plus grand seq sauvegardé
+        # utilisateurs modifiés depuis le dernier dump_delta() (HashTable utilisée comme ensemble)
+        self._dirty = table_cls()
+
+    # -----------------------------
+    # Mise à jour
+    # -----------------------------
+    def record(self, user_id, command_str):
+        name = command_name(command_str)
+        per_user = self._per_user.get(user_id)
+        if per_user is None:
+            per_user = {}
+            self._per_user.set(user_id, per_user)
+        per_user[name] = per_user.get(name, 0) + 1
+        self.users.add(user_id)
+        self.commands.add(name)
+        self._dirty.set(user_id, True)
+
+    def forget(self, user_id):
+        """Remet à zéro les compteurs d'un utilisateur (et retire sa part des totaux globaux)."""
+        per_user = self._per_user.get(user_id)
+        if per_user is None:
+            return False
+        for name, n in per_user.items():
+            self.commands.add(name, -n)
+        self._per_user.delete(user_id)
+        self.users.remove(user_id)
+        self._dirty.set(user_id, True)
+        return True
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def total(self, user_id=None):
+        """Commandes comptées pour un utilisateur, ou pour tout le monde (O(1))."""
+        if user_id is None:
+            return self.commands.total
+        return self.users.count(user_id)
+
+    def top_commands(self, k=5, user_id=None):
+        """[(commande, nombre)] les plus utilisées, par un utilisateur ou par tout le monde."""
+        if user_id is None:
+            return self.commands.top(k)
+        per_user = self._per_user.get(user_id)
+        if per_user is None:
+            return []
+        # à égalité : la commande utilisée en premier d'abord (tri stable)
+        return heapq.nlargest(k, per_user.items(), key=lambda item: item[1])
+
+    def top_users(self, k=10):
+        """[(user_id, total)] des utilisateurs les plus actifs."""
+        return self.users.top(k)
+
+    def rank_of(self, user_id):
+        """Place de l'utilisateur dans le classement (None s'il n'a rien compté)."""
+        return self.users.rank(user_id)
+
+    def user_count(self):
+        return len(self.users)
+
+    # -----------------------------
+    # Persistance
+    # -----------------------------
+    def is_dirty(self):
+        return len(self._dirty) > 0
+
+    def counts_record(self, user_id, seq):
+        """True si l'enregistrement `seq` du journal n'est pas déjà compté pour cet utilisateur."""
+        return not seq or seq > (self._seqs.get(user_id) or 0)
+
+    def dump_delta(self, seq=0):
+        """
+        Compteurs des seuls utilisateurs modifiés depuis le dernier appel :
+        {user_id: {"seq": seq, "counts": {commande: nombre}}}, None si remis à zéro.
+        Remet le suivi à zéro (à refaire si l'écriture échoue : restore_dirty).
+        """
+        dirty, self._dirty = self._dirty, self._table_cls()
+        out = {}
+        for uid in dirty.keys():
+            per_user = self._per_user.get(uid)
+            out[str(uid)] = {"seq": seq, "counts": dict(per_user)} if per_user is not None else None
+        return out
+
+    def restore_dirty(self, delta):
+        """Remarque comme modifiés les utilisateurs d'un delta non écrit (échec de sauvegarde)."""
+        for k in delta:
+            self._dirty.set(_parse_user_id(k), True)
+
+    def rebuild(self, histories, seq=0):
+        """
+        Recompte tout depuis des historiques sauvegardés (HistoryManager.dump_for_save ; première mise en place,
+        une seule fois : ensuite les compteurs sont sauvegardés). Tous les utilisateurs sont à écrire.
+        """
+        self._per_user = self._table_cls()
+        self.users = FrequencyCounter(self._table_cls)
+        self.commands = FrequencyCounter(self._table_cls)
+        self._seqs = self._table_cls()
+        for k, value in histories.items():
+            uid = _parse_user_id(k)
+            for cmd in unpack_entries(value)[0]:
+                self.record(uid, cmd)
+        self.seq = seq
+
+    def load(self, data):
+        """Recharge les utilisateurs sauvegardés ({user_id: {"seq", "counts"}}) ; les totaux globaux sont recalculés."""
+        self._per_user = self._table_cls()
+        self._seqs = self._table_cls()
+        self.seq = 0
+        totals = {}
+        user_totals = []
+        for k, entry in (data or {}).items():
+            uid = _parse_user_id(k)
+            counts = entry.get("counts") or {}
+            self._per_user.set(uid, dict(counts))
+            self._seqs.set(uid, entry.get("seq", 0))
+            self.seq = max(self.seq, entry.get("seq", 0))
+            user_totals.append((uid, sum(counts.values())))
+            for name, n in counts.items():
+                totals[name] = totals.get(name, 0) + n
+        self.users = FrequencyCounter.from_counts(user_totals, self._table_cls)
+        self.commands = FrequencyCounter.from_counts(totals.items(), self._table_cls)
+        self._dirty = self._table_cls()
+
+
+def convert_legacy_dump(data):
+    """Ancien fichier unique {"seq": n, "users": {user_id: {commande: nombre}}} -> format par utilisateur."""
+    seq = data.get("seq", 0)
+    return {k: {"seq": seq, "counts": counts} for k, counts in (data.get("users") or {}).items()}
@@ -0,0 +1,164 @@
+# features/conversation_loader.py
+# Chargement des arbres de conversation depuis des fichiers JSON (dossier conversation_trees/)
+#
+# _root.json : {"question": "... ({topics}) ...", "synonyms": {mot: option}}
+# <sujet>.json : {"topic": "python", "order": 1, "start": "id_nœud",
+#                 "nodes": {"id_nœud": {"question": "...", "options": {option: id_nœud}}
+#                                     | {"result": "..."}}}
+#
+# Chaque sujet est validé (pas de cycle, pas de nœud inaccessible, feuilles avec réponse)
+# puis l'ensemble est compilé (features.conversation_table). La forme compilée est mise
+# en cache sur disque, sous le hash du contenu des fichiers : un redémarrage sans
+# modification ne revalide ni ne recompile rien.
+
+import hashlib
+import json
+import os
+
+from structures.hashtable import HashTable
+from features.conversation_table import CompiledTree
+from utils.persistence import load_json, save_json
+
+ROOT_FILE = "_root.json"
+ROOT_NAME = "_root"     # identifiant stable de la racine (les autres nœuds : "sujet/nœud")
+# version du format de la forme compilée en cache (un cache d'un autre format est recompilé)
+CACHE_FORMAT = 2
+DEFAULT_TREE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "conversation_trees")
+
+
+class TreeValidationError(ValueError):
+    pass
+
+
+class TreeNode:
+    """
+    Nœud d'arbre de conversation.
+    - question: str | None  -> Question à poser si ce n'est pas une feuille
+    - options: dict[str, TreeNode] | None -> transitions par option (non-binaire autorisé)
+    - result: str | None -> Réponse finale si feuille
+    - key: str | None -> identifiant de sujet (sert pour 'speak about X')
+    - name: str | None -> identifiant stable "sujet/nœud" (sauvegarde de l'état utilisateur)
+    """
+    def __init__(self, question=None, options=None, result=None, key=None, name=None):
+        self.question = question
+        self.options = options or {}
+        self.result = result
+        self.key = key
+        self.name = name
+
+    def is_leaf(self):
+        return self.result is not None and not self.options
+
+
+def read_tree_files(directory: str):
+    """Lit les fichiers du dossier. Retourne ({nom_fichier: contenu JSON}, hash du contenu)."""
+    names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    if ROOT_FILE not in names:
+        raise TreeValidationError(f"{ROOT_FILE} manquant dans {directory}")
+    digest = hashlib.sha256()
+    files = {}
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            raw = f.read()
+        digest.update(name.encode("utf-8") + b"\0" + raw + b"\0")
+        try:
+            files[name] = json.loads(raw.decode("utf-8"))
+        except ValueError as e:
+            raise TreeValidationError(f"{name} : JSON invalide ({e})")
+    return files, digest.hexdigest()
+
+
+def validate_topic(name: str, spec: dict):
+    """Vérifie un sujet : lève TreeValidationError au premier problème."""
+    nodes = spec.get("nodes") or {}
+    start = spec.get("start")
+    if not spec.get("topic"):
+        raise TreeValidationError(f"{name} : champ 'topic' manquant")
+    if start not in nodes:
+        raise TreeValidationError(f"{name} : nœud de départ '{start}' introuvable")
+    for node_id, node in nodes.items():
+        options = node.get("options") or {}
+        if options:
+            if not node.get("question"):
+                raise TreeValidationError(f"{name} : le nœud '{node_id}' a des options mais pas de question")
+            for option, target in options.items():
+                if target not in nodes:
+                    raise TreeValidationError(
+                        f"{name} : l'option '{option}' du nœud '{node_id}' mène à '{target}' (inconnu)")
+        elif not node.get("result"):
+            raise TreeValidationError(f"{name} : la feuille '{node_id}' n'a pas de réponse ('result')")
+
+    # parcours en profondeur itératif : 1 = en cours (sur la pile), 2 = terminé
+    color = HashTable(size=64)
+    stack = [(start, iter((nodes[start].get("options") or {}).values()))]
+    color.set(start, 1)
+    while stack:
+        node_id, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            color.set(node_id, 2)
+            stack.pop()
+            continue
+        state = color.get(child)
+        if state == 1:
+            raise TreeValidationError(f"{name} : cycle détecté ('{node_id}' -> '{child}')")
+        if state is None:
+            color.set(child, 1)
+            stack.append((child, iter((nodes[child].get("options") or {}).values())))
+    unreachable = [n for n in nodes if color.get(n) is None]
+    if unreachable:
+        raise TreeValidationError(f"{name} : nœud(s) inaccessible(s) : {', '.join(sorted(unreachable))}")
+
+
+def build_tree(files: dict):
+    """Valide les fichiers et construit l'arbre de TreeNode. Retourne (racine, synonymes)."""
+    root_spec = files[ROOT_FILE]
+    topics = []
+    for name, spec in files.items():
+        if name == ROOT_FILE:
+            continue
+        validate_topic(name, spec)
+        topics.append((spec.get("order", 0), spec["topic"].strip().lower(), spec))
+    topics.sort(key=lambda t: (t[0], t[1]))
+    if not topics:
+        raise TreeValidationError("aucun sujet de conversation")
+
+    root = TreeNode(question=root_spec.get("question", "({topics})").replace(
+        "{topics}", " / ".join(t[1] for t in topics)), name=ROOT_NAME)
+    for _, topic, spec in topics:
+        if topic in root.options:
+            raise TreeValidationError(f"sujet '{topic}' défini deux fois")
+        built = {}
+        for node_id, node in spec["nodes"].items():
+            built[node_id] = TreeNode(question=node.get("question"), result=node.get("result"),
+                                      name=f"{topic}/{node_id}")
+        for node_id, node in spec["nodes"].items():
+            built[node_id].options = {opt.strip().lower(): built[target]
+                                      for opt, target in (node.get("options") or {}).items()}
+        start = built[spec["start"]]
+        start.key = topic
+        root.options[topic] = start
+    return root, root_spec.get("synonyms") or {}
+
+
+def load_compiled_tree(directory=DEFAULT_TREE_DIR, cache_dir=None):
+    """
+    Charge les arbres du dossier et retourne (CompiledTree, hash).
+    Avec cache_dir : réutilise la forme compilée si le contenu n'a pas changé.
+    """
+    files, digest = read_tree_files(directory)
+    cache_path = os.path.join(cache_dir, f"conversation_{digest[:16]}.json") if cache_dir else None
+    if cache_path is not None:
+        cached = load_json(cache_path)
+        if cached.get("hash") == digest and cached.get("format") == CACHE_FORMAT:
+            return CompiledTree.from_dict(cached["tree"]), digest
+    root, synonyms = build_tree(files)
+    tree = CompiledTree.compile(root, synonyms)
+    if cache_path is not None:
+        save_json(cache_path, {"hash": digest, "format": CACHE_FORMAT, "tree": tree.to_dict()})
+        # les formes compilées d'anciennes versions ne servent plus
+        for name in os.listdir(cache_dir):
+            if name.startswith("conversation_") and name != os.path.basename(cache_path):
+                os.remove(os.path.join(cache_dir, name))
+    return tree, digest
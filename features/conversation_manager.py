@@ -7,27 +7,31 @@
 #   - !helpme           -> start_conversation(user_id) puis envoyer le message retourné
 #   - pendant la conv   -> handle_user_message(user_id, msg) et envoyer la réponse
 #   - !reset            -> reset(user_id)
-#   - !speak about X    -> speak_about(topic)
+#   - !speak about X    -> speak_reply(topic) (recherche dans tout le contenu de l'arbre)
+#
+# Les arbres sont décrits dans des fichiers JSON (conversation_trees/, voir
+# features.conversation_loader), validés puis compilés une fois en table de transitions
+# (features.conversation_table) : l'état d'un utilisateur n'est qu'un numéro de nœud,
+# et le chemin est reconstruit à la demande.
+# reload_tree() recharge les fichiers à chaud et migre les conversations en cours.
+#
+# Sessions inactives (max_sessions / session_ttl) : un LRUCache retient l'ordre d'activité ;
+# au-delà du plafond ou du délai, la session la plus ancienne est retirée de la mémoire.
+# Avec `spill` (lecture d'une session sauvegardée), elle reste sur disque et reprend au
+# prochain message de l'utilisateur (resume : lecture dans un thread) ; sans, elle est
+# supprimée. Seul l'identifiant d'une session évincée est retenu (ensemble compact) :
+# le disque n'est relu que pour ces utilisateurs, jamais pour ceux qui n'ont pas de session.
+# Au démarrage, toutes les sessions sauvegardées passent par load_from_data : celles au-delà
+# du plafond sont évincées aussitôt, si bien que l'ensemble couvre tout ce qui est sur disque.
+
+import asyncio
+import time
 
 from structures.hashtable import HashTable
-
-class TreeNode:
-    """
-    Nœud d'arbre de conversation.
-    - question: str | None  -> Question à poser si ce n'est pas une feuille
-    - options: dict[str, TreeNode] | None -> transitions par option (non-binaire autorisé)
-    - result: str | None -> Réponse finale si feuille
-    - key: str | None -> identifiant de sujet (sert pour 'speak about X')
-    """
-    def __init__(self, question=None, options=None, result=None, key=None):
-        self.question = question
-        self.options = options or {}
-        self.result = result
-        self.key = key
-
-    def is_leaf(self):
-        return self.result is not None and not self.options
-
+from structures.lru_cache import LRUCache
+from features.conversation_table import EXACT, NO_NODE, migration_map
+from features.conversation_loader import DEFAULT_TREE_DIR, load_compiled_tree
+from features.conversation_loader import TreeNode  # noqa: F401 (réexporté)
 
 class ConversationManager:
     """
@@ -36,182 +40,255 @@ class ConversationManager:
       - Chaque sujet a son sous-arbre de questions
       - L'état courant de chaque user_id est stocké dans une HashTable
     """
-    def __init__(self):
-        # table: user_id -> {"node": TreeNode, "path": [str]}
-        self._state = HashTable()
-        # construit l'arbre de conversation et l'index des sujets
-        self.root, self._topics = self._build_conversation_tree()
-
-        # Quelques synonymes usuels pour options fréquentes
-        self._synonyms = {
-            "oui": "oui", "yes": "oui", "y": "oui",
-            "non": "non", "no": "non", "n": "non",
-            "front": "front", "frontend": "front",
-            "back": "back", "backend": "back",
-            "django": "django", "flask": "flask",
-            "scripts": "scripts", "script": "scripts",
-            "node": "node", "nodejs": "node",
-            "instrument": "instrument", "guitare": "instrument", "piano": "instrument",
-            "mao": "mao", "beat": "mao", "prod": "mao",
-            "python": "python", "web": "web", "musique": "musique", "music": "musique",
-        }
+
+    def __init__(self, table_cls=HashTable, tree_dir=DEFAULT_TREE_DIR, cache_dir=None,
+                 max_sessions=None, session_ttl=None, clock=time.time, spill=None):
+        # table: user_id -> numéro du nœud courant dans self._tree (absent = pas de conversation)
+        # table_cls permet de choisir HashTable (chaînage) ou OpenHashTable (compacte)
+        self._state = table_cls()
+        # utilisateurs modifiés depuis le dernier dump_delta() (HashTable utilisée comme ensemble)
+        self._table_cls = table_cls
+        self._dirty = table_cls()
+        # fichiers des arbres, et dossier du cache de leur forme compilée (None = pas de cache)
+        self.tree_dir = tree_dir
+        self.cache_dir = cache_dir
+        # pendant un rechargement : utilisateurs dont l'état change (à remigrer avant la bascule)
+        self._touched = None
+        self._reload_lock = None
+        # éviction des sessions inactives (None / None = tout garder, aucun suivi)
+        self.session_ttl = session_ttl
+        self.clock = clock
+        self._sessions = None
+        if max_sessions is not None or session_ttl is not None:
+            self._sessions = LRUCache(capacity=max_sessions, table_cls=table_cls)
+        # spill(user_id) -> état sauvegardé (dict) ou None : relit une session évincée
+        self._spill = spill
+        self._spill_pending = table_cls()    # user_id -> état pas encore écrit sur disque
+        self._spilled = table_cls()          # sessions évincées, à relire via spill (ensemble)
+        self._set_tree(*load_compiled_tree(tree_dir, cache_dir))
+
+    def _set_tree(self, tree, tree_hash):
+        # table de transitions : options et synonymes -> numéros, nœuds -> numéros
+        self._tree = tree
+        self.tree_hash = tree_hash
+        self._topics = set(tree.options_of(0))
+
+    def _set_state(self, user_id, node):
+        self._state.set(user_id, node)
+        self._dirty.set(user_id, True)
+        if self._touched is not None:
+            self._touched.set(user_id, True)
+        self._spill_pending.delete(user_id)
+        self._spilled.delete(user_id)
+        self._touch(user_id)
+
+    def _drop_state(self, user_id):
+        self._state.delete(user_id)
+        if self._touched is not None:
+            self._touched.set(user_id, True)
+        if self._sessions is not None:
+            self._sessions.remove(user_id)
+        self._spilled.delete(user_id)
 
     # -----------------------------
-    # Construction des arbres
+    # Éviction des sessions inactives
     # -----------------------------
-    def _build_python_subtree(self):
-        # Q1: Débutant ?
-        q1 = TreeNode(
-            question="Tu es débutant en Python ? (oui / non)",
-            options={}
-        )
-        # Feuille pour débutant
-        leaf_debutant = TreeNode(
-            result=("Je te conseille de commencer par :\n"
-                    "- variables, types, conditions, boucles\n"
-                    "- fonctions et modules\n"
-                    "- petits scripts (calculatrice, mini-jeux)\n"
-                    "👉 Ressources: docs.python.org, w3schools/python")
-        )
-        # Q2 si non-débutant
-        q2 = TreeNode(
-            question="Tu préfères faire des frameworks web ou des scripts ? (django / flask / scripts)",
-            options={}
-        )
-        leaf_django = TreeNode(
-            result=("🚀 Django : structure MVC, ORM intégré, admin auto.\n"
-                    "Étapes: créer projet, app, modèles, vues, templates.\n"
-                    "👉 Ressources: docs.djangoproject.com")
-        )
-        leaf_flask = TreeNode(
-            result=("🧪 Flask : micro-framework flexible.\n"
-                    "Étapes: routes, templates Jinja, extensions (SQLAlchemy, WTForms).\n"
-                    "👉 Ressources: flask.palletsprojects.com")
-        )
-        leaf_scripts = TreeNode(
-            result=("🛠️ Scripts : CLI, automatisation, parsing (argparse), requests.\n"
-                    "Idées: batch rename, web-scraping, cron.\n"
-                    "👉 Ressources: Real Python, Hitchhiker’s Guide")
-        )
-
-        q2.options = {
-            "django": leaf_django,
-            "flask": leaf_flask,
-            "scripts": leaf_scripts,
-        }
-        q1.options = {
-            "oui": leaf_debutant,
-            "non": q2,
-        }
-        return q1
-
-    def _build_web_subtree(self):
-        q1 = TreeNode(
-            question="Tu veux faire du Front ou du Back ? (front / back)",
-            options={}
-        )
-        leaf_front = TreeNode(
-            result=("🎨 Front-end : HTML + CSS + JS.\n"
-                    "Étapes: sémantique HTML, Flex/Grid, DOM, fetch API.\n"
-                    "Frameworks: React/Vue/Svelte.\n"
-                    "👉 Ressources: MDN Web Docs, Frontend Mentor")
-        )
-        q2_back = TreeNode(
-            question="Back : plutôt Python ou Node ? (python / node)",
-            options={}
-        )
-        leaf_back_py = TreeNode(
-            result=("🐍 Back Python : FastAPI/Flask/Django REST.\n"
-                    "Concepts: API REST, ORM, auth, déploiement (uvicorn, docker).")
-        )
-        leaf_back_node = TreeNode(
-            result=("🟢 Back Node : Express/Nest.\n"
-                    "Concepts: middleware, routing, JWT, Prisma/TypeORM, PM2.")
-        )
-        q2_back.options = {
-            "python": leaf_back_py,
-            "node": leaf_back_node,
-        }
-        q1.options = {
-            "front": leaf_front,
-            "back": q2_back,
-        }
-        return q1
-
-    def _build_music_subtree(self):
-        q1 = TreeNode(
-            question="Tu veux parler Instrument ou MAO ? (instrument / mao)",
-            options={}
-        )
-        leaf_instr = TreeNode(
-            result=("🎸 Instrument : routine, gammes, accords, métronome, ear training.\n"
-                    "Outils: JustinGuitar / PianoLessons / Yousician.")
-        )
-        leaf_mao = TreeNode(
-            result=("🎚️ MAO : choix du DAW (FL, Ableton, Reaper), VST, structure (intro/couplet/refrain), mix de base.\n"
-                    "Ressources: YouTube - ‘In The Mix’, ‘ADSR’.")
-        )
-        q1.options = {
-            "instrument": leaf_instr,
-            "mao": leaf_mao,
-        }
-        return q1
-
-    def _build_conversation_tree(self):
-        # root propose les sujets
-        python_sub = self._build_python_subtree()
-        web_sub = self._build_web_subtree()
-        music_sub = self._build_music_subtree()
-
-        root = TreeNode(
-            question=("De quoi veux-tu parler ? (python / web / musique)\n"
-                      "👉 Tu peux aussi taper 'reset' pour recommencer."),
-            options={
-                "python": python_sub,
-                "web": web_sub,
-                "musique": music_sub,
-            }
-        )
-        topics = {"python", "web", "musique"}
-        return root, topics
+    def _touch(self, user_id):
+        """Marque la session comme active ; évince au passage ce qui dépasse le plafond ou le délai."""
+        if self._sessions is None:
+            return
+        now = self.clock()
+        evicted = self._sessions.put(user_id, None, now)
+        if evicted is not None:
+            self._evict(evicted[0])
+        self.evict_idle(now)
+
+    def _evict(self, user_id):
+        node = self._state.get(user_id)
+        self._state.delete(user_id)
+        if self._touched is not None:
+            self._touched.set(user_id, True)
+        if node is None:
+            return
+        if self._spill is None:
+            # pas de reprise possible : la session est supprimée (aussi sur disque)
+            self._dirty.set(user_id, True)
+            return
+        self._spilled.set(user_id, True)
+        if self._dirty.get(user_id) is not None:
+            # dernier état pas encore sauvegardé : écrit par le prochain dump_delta
+            self._spill_pending.set(user_id, self._dump_state(node))
+
+    def evict_idle(self, now=None):
+        """Évince les sessions inactives depuis plus de session_ttl (les plus anciennes d'abord)."""
+        if self._sessions is None or self.session_ttl is None:
+            return 0
+        limit = (self.clock() if now is None else now) - self.session_ttl
+        n = 0
+        oldest = self._sessions.oldest()
+        while oldest is not None and oldest[2] <= limit:
+            self._sessions.pop_oldest()
+            self._evict(oldest[0])
+            n += 1
+            oldest = self._sessions.oldest()
+        return n
+
+    def session_count(self):
+        """Nombre de sessions en mémoire."""
+        return len(self._state)
+
+    def _node_of(self, user_id):
+        """
+        Nœud courant de l'utilisateur, ou None. Ne lit jamais le disque : une session
+        évincée n'est reprise ici que si son dernier état n'est pas encore écrit.
+        """
+        node = self._state.get(user_id)
+        if node is not None:
+            self._touch(user_id)
+            return node
+        st = self._spill_pending.get(user_id)
+        if st is None:
+            return None
+        self._spill_pending.delete(user_id)
+        return self._resume_state(user_id, st)
+
+    def _resume_state(self, user_id, st):
+        node = self._node_from_saved(st)
+        self._spilled.delete(user_id)
+        self._state.set(user_id, node)
+        if self._touched is not None:
+            self._touched.set(user_id, True)
+        self._touch(user_id)
+        return node
+
+    async def resume(self, user_id):
+        """
+        Comme is_active, mais relit au besoin une session évincée sur disque, dans un
+        thread (spill lit tout un shard : la boucle n'est pas bloquée). À appeler avant
+        handle_user_message pour qu'un utilisateur revenu reprenne là où il en était.
+        Un utilisateur sans session évincée ne coûte qu'une recherche en mémoire.
+        """
+        if self._node_of(user_id) is not None:
+            return True
+        if self._spill is None or self._spilled.get(user_id) is None:
+            return False
+        st = await asyncio.to_thread(self._spill, user_id)
+        if self._state.get(user_id) is not None or self._spill_pending.get(user_id) is not None:
+            # session démarrée (ou évincée à nouveau) pendant la lecture : plus récente
+            return self._node_of(user_id) is not None
+        if not st:
+            self._spilled.delete(user_id)      # supprimée sur disque entre-temps
+            return False
+        self._resume_state(user_id, st)
+        return True
+
+    # -----------------------------
+    # Rechargement à chaud des arbres
+    # -----------------------------
+    async def reload_tree(self, chunk_size=5000):
+        """
+        Recharge les arbres depuis les fichiers sans bloquer la boucle asyncio :
+        lecture / validation / compilation dans un thread, puis migration des états
+        par rejeu du chemin de chaque nœud, par tranches de chunk_size utilisateurs.
+        La bascule (nouvel arbre + nouveaux états) se fait d'un bloc, sans await.
+        Retourne (utilisateurs migrés, utilisateurs renvoyés à la racine car leur
+        chemin n'existe plus). Fichiers invalides : TreeValidationError, l'ancien arbre reste.
+        """
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            tree, tree_hash = await asyncio.to_thread(load_compiled_tree, self.tree_dir, self.cache_dir)
+            if tree_hash == self.tree_hash:
+                return 0, 0
+            remap = migration_map(self._tree, tree)
+            self._touched = self._table_cls()
+            try:
+                new_state = self._table_cls()
+                lost = self._table_cls()
+
+                def migrate(uid, node):
+                    target = remap[node]
+                    if target == NO_NODE:
+                        target = 0
+                        lost.set(uid, True)
+                    new_state.set(uid, target)
+
+                items = list(self._state.items())
+                for i in range(0, len(items), chunk_size):
+                    for uid, node in items[i:i + chunk_size]:
+                        migrate(uid, node)
+                    await asyncio.sleep(0)   # laisse passer les messages entre deux tranches
+                # bascule : les utilisateurs qui ont avancé pendant la migration sont remigrés
+                for uid in self._touched.keys():
+                    node = self._state.get(uid)
+                    if node is None:
+                        new_state.delete(uid)
+                    else:
+                        lost.delete(uid)
+                        migrate(uid, node)
+                self._state = new_state
+                self._set_tree(tree, tree_hash)
+                # leur chemin sauvegardé n'est plus valable : à réécrire
+                for uid in lost.keys():
+                    self._dirty.set(uid, True)
+            finally:
+                self._touched = None
+            return len(new_state), len(lost)
 
     # -----------------------------
     # Gestion d'état utilisateur
     # -----------------------------
-    def _ensure_state(self, user_id):
-        st = self._state.get(user_id)
-        if st is None:
-            st = {"node": None, "path": []}
-            self._state.set(user_id, st)
-        return st
+    def is_active(self, user_id):
+        """
+        True si l'utilisateur a une conversation en cours en mémoire (y compris terminée
+        sur une feuille). Une session évincée sur disque n'est vue qu'après resume().
+        """
+        return self._node_of(user_id) is not None
 
     def reset(self, user_id):
-        st = self._ensure_state(user_id)
-        st["node"] = None
-        st["path"] = []
         return "🔄 Conversation réinitialisée. " + self.start_conversation(user_id)
 
     def start_conversation(self, user_id):
-        st = self._ensure_state(user_id)
-        st["node"] = self.root
-        st["path"] = []
-        return self.root.question
+        self._set_state(user_id, 0)
+        return self._tree.questions[0]
 
     def get_current_question(self, user_id):
-        st = self._ensure_state(user_id)
-        node = st["node"]
+        node = self._node_of(user_id)
         if node is None:
             return None
-        if node.is_leaf():
+        if self._tree.is_leaf(node):
             return None
-        return node.question
+        return self._tree.questions[node]
+
+    def get_path(self, user_id):
+        """Options choisies depuis la racine (reconstruites depuis les pointeurs parents)."""
+        node = self._node_of(user_id)
+        return self._tree.path_of(node) if node is not None else []
 
     # -----------------------------
     # Commande 'speak about X'
     # -----------------------------
+    def search(self, query, limit=5):
+        """
+        Points d'entrée de l'arbre qui parlent de `query` (clés, options, questions, réponses),
+        du plus pertinent au moins pertinent : [(chemin d'options, score)].
+        """
+        return [(self._tree.path_of(node), score)
+                for node, score in self._tree.index.search(query or "", limit)]
+
     def speak_about(self, topic: str):
-        t = (topic or "").strip().lower()
-        return t in self._topics
+        return bool(self._tree.index.search(topic or "", 1))
+
+    def speak_reply(self, topic, limit=3):
+        """Réponse à 'speak about X' : les chemins qui y mènent, ou un refus."""
+        matches = self.search(topic, limit)
+        if not matches:
+            return "❌ Désolé, je ne traite pas ce sujet."
+        lines = ["✅ Oui, je parle de ce sujet :"]
+        for path, _ in matches:
+            lines.append("• " + " → ".join(path))
+        lines.append("👉 Tape **!helpme** puis suis ces réponses.")
+        return "\n".join(lines)
 
     def supported_topics(self):
         return sorted(list(self._topics))
@@ -241,75 +318,137 @@ class ConversationManager:
             topic = low.replace("speak about", "", 1).strip()
             if not topic:
                 return f"🎯 Tu peux demander : speak about <sujet>. Sujets possibles : {', '.join(self.supported_topics())}"
-            return ("✅ Oui, je parle de ce sujet." if self.speak_about(topic)
-                    else "❌ Désolé, je ne traite pas ce sujet.")
+            return self.speak_reply(topic)
 
         # État courant
-        st = self._ensure_state(user_id)
-        node = st["node"]
+        tree = self._tree
+        node = self._node_of(user_id)
 
         # Si pas encore démarré, démarre
         if node is None:
             return self.start_conversation(user_id)
 
         # Si feuille -> on a déjà donné une réponse finale, proposer restart
-        if node.is_leaf():
-            return ("✅ " + node.result +
+        if tree.is_leaf(node):
+            return ("✅ " + tree.results[node] +
                     "\n\nSi tu veux recommencer : tape **reset**.")
 
-        # Normaliser l'option
-        opt = self._normalize_option(low)
-
-        # Tenter le matching sur les options existantes
-        if opt in node.options:
-            next_node = node.options[opt]
-            st["path"].append(opt)
-            st["node"] = next_node
+        # Option du nœud (synonymes, préfixe non ambigu ou petite faute de frappe), puis transition
+        next_node, how = tree.match(node, low)
+        if next_node != NO_NODE:
+            self._set_state(user_id, next_node)
+            # réponse approchée : on dit ce qu'on a compris
+            prefix = "" if how == EXACT else f"🔎 Compris : **{tree.option_names[tree.via[next_node]]}**\n"
 
-            if next_node.is_leaf():
+            if tree.is_leaf(next_node):
                 # Réponse finale
-                return "✅ " + next_node.result + "\n\nTape **reset** pour recommencer."
+                return prefix + "✅ " + tree.results[next_node] + "\n\nTape **reset** pour recommencer."
             else:
                 # Nouvelle question
-                return next_node.question
+                return prefix + tree.questions[next_node]
 
         # Si pas trouvé, suggérer les options disponibles
-        suggestions = ", ".join(node.options.keys())
+        suggestions = ", ".join(tree.options_of(node))
         return f"❓ Je n’ai pas compris. Choisis parmi : {suggestions}"
 
-    # -----------------------------
-    # Helpers
-    # -----------------------------
-    def _normalize_option(self, s: str) -> str:
-        return self._synonyms.get(s.strip().lower(), s.strip().lower())
-
     # Dump/load pour persistance ultérieure (bonus 5)
+    def _dump_state(self, node):
+        # On sauvegarde l'identifiant stable du nœud ("sujet/nœud", inchangé si l'arbre est
+        # modifié ailleurs) plutôt que son numéro ; le chemin seulement pour un nœud sans nom.
+        name = self._tree.names[node]
+        if name is not None:
+            return {"node": name}
+        return {"path": self._tree.path_of(node)}
+
+    def _node_from_saved(self, st):
+        """Nœud d'un état sauvegardé : {"node": identifiant} ou ancien format {"path": [...]}."""
+        node = NO_NODE
+        if st.get("node") is not None:
+            node = self._tree.node_by_name(st["node"])
+        if node == NO_NODE and "path" in st:
+            node = self._tree.node_by_path(st["path"])
+        # identifiant ou chemin disparu de l'arbre : retour à la racine
+        return node if node != NO_NODE else 0
+
     def dump_for_save(self):
+        """Sessions en mémoire (et évincées pas encore écrites) ; les autres sont déjà sur disque."""
         out = {}
-        for uid in self._state.keys():
-            st = self._state.get(uid) or {}
-            # On ne peut pas sérialiser des nœuds : on sauvegarde juste le chemin et on repartira de root au reload.
-            out[str(uid)] = {
-                "path": st.get("path", [])
-            }
+        for uid, node in self._state.items():
+            out[str(uid)] = self._dump_state(node)
+        for uid, st in self._spill_pending.items():
+            out[str(uid)] = st
         return out
 
+    def dirty_count(self):
+        """Nombre d'utilisateurs modifiés depuis le dernier dump_delta()."""
+        return len(self._dirty)
+
+    def dump_delta(self):
+        """
+        Comme dump_for_save, mais seulement pour les utilisateurs modifiés depuis le dernier appel
+        (None = état supprimé). Remet le suivi à zéro.
+        """
+        dirty, self._dirty = self._dirty, self._table_cls()
+        out = {}
+        for uid in dirty.keys():
+            node = self._state.get(uid)
+            if node is not None:
+                out[str(uid)] = self._dump_state(node)
+            else:
+                # session évincée : son dernier état part sur disque (None = supprimée)
+                out[str(uid)] = self._spill_pending.get(uid)
+                self._spill_pending.delete(uid)
+        return out
+
+    def restore_dirty(self, delta):
+        """Remarque comme modifiés les utilisateurs d'un delta non écrit (échec de sauvegarde)."""
+        for k in delta:
+            try:
+                uid = int(k)
+            except ValueError:
+                uid = k
+            self._dirty.set(uid, True)
+            if delta[k] is not None and self._state.get(uid) is None:
+                # session évincée entre-temps : son état reste à écrire (et à reprendre)
+                self._spill_pending.set(uid, delta[k])
+                self._spilled.set(uid, True)
+
+    def apply_delta(self, delta):
+        """Fusionne un delta (voir dump_delta) : remplace les utilisateurs présents, supprime les None."""
+        for k, st in delta.items():
+            if st is None:
+                try:
+                    uid = int(k)
+                except ValueError:
+                    uid = k
+                self._drop_state(uid)
+                self._spill_pending.delete(uid)
+            else:
+                self.load_from_data({k: st})
+
     def load_from_data(self, data):
+        pairs = []
+        # beaucoup d'utilisateurs partagent quelques dizaines d'états distincts :
+        # chacun n'est résolu (index nom -> nœud, ou chemin -> nœud) qu'une seule fois
+        memo = {}
         for k, st in (data or {}).items():
             try:
                 uid = int(k)
             except ValueError:
                 uid = k
-            # On reconstruit l'état en rejouant le path depuis root
-            node = self.root
-            path = []
-            for step in st.get("path", []):
-                step_norm = self._normalize_option(step)
-                if node and not node.is_leaf() and step_norm in node.options:
-                    node = node.options[step_norm]
-                    path.append(step_norm)
-                else:
-                    node = self.root
-                    path = []
-                    break
-            self._state.set(uid, {"node": node, "path": path})
+            saved = (st.get("node"), tuple(st.get("path") or ()))
+            node = memo.get(saved)
+            if node is None:
+                node = memo[saved] = self._node_from_saved(st)
+            pairs.append((uid, node))
+        # table prédimensionnée : aucun rehash pendant le chargement
+        self._state.set_many(pairs)
+        if self._touched is None and self._sessions is None and not len(self._spilled):
+            return
+        for uid, _ in pairs:
+            if self._touched is not None:
+                self._touched.set(uid, True)
+            self._spill_pending.delete(uid)
+            self._spilled.delete(uid)
+            # au-delà du plafond, les sessions chargées en premier repartent sur disque
+            self._touch(uid)
@@ -0,0 +1,100 @@
+# features/conversation_search.py
+# Index inversé sur le contenu d'un arbre compilé (features.conversation_table)
+# - chaque nœud est indexé par les mots de sa clé de sujet, de l'option qui y mène
+#   (synonymes compris), de ses options, de sa question et de sa réponse
+# - un champ pèse plus qu'un autre (une clé ou une option compte plus qu'un mot
+#   perdu dans une réponse) et un mot rare plus qu'un mot présent partout (idf)
+# - construit une fois avec l'arbre ; une recherche ne lit que les listes des mots
+#   de la requête (pas de parcours de l'arbre)
+
+import math
+import re
+import unicodedata
+
+from structures.hashtable import HashTable
+from structures.trie import Trie, max_typos
+
+# poids de chaque champ d'un nœud
+FIELD_WEIGHTS = {
+    "key": 3.0,
+    "via": 3.0,
+    "options": 2.0,
+    "question": 1.0,
+    "result": 1.0,
+}
+
+# mots trop courants pour désigner un sujet
+STOPWORDS = frozenset("""
+    au aux avec ce ces dans de des du elle en es est et faire il je la le les leur
+    ma mes mon ne ni non oui ou par pas plus plutot pour qu que qui quoi sa se ses
+    son sur ta te tes toi ton tu un une veux vous
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Mots significatifs d'un texte : minuscules, sans accents, sans mots vides."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in _WORD.findall(text) if len(w) >= 2 and w not in STOPWORDS]
+
+
+class ContentIndex:
+    def __init__(self, tree, words_of=None):
+        """
+        tree : CompiledTree ; words_of : option -> mots qui la désignent (option + synonymes),
+        recalculé depuis l'arbre si absent.
+        """
+        if words_of is None:
+            words_of = [[name] for name in tree.option_names]
+        # mot -> {nœud: poids cumulé} pendant la construction
+        raw = {}
+
+        def add(node, text, weight):
+            for term in tokenize(text):
+                per_node = raw.setdefault(term, {})
+                per_node[node] = per_node.get(node, 0.0) + weight
+
+        # la racine ne fait que lister les sujets : ce n'est pas un point d'entrée
+        for node in range(1, len(tree)):
+            add(node, tree.keys[node], FIELD_WEIGHTS["key"])
+            for word in words_of[tree.via[node]]:
+                add(node, word, FIELD_WEIGHTS["via"])
+            add(node, " ".join(tree.options_of(node)), FIELD_WEIGHTS["options"])
+            add(node, tree.questions[node], FIELD_WEIGHTS["question"])
+            add(node, tree.results[node], FIELD_WEIGHTS["result"])
+
+        # listes finales (nœud, score) avec l'idf déjà appliqué
+        n_nodes = max(1, len(tree) - 1)
+        self._postings = HashTable(size=max(64, 2 * len(raw)))
+        self._vocabulary = Trie()
+        for term, per_node in raw.items():
+            idf = math.log(1 + n_nodes / len(per_node))
+            self._postings.set(term, [(node, w * idf) for node, w in per_node.items()])
+            self._vocabulary.insert(term, term)
+
+    def __len__(self):
+        """Nombre de mots indexés."""
+        return len(self._vocabulary)
+
+    def _postings_for(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            # mot inconnu : on tente la correction d'une petite faute de frappe
+            found = self._vocabulary.closest(term, max_typos(len(term)))
+            if found is not None:
+                postings = self._postings.get(found[0])
+        return postings or []
+
+    def search(self, query, limit=5):
+        """[(nœud, score)] des nœuds qui correspondent à la requête, du plus pertinent au moins pertinent."""
+        scores = {}
+        for term in tokenize(query):
+            for node, score in self._postings_for(term):
+                scores[node] = scores.get(node, 0.0) + score
+        # à score égal, le nœud le plus proche de la racine (numéros en largeur) d'abord
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
@@ -0,0 +1,239 @@
+# features/conversation_table.py
+# Arbre de conversation "compilé" en table de transitions plate
+# - chaque nœud reçoit un numéro (0 = racine, parcours en largeur)
+# - chaque option ("python", "oui", ...) reçoit un numéro ; les synonymes pointent
+#   directement sur le numéro de l'option canonique (une seule recherche par message)
+# - transitions stockées en CSR : les arêtes du nœud n sont les indices
+#   [edge_start[n], edge_start[n + 1]) de edge_opt / edge_to (tableaux d'entiers)
+# - parent / via : pour reconstruire le chemin d'un nœud sans le stocker par utilisateur
+# - names : identifiant stable de chaque nœud ("sujet/nœud"), sauvegardé à la place du
+#   chemin ; index nom -> nœud et chemin -> nœud pour recharger un état en une recherche
+# - un Trie par nœud (options + synonymes -> nœud suivant), construit une fois par arbre :
+#   préfixe non ambigu ("fron" -> front) et petites fautes de frappe ("pyhton" -> python)
+# - un index inversé du contenu (features.conversation_search) pour 'speak about X'
+#
+# L'état d'un utilisateur se résume donc à un entier : le numéro de son nœud.
+
+from array import array
+
+from structures.hashtable import HashTable
+from structures.trie import Trie, max_typos
+from features.conversation_search import ContentIndex
+
+NO_NODE = -1
+PATH_SEP = "\x1f"     # séparateur des options dans les clés de l'index chemin -> nœud
+
+# comment un message a été reconnu par CompiledTree.match()
+EXACT, PREFIX, TYPO = "exact", "prefix", "typo"
+MIN_PREFIX = 2
+
+
+class CompiledTree:
+    def __init__(self):
+        self.questions = []          # nœud -> question (ou None)
+        self.results = []            # nœud -> réponse finale (ou None)
+        self.keys = []               # nœud -> clé de sujet (ou None)
+        self.names = []              # nœud -> identifiant stable (ou None)
+        self.parent = array("i")     # nœud -> parent (NO_NODE pour la racine)
+        self.via = array("i")        # nœud -> option prise depuis le parent
+        self.edge_start = array("i")
+        self.edge_opt = array("i")
+        self.edge_to = array("i")
+        self.option_names = []       # option -> nom canonique
+        self._option_ids = HashTable(size=64)   # mot (option ou synonyme) -> option
+        self._matchers = []                      # nœud -> Trie (mot -> nœud suivant), ou None
+        self.index = None                        # ContentIndex (recherche 'speak about X')
+        self._by_name = None                     # identifiant stable -> nœud
+        self._by_path = None                     # chemin (options jointes) -> nœud
+
+    # -----------------------------
+    # Compilation
+    # -----------------------------
+    @classmethod
+    def compile(cls, root, synonyms=None):
+        """Compile un arbre de TreeNode (features.conversation_loader) ; synonyms : mot -> option."""
+        tree = cls()
+        order = [root]
+        ids = HashTable(size=64)      # id(TreeNode) -> numéro (les nœuds ne sont pas hachables par valeur)
+        ids.set(id(root), 0)
+        tree.parent.append(NO_NODE)
+        tree.via.append(NO_NODE)
+        i = 0
+        while i < len(order):
+            node = order[i]
+            tree.questions.append(node.question)
+            tree.results.append(node.result if node.is_leaf() else None)
+            tree.keys.append(node.key)
+            tree.names.append(getattr(node, "name", None))
+            tree.edge_start.append(len(tree.edge_opt))
+            for name, child in node.options.items():
+                child_id = ids.get(id(child))
+                if child_id is None:
+                    child_id = len(order)
+                    ids.set(id(child), child_id)
+                    order.append(child)
+                    tree.parent.append(i)
+                    tree.via.append(tree.intern(name))
+                tree.edge_opt.append(tree.intern(name))
+                tree.edge_to.append(child_id)
+            i += 1
+        tree.edge_start.append(len(tree.edge_opt))
+        for word, canonical in (synonyms or {}).items():
+            opt = tree._option_ids.get(canonical)
+            if opt is not None and tree._option_ids.get(word) is None:
+                tree._option_ids.set(word, opt)
+        tree._build_lookups()
+        return tree
+
+    def intern(self, name):
+        """Numéro d'une option (créé au besoin)."""
+        name = name.strip().lower()
+        opt = self._option_ids.get(name)
+        if opt is None:
+            opt = len(self.option_names)
+            self.option_names.append(name)
+            self._option_ids.set(name, opt)
+        return opt
+
+    # -----------------------------
+    # Sérialisation (cache de la forme compilée)
+    # -----------------------------
+    _ARRAYS = ("parent", "via", "edge_start", "edge_opt", "edge_to")
+
+    def to_dict(self):
+        out = {name: list(getattr(self, name)) for name in self._ARRAYS}
+        out.update(questions=self.questions, results=self.results, keys=self.keys, names=self.names,
+                   option_names=self.option_names, words=dict(self._option_ids.items()))
+        return out
+
+    @classmethod
+    def from_dict(cls, data):
+        tree = cls()
+        for name in cls._ARRAYS:
+            getattr(tree, name).extend(data[name])
+        tree.questions = data["questions"]
+        tree.results = data["results"]
+        tree.keys = data["keys"]
+        tree.names = data["names"]
+        tree.option_names = data["option_names"]
+        tree._option_ids = HashTable.from_items(data["words"].items())
+        tree._build_lookups()
+        return tree
+
+    def _build_lookups(self):
+        # mots (options et synonymes) regroupés par option, en une passe
+        words_of = [[] for _ in self.option_names]
+        for word, opt in self._option_ids.items():
+            words_of[opt].append(word)
+        self._matchers = []
+        for node in range(len(self)):
+            start, end = self.edge_start[node], self.edge_start[node + 1]
+            if start == end:
+                self._matchers.append(None)
+                continue
+            trie = Trie()
+            for e in range(start, end):
+                for word in words_of[self.edge_opt[e]]:
+                    if word not in trie:
+                        trie.insert(word, self.edge_to[e])
+            self._matchers.append(trie)
+        self.index = ContentIndex(self, words_of)
+        # chargement des états sauvegardés : une recherche par utilisateur
+        self._by_name = HashTable(size=max(64, 2 * len(self)))
+        self._by_path = HashTable(size=max(64, 2 * len(self)))
+        for node in range(len(self)):
+            if self.names[node] is not None:
+                self._by_name.set(self.names[node], node)
+            self._by_path.set(PATH_SEP.join(self.path_of(node)), node)
+
+    # -----------------------------
+    # Lecture
+    # -----------------------------
+    def __len__(self):
+        return len(self.questions)
+
+    def option_id(self, text):
+        """Numéro de l'option désignée par un texte (synonymes compris), ou NO_NODE."""
+        opt = self._option_ids.get(text.strip().lower())
+        return NO_NODE if opt is None else opt
+
+    def step(self, node, opt):
+        """Nœud atteint depuis `node` par l'option `opt`, ou NO_NODE."""
+        edge_opt = self.edge_opt
+        for e in range(self.edge_start[node], self.edge_start[node + 1]):
+            if edge_opt[e] == opt:
+                return self.edge_to[e]
+        return NO_NODE
+
+    def match(self, node, text):
+        """
+        Nœud atteint depuis `node` par un texte libre : (nœud, EXACT / PREFIX / TYPO),
+        ou (NO_NODE, None) si rien ne correspond ou si plusieurs options sont possibles.
+        """
+        trie = self._matchers[node]
+        if trie is None:
+            return NO_NODE, None
+        word = text.strip().lower()
+        target = trie.get(word)
+        if target is not None:
+            return target, EXACT
+        if len(word) >= MIN_PREFIX:
+            target = trie.prefix_value(word)
+            if target is not None:
+                return target, PREFIX
+        found = trie.closest(word, max_typos(len(word)))
+        if found is not None:
+            return found[0], TYPO
+        return NO_NODE, None
+
+    def is_leaf(self, node):
+        return self.results[node] is not None
+
+    def options_of(self, node):
+        """Noms des options du nœud, dans l'ordre de l'arbre."""
+        return [self.option_names[self.edge_opt[e]]
+                for e in range(self.edge_start[node], self.edge_start[node + 1])]
+
+    def path_of(self, node):
+        """Chemin d'options de la racine jusqu'au nœud (remonte les pointeurs parents)."""
+        path = []
+        while node > 0:
+            path.append(self.option_names[self.via[node]])
+            node = self.parent[node]
+        path.reverse()
+        return path
+
+    def node_by_name(self, name):
+        """Nœud d'identifiant stable `name`, ou NO_NODE."""
+        node = self._by_name.get(name)
+        return NO_NODE if node is None else node
+
+    def node_by_path(self, path):
+        """Comme follow(), en une recherche pour un chemin d'options canoniques (sauvegardes)."""
+        node = self._by_path.get(PATH_SEP.join(path))
+        return node if node is not None else self.follow(path)
+
+    def follow(self, path):
+        """Nœud atteint en rejouant un chemin depuis la racine, ou NO_NODE s'il est invalide."""
+        node = 0
+        for step in path:
+            opt = self.option_id(step)
+            node = self.step(node, opt) if opt != NO_NODE and not self.is_leaf(node) else NO_NODE
+            if node == NO_NODE:
+                return NO_NODE
+        return node
+
+
+def migration_map(old, new):
+    """
+    Pour chaque nœud de `old`, le nœud de `new` de même identifiant stable, ou à défaut
+    celui atteint en rejouant son chemin (NO_NODE si aucun des deux n'existe plus).
+    Calculé une fois par nœud, pas par utilisateur.
+    """
+    out = array("i")
+    for node in range(len(old)):
+        target = new.node_by_name(old.names[node]) if old.names[node] is not None else NO_NODE
+        if target == NO_NODE:
+            target = new.node_by_path(old.path_of(node))
+        out.append(target)
+    return out
@@ -1,77 +1,211 @@
 # features/history_manager.py
 # Gère l'historique des commandes de chaque utilisateur
-# Utilise les structures manuelles : HashTable + LinkedList
+# Utilise les structures manuelles : HashTable + UnrolledLinkedList (ou RingBuffer si rétention),
+# via un backend de stockage interchangeable (mémoire par défaut, ou SQLite)
+
+import time
 
-from structures.linked_list import LinkedList
 from structures.hashtable import HashTable
+from features.history_storage import MemoryHistoryStorage, parse_user_id as _parse_user_id
+from features.command_stats import CommandStats
+
+
+def _export_lines(cmds):
+    for i, c in enumerate(cmds, start=1):
+        yield f"{i}. {c}\n"
+
+
+class RetentionPolicy:
+    """
+    Politique de rétention de l'historique d'un utilisateur.
+    - max_entries: int | None -> ne garder que les N dernières commandes
+    - max_age: float | None   -> ne garder que les commandes de moins de max_age secondes
+    Un plafond d'entrées existe toujours (DEFAULT_MAX_ENTRIES si seul max_age est donné),
+    ce qui borne la mémoire par utilisateur.
+    """
+    DEFAULT_MAX_ENTRIES = 1000
+
+    def __init__(self, max_entries=None, max_age=None):
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries doit être > 0")
+        if max_age is not None and max_age <= 0:
+            raise ValueError("max_age doit être > 0")
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+    @property
+    def capacity(self):
+        return self.max_entries or self.DEFAULT_MAX_ENTRIES
+
 
 class HistoryManager:
-    def __init__(self):
-        # hashtable : key = user_id (int ou str), value = LinkedList instance
-        self._table = HashTable()
-
-    def _get_or_create_list(self, user_id):
-        """Récupère ou crée une liste chaînée pour l'utilisateur."""
-        lst = self._table.get(user_id)
-        if lst is None:
-            lst = LinkedList()
-            self._table.set(user_id, lst)
-        return lst
-
-    def add_command(self, user_id, command_str):
-        """Ajoute une commande à l'historique d'un utilisateur."""
-        lst = self._get_or_create_list(user_id)
-        lst.append(command_str)
+    def __init__(self, table_cls=HashTable, retention=None, clock=time.time, journal=None, storage=None):
+        # storage : backend d'historique (features.history_storage.HistoryStorage)
+        # par défaut tout en mémoire : HashTable (table_cls) + liste déroulée / tampon circulaire
+        self._clock = clock
+        self._storage = storage if storage is not None else MemoryHistoryStorage(table_cls, retention, clock)
+        # journal (ex: utils.history_log.HistoryLog) : reçoit chaque mutation
+        self._journal = journal
+        # utilisateurs modifiés depuis le dernier dump_delta() (HashTable utilisée comme ensemble)
+        self._table_cls = table_cls
+        self._dirty = table_cls()
+        # compteurs de commandes (totaux, fréquences, classement), à jour à chaque ajout
+        self._stats = CommandStats(table_cls)
+        self._counting = True
+
+    @property
+    def storage(self):
+        return self._storage
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def _record_mutation(self, op, user_id, cmd=None, now=None):
+        if not self._storage.durable:
+            self._dirty.set(user_id, True)
+        if self._journal is not None:
+            self._journal.record(op, user_id, cmd, now)
+
+    def attach_snapshot(self, snapshot):
+        """Branche un snapshot binaire : les historiques seront chargés à la demande."""
+        self._storage.attach_snapshot(snapshot)
+
+    def add_command(self, user_id, command_str, now=None):
+        """Ajoute une commande à l'historique d'un utilisateur (now : horodatage de réception)."""
+        if now is None:
+            now = self._clock()
+        self._storage.append(user_id, command_str, now)
+        self._record_mutation("add", user_id, command_str, now)
+        if self._counting:
+            self._stats.record(user_id, command_str)
+
+    def add_commands(self, entries):
+        """Ajoute un lot de (user_id, commande, horodatage ou None), dans l'ordre. Retourne le nombre ajouté."""
+        n = 0
+        for user_id, command_str, now in entries:
+            self.add_command(user_id, command_str, now)
+            n += 1
+        return n
 
     def get_last_command(self, user_id):
         """Retourne la dernière commande de l'utilisateur (ou None)."""
-        lst = self._table.get(user_id)
-        if lst is None:
-            return None
-        return lst.get_last()
+        return self._storage.get_last(user_id)
 
     def get_all_commands(self, user_id):
         """Retourne la liste (Python list) de toutes les commandes de l'utilisateur."""
-        lst = self._table.get(user_id)
-        if lst is None:
-            return []
-        return lst.get_all()
+        return self._storage.get_all(user_id)
+
+    def count_commands(self, user_id):
+        """Nombre de commandes conservées pour l'utilisateur (O(1))."""
+        return self._storage.count(user_id)
+
+    def iter_recent(self, user_id, offset=0):
+        """
+        Curseur paresseux depuis la fin de l'historique : génère (numéro, commande)
+        du plus récent au plus ancien, en sautant les `offset` plus récentes.
+        Rien n'est copié ni formaté au-delà de ce qui est effectivement lu.
+        """
+        return self._storage.iter_recent(user_id, offset)
+
+    def get_page(self, user_id, page=1, page_size=10):
+        """
+        Retourne (entrées, page, nb_pages) ; la page 1 contient les commandes les plus récentes.
+        entrées = [(numéro, commande), ...] dans l'ordre chronologique.
+        La page demandée est ramenée dans [1, nb_pages].
+        """
+        total = self.count_commands(user_id)
+        if total == 0:
+            return [], 1, 1
+        pages = (total + page_size - 1) // page_size
+        page = max(1, min(page, pages))
+        entries = []
+        for entry in self.iter_recent(user_id, (page - 1) * page_size):
+            entries.append(entry)
+            if len(entries) == page_size:
+                break
+        entries.reverse()
+        return entries, page, pages
 
     def clear_history(self, user_id):
         """Vide l'historique d'un utilisateur."""
-        lst = self._table.get(user_id)
-        if lst:
-            lst.clear()
+        if self._storage.clear(user_id):
+            self._record_mutation("clear", user_id)
+        if self._counting:
+            self._stats.forget(user_id)
 
     def delete_user_history(self, user_id):
         """Supprime complètement l'entrée de la table pour cet utilisateur."""
-        self._table.delete(user_id)
+        if self._storage.delete(user_id):
+            self._record_mutation("delete", user_id)
+        if self._counting:
+            self._stats.forget(user_id)
+
+    def iter_export_lines(self, user_id):
+        """
+        Lignes d'export "n. commande\n", générées à la demande. Les commandes sont copiées
+        à l'appel : le générateur peut ensuite être consommé dans un thread sans toucher
+        aux structures de la boucle.
+        """
+        return _export_lines(self.get_all_commands(user_id))
 
     def export_history_text(self, user_id):
         """Retourne l'historique sous forme de texte (utile pour un export)."""
-        cmds = self.get_all_commands(user_id)
-        if not cmds:
-            return ""
-        lines = [f"{i+1}. {c}" for i, c in enumerate(cmds)]
-        return "\n".join(lines)
+        text = "".join(self.iter_export_lines(user_id))
+        return text[:-1]    # sans le dernier saut de ligne ("" si vide)
 
     # Sauvegarde/chargement (pour plus tard)
     def dump_for_save(self):
         """Transforme les données en dictionnaire serialisable pour sauvegarde."""
+        return self._storage.dump()
+
+    def dirty_count(self):
+        """Nombre d'utilisateurs modifiés depuis le dernier dump_delta()."""
+        return len(self._dirty)
+
+    def dump_delta(self):
+        """
+        Comme dump_for_save, mais seulement pour les utilisateurs modifiés depuis le dernier appel.
+        Un utilisateur supprimé vaut None. Remet le suivi à zéro.
+        """
+        dirty, self._dirty = self._dirty, self._table_cls()
         out = {}
-        for key in self._table.keys():
-            ll = self._table.get(key)
-            out[str(key)] = ll.get_all() if ll else []
+        for user_id in dirty.keys():
+            exists = self._storage.exists(user_id)
+            out[str(user_id)] = self._storage.saved(user_id) if exists else None
         return out
 
+    def restore_dirty(self, delta):
+        """Remarque comme modifiés les utilisateurs d'un delta non écrit (échec de sauvegarde)."""
+        for k in delta:
+            self._dirty.set(_parse_user_id(k), True)
+
+    def apply_delta(self, delta):
+        """Fusionne un delta (voir dump_delta) : remplace les utilisateurs présents, supprime les None."""
+        for k, cmds in delta.items():
+            if cmds is None:
+                self._storage.delete(_parse_user_id(k))
+            else:
+                self._storage.load({k: cmds})
+
     def load_from_data(self, data_dict):
         """Recharge les données sauvegardées."""
-        for k, cmds in data_dict.items():
-            try:
-                user_id = int(k)
-            except ValueError:
-                user_id = k
-            ll = LinkedList()
-            for c in cmds:
-                ll.append(c)
-            self._table.set(user_id, ll)
+        self._storage.load(data_dict)
+
+    def apply_log_record(self, record):
+        """Applique un enregistrement du journal (relecture au démarrage, sans re-journaliser)."""
+        user_id = _parse_user_id(record["user"])
+        journal, self._journal = self._journal, None
+        # déjà compté dans les statistiques sauvegardées de cet utilisateur : on ne le recompte pas
+        self._counting = self._stats.counts_record(user_id, record.get("seq"))
+        try:
+            op = record.get("op")
+            if op == "add":
+                self.add_command(user_id, record["cmd"], record.get("ts"))
+            elif op == "clear":
+                self.clear_history(user_id)
+            elif op == "delete":
+                self.delete_user_history(user_id)
+        finally:
+            self._journal = journal
+            self._counting = True
@@ -0,0 +1,266 @@
+# features/history_storage.py
+# Stockage de l'historique utilisé par HistoryManager (interface "backend")
+# - HistoryStorage       : interface commune
+# - MemoryHistoryStorage : tout en RAM (HashTable + UnrolledLinkedList / RingBuffer),
+#                          avec snapshot binaire paresseux optionnel
+# Un backend SQLite est disponible dans features/sqlite_history_storage.py
+
+import time
+from abc import ABC, abstractmethod
+
+from structures.linked_list import UnrolledLinkedList
+from structures.hashtable import HashTable
+from structures.ring_buffer import RingBuffer
+
+
+def parse_user_id(k):
+    """Les clés JSON sont des str : on retrouve l'ID entier si possible."""
+    try:
+        return int(k)
+    except ValueError:
+        return k
+
+
+def pack_entries(cmds, stamps=None):
+    """
+    Valeur sauvegardée d'un utilisateur : la liste de ses commandes, ou
+    {"cmds": [...], "ts": [...]} quand leurs horodatages comptent (rétention par âge).
+    """
+    return cmds if stamps is None else {"cmds": cmds, "ts": stamps}
+
+
+def unpack_entries(value):
+    """(commandes, horodatages ou None) d'une valeur sauvegardée (voir pack_entries)."""
+    if isinstance(value, dict):
+        return value["cmds"], value.get("ts")
+    return value, None
+
+
+class HistoryStorage(ABC):
+    """
+    Interface d'un backend d'historique. Les commandes d'un utilisateur sont
+    ordonnées de la plus ancienne à la plus récente.
+    durable = True : le backend persiste lui-même chaque écriture (après flush),
+    HistoryManager n'a alors pas à suivre les utilisateurs modifiés.
+    """
+    durable = False
+
+    @abstractmethod
+    def append(self, user_id, command_str, now):
+        """Ajoute une commande (now = horodatage, pour la rétention par âge)."""
+
+    @abstractmethod
+    def get_all(self, user_id):
+        """Toutes les commandes de l'utilisateur (liste Python, éventuellement vide)."""
+
+    def saved(self, user_id):
+        """Valeur à sauvegarder pour l'utilisateur (voir pack_entries)."""
+        return self.get_all(user_id)
+
+    @abstractmethod
+    def get_last(self, user_id):
+        """Dernière commande de l'utilisateur (ou None)."""
+
+    @abstractmethod
+    def count(self, user_id):
+        """Nombre de commandes conservées pour l'utilisateur."""
+
+    @abstractmethod
+    def iter_recent(self, user_id, offset=0):
+        """Génère (numéro, commande) du plus récent au plus ancien, après `offset` commandes."""
+
+    @abstractmethod
+    def exists(self, user_id):
+        """True si l'utilisateur a une entrée (même vide)."""
+
+    @abstractmethod
+    def clear(self, user_id):
+        """Vide l'historique. Retourne True si l'utilisateur existait."""
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Supprime l'utilisateur. Retourne True s'il existait."""
+
+    @abstractmethod
+    def dump(self):
+        """Dict sérialisable {str(user_id): valeur sauvegardée (voir pack_entries)}."""
+
+    @abstractmethod
+    def load(self, data_dict):
+        """Charge (remplace) les utilisateurs d'un dict produit par dump()."""
+
+    def attach_snapshot(self, snapshot):
+        """Branche un snapshot binaire paresseux (si le backend le permet)."""
+        raise TypeError(f"{type(self).__name__} ne gère pas les snapshots")
+
+    def flush(self):
+        """Écrit ce qui est en attente (no-op pour un backend en mémoire)."""
+        return 0
+
+    def close(self):
+        pass
+
+
+class MemoryHistoryStorage(HistoryStorage):
+    def __init__(self, table_cls=HashTable, retention=None, clock=time.time):
+        # hashtable : key = user_id (int ou str), value = UnrolledLinkedList (ou RingBuffer) instance
+        # table_cls permet de choisir HashTable (chaînage) ou OpenHashTable (compacte)
+        self._table_cls = table_cls
+        self._table = table_cls()
+        # retention=None : historique illimité (liste déroulée), sinon tampon circulaire borné
+        self._retention = retention
+        self._clock = clock
+        # snapshot binaire paresseux (utils.binary_snapshot) : un utilisateur n'est
+        # décodé qu'à son premier accès ; _deleted masque ceux supprimés depuis
+        self._snapshot = None
+        self._deleted = table_cls()
+
+    def _new_list(self):
+        if self._retention is None:
+            return UnrolledLinkedList()
+        return RingBuffer(self._retention.capacity)
+
+    def _keeps_stamps(self):
+        """Les horodatages ne sont sauvegardés que s'ils servent (rétention par âge)."""
+        return self._retention is not None and self._retention.max_age is not None
+
+    def _fill(self, value, now):
+        """Liste d'un utilisateur reconstruite depuis une valeur sauvegardée."""
+        cmds, stamps = unpack_entries(value)
+        lst = self._new_list()
+        if stamps is None:
+            # ancienne sauvegarde sans horodatages : les commandes datent du chargement
+            for c in cmds:
+                self._append(lst, c, now)
+        else:
+            for c, stamp in zip(cmds, stamps):
+                self._append(lst, c, stamp)
+            if self._keeps_stamps():
+                lst.drop_older_than(now - self._retention.max_age)
+        return lst
+
+    def _saved_list(self, lst):
+        if not lst:
+            return []
+        if self._keeps_stamps():
+            return pack_entries(lst.get_all(), lst.get_stamps())
+        return lst.get_all()
+
+    def _append(self, lst, command_str, now):
+        if self._retention is None:
+            lst.append(command_str)
+            return
+        lst.append(command_str, now)
+        if self._retention.max_age is not None:
+            lst.drop_older_than(now - self._retention.max_age)
+
+    def attach_snapshot(self, snapshot):
+        """
+        Branche un snapshot binaire : les historiques seront chargés à la demande.
+        Rebrancher un snapshot plus récent (après compaction) garde les suppressions
+        qu'il ne reflète pas encore ; fermer l'ancien revient au store qui l'a ouvert.
+        """
+        deleted = self._table_cls()
+        for user_id in self._deleted.keys():
+            if user_id in snapshot:
+                deleted.set(user_id, True)
+        self._snapshot = snapshot
+        self._deleted = deleted
+
+    def _in_snapshot(self, user_id):
+        return (self._snapshot is not None and self._deleted.get(user_id) is None
+                and user_id in self._snapshot)
+
+    def _lookup(self, user_id):
+        """Liste de l'utilisateur (ou None) ; la matérialise depuis le snapshot au premier accès."""
+        lst = self._table.get(user_id)
+        if lst is None and self._snapshot is not None and self._deleted.get(user_id) is None:
+            value = self._snapshot.read_entries(user_id)
+            if value is not None:
+                lst = self._fill(value, self._clock())
+                self._table.set(user_id, lst)
+        return lst
+
+    def _get_list(self, user_id):
+        """Récupère la liste de l'utilisateur (ou None), sans les entrées expirées."""
+        lst = self._lookup(user_id)
+        if lst is not None and self._retention is not None and self._retention.max_age is not None:
+            lst.drop_older_than(self._clock() - self._retention.max_age)
+        return lst
+
+    def append(self, user_id, command_str, now):
+        lst = self._lookup(user_id)
+        if lst is None:
+            lst = self._new_list()
+            self._table.set(user_id, lst)
+        self._append(lst, command_str, now)
+
+    def get_all(self, user_id):
+        lst = self._get_list(user_id)
+        return lst.get_all() if lst is not None else []
+
+    def saved(self, user_id):
+        lst = self._get_list(user_id)
+        return self._saved_list(lst) if lst is not None else []
+
+    def get_last(self, user_id):
+        lst = self._get_list(user_id)
+        return lst.get_last() if lst is not None else None
+
+    def count(self, user_id):
+        if (self._table.get(user_id) is None and not self._keeps_stamps()
+                and self._in_snapshot(user_id)):
+            # pas encore matérialisé : lu dans l'en-tête du bloc, sans décoder
+            # (pas avec une rétention par âge : l'en-tête compte aussi les commandes expirées)
+            n = self._snapshot.count(user_id)
+            return min(n, self._retention.capacity) if self._retention is not None else n
+        lst = self._get_list(user_id)
+        return len(lst) if lst is not None else 0
+
+    def iter_recent(self, user_id, offset=0):
+        lst = self._get_list(user_id)
+        if lst is None:
+            return
+        number = len(lst) - offset
+        for cmd in lst.iter_reverse(offset):
+            yield number, cmd
+            number -= 1
+
+    def exists(self, user_id):
+        return self._table.get(user_id) is not None or self._in_snapshot(user_id)
+
+    def clear(self, user_id):
+        lst = self._lookup(user_id)
+        if lst is None:
+            return False
+        lst.clear()
+        return True
+
+    def delete(self, user_id):
+        deleted = self._table.delete(user_id)
+        if self._in_snapshot(user_id):
+            self._deleted.set(user_id, True)
+            deleted = True
+        return deleted
+
+    def dump(self):
+        # une seule passe sur la table : pas de keys() + get() (double hachage)
+        out = {}
+        for key, ll in self._table.items():
+            out[str(key)] = self._saved_list(ll)
+        if self._snapshot is not None:
+            # utilisateurs jamais touchés : lus directement dans le snapshot
+            for key in self._snapshot.keys():
+                if key not in out and self._deleted.get(parse_user_id(key)) is None:
+                    out[key] = self._snapshot.read_entries(key)
+        return out
+
+    def load(self, data_dict):
+        now = self._clock()
+        pairs = [(parse_user_id(k), self._fill(value, now)) for k, value in data_dict.items()]
+        # table prédimensionnée : aucun rehash pendant le chargement
+        self._table.set_many(pairs)
+
+    def __len__(self):
+        """Nombre d'utilisateurs matérialisés en mémoire."""
+        return len(self._table)
@@ -0,0 +1,397 @@
+# features/sqlite_history_storage.py
+# Backend d'historique sur SQLite (module standard sqlite3), pour un historique
+# qui dépasse la RAM sans ralentir le démarrage (rien n'est chargé à l'ouverture).
+#
+# - table history(user_id, seq, command, ts) indexée par la clé primaire (user_id, seq)
+# - table users(user_id, next_seq, count) : compteurs par utilisateur
+# - les ajouts, vidages et suppressions sont mis en attente puis écrits par lots dans une
+#   seule transaction (flush() : appelé par la sauvegarde automatique, dans un thread,
+#   ou dès batch_size opérations en attente) ; seules les lectures interrogent la base
+# - deux verrous : _lock protège la connexion (flush et lectures, dans des threads),
+#   _state_lock, tenu brièvement, protège la file d'attente et le cache. Les écritures
+#   appelées depuis la boucle asyncio ne prennent que _state_lock et ne touchent jamais
+#   à la connexion : un flush ou un gros export en cours ne bloque pas la boucle.
+#   Ordre de prise : _lock puis _state_lock, jamais l'inverse.
+# - cache LRU des utilisateurs récents : compteurs + dernières commandes, ce qui sert
+#   get_last / count / la première page de !history sans requête
+# - les lectures plus profondes passent par des requêtes indexées (ORDER BY seq + LIMIT)
+# - rétention par âge : l'horodatage de la plus ancienne commande est gardé en cache,
+#   la base n'est nettoyée que lorsqu'une commande a réellement expiré
+#
+# Les seq d'un utilisateur sont contigus : ses commandes conservées ont les seq
+# [next_seq - count, next_seq), la rétention ne supprimant que les plus anciennes.
+
+import os
+import sqlite3
+import threading
+import time
+
+from structures.lru_cache import LRUCache
+from structures.ring_buffer import RingBuffer
+from structures.hashtable import HashTable
+from features.history_storage import HistoryStorage, pack_entries, unpack_entries
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    user_id TEXT NOT NULL,
+    seq     INTEGER NOT NULL,
+    command TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    PRIMARY KEY (user_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS users (
+    user_id  TEXT PRIMARY KEY,
+    next_seq INTEGER NOT NULL,
+    count    INTEGER NOT NULL
+);
+"""
+
+
+class _UserInfo:
+    __slots__ = ("next_seq", "count", "recent", "oldest")
+
+    def __init__(self, next_seq, count, hot_size):
+        self.next_seq = next_seq
+        self.count = count
+        # dernières commandes (avec leur horodatage), les plus récentes en fin
+        self.recent = RingBuffer(hot_size)
+        # horodatage de la plus ancienne commande conservée (None : aucune) ;
+        # peut être plus ancien que la réalité, jamais plus récent
+        self.oldest = None
+
+
+class SqliteHistoryStorage(HistoryStorage):
+    # les données sont déjà persistées : HistoryManager n'a pas besoin du suivi "sale"
+    durable = True
+
+    def __init__(self, path, retention=None, clock=time.time, batch_size=500,
+                 cache_size=1024, hot_size=20, read_chunk=64):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._retention = retention
+        self._clock = clock
+        self.batch_size = batch_size
+        # jamais plus de commandes chaudes que la rétention n'en conserve
+        self._hot_size = min(hot_size, retention.capacity) if retention is not None else hot_size
+        self._read_chunk = read_chunk
+        # connexion partagée par les threads (sauvegarde, lectures), protégée par _lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # file d'attente et cache, protégés par _state_lock (verrou court, pris par la boucle)
+        self._state_lock = threading.Lock()
+        self._cache = LRUCache(cache_size)
+        # opérations en attente, dans l'ordre : ("add", user_id, commande, ts),
+        # ("clear", user_id) ou ("delete", user_id) ; les seq sont attribués au flush
+        self._pending = []
+        # utilisateurs ayant des opérations en attente : la base n'est pas à jour pour eux
+        self._unflushed = HashTable()
+
+    # -----------------------------
+    # Infos par utilisateur (threads, _lock tenu)
+    # -----------------------------
+    def _sync(self, key):
+        """Écrit les opérations en attente si cet utilisateur en a (la base fait alors foi)."""
+        with self._state_lock:
+            dirty = self._unflushed.get(key) is not None
+        if dirty:
+            self._flush_locked()
+
+    def _info(self, key):
+        """_UserInfo de l'utilisateur (clé str), ou None s'il n'existe pas."""
+        with self._state_lock:
+            info = self._cache.get(key)
+        if info is not None:
+            return info
+        self._sync(key)
+        row = self._conn.execute(
+            "SELECT next_seq, count FROM users WHERE user_id = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        info = _UserInfo(row[0], row[1], self._hot_size)
+        rows = self._conn.execute(
+            "SELECT command, ts FROM history WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+            (key, self._hot_size)).fetchall()
+        for command, ts in reversed(rows):
+            info.recent.append(command, ts)
+        if self._retention is not None and self._retention.max_age is not None:
+            info.oldest = rows[-1][1] if rows and info.count <= len(rows) else self._oldest_in_db(key)
+        with self._state_lock:
+            # une écriture arrivée entre-temps n'a pas pu mettre ces infos à jour : pas de cache
+            if self._unflushed.get(key) is None:
+                self._cache.put(key, info)
+        return info
+
+    def _oldest_in_db(self, key):
+        row = self._conn.execute(
+            "SELECT ts FROM history WHERE user_id = ? ORDER BY seq LIMIT 1", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _prune_age(self, key, info):
+        """Rétention par âge : supprime les commandes expirées de cet utilisateur (s'il y en a)."""
+        if info is None or self._retention is None or self._retention.max_age is None:
+            return
+        cutoff = self._clock() - self._retention.max_age
+        with self._state_lock:
+            info.recent.drop_older_than(cutoff)
+            oldest = info.oldest
+        if oldest is None or oldest >= cutoff:
+            return      # rien d'expiré : aucune requête
+        self._sync(key)
+        with self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM history WHERE user_id = ? AND ts < ?", (key, cutoff)).rowcount
+            if removed > 0:
+                self._conn.execute(
+                    "UPDATE users SET count = count - ? WHERE user_id = ?", (removed, key))
+        oldest = self._oldest_in_db(key)
+        with self._state_lock:
+            info.count = max(0, info.count - removed)
+            if oldest is None and len(info.recent):
+                oldest = info.recent.get_stamps()[0]     # ajouté depuis, pas encore écrit
+            info.oldest = oldest
+
+    def _read_info(self, user_id):
+        key = str(user_id)
+        info = self._info(key)
+        self._prune_age(key, info)
+        return key, info
+
+    # -----------------------------
+    # Écritures (boucle asyncio : file d'attente et cache seulement)
+    # -----------------------------
+    def _queue(self, op):
+        self._pending.append(op)
+        self._unflushed.set(op[1], True)
+        return bool(self.batch_size) and len(self._pending) >= self.batch_size
+
+    def append(self, user_id, command_str, now):
+        key = str(user_id)
+        with self._state_lock:
+            full = self._queue(("add", key, command_str, now))
+            # utilisateur en cache : ses infos suivent, sinon elles seront relues après le flush
+            info = self._cache.get(key)
+            if info is not None:
+                info.next_seq += 1
+                info.count += 1
+                if self._retention is not None:
+                    info.count = min(info.count, self._retention.capacity)
+                info.recent.append(command_str, now)
+                if info.oldest is None:
+                    info.oldest = now
+        if full:
+            self.flush()
+
+    def clear(self, user_id):
+        """Vidage mis en attente, sans requête : l'existence n'est vérifiée qu'au flush (retourne True)."""
+        key = str(user_id)
+        with self._state_lock:
+            self._queue(("clear", key))
+            info = self._cache.get(key)
+            if info is not None:
+                info.count = 0
+                info.recent.clear()
+                info.oldest = None
+        return True
+
+    def delete(self, user_id):
+        """Suppression mise en attente, sans requête (retourne True, comme clear)."""
+        key = str(user_id)
+        with self._state_lock:
+            self._queue(("delete", key))
+            self._cache.remove(key)
+        return True
+
+    def _flush_locked(self):
+        with self._state_lock:
+            ops, self._pending = self._pending, []
+            self._unflushed = HashTable()
+        if not ops:
+            return 0
+        try:
+            with self._conn:
+                written = self._apply(ops)
+        except Exception:
+            # transaction annulée : tout reste en attente pour le prochain flush
+            with self._state_lock:
+                self._pending = ops + self._pending
+                for op in ops:
+                    self._unflushed.set(op[1], True)
+            raise
+        return written
+
+    def _apply(self, ops):
+        """Rejoue les opérations dans la transaction en cours. Retourne le nombre de lignes ajoutées."""
+        cap = self._retention.capacity if self._retention is not None else None
+        users = {}        # user_id -> [next_seq, count, existe]
+        rows = {}         # user_id -> lignes à insérer
+        cleared = {}      # user_id -> seq limite (commandes plus anciennes supprimées)
+        wiped = set()     # utilisateurs effacés de la base avant les insertions
+        for op in ops:
+            key = op[1]
+            state = users.get(key)
+            if state is None:
+                row = self._conn.execute(
+                    "SELECT next_seq, count FROM users WHERE user_id = ?", (key,)).fetchone()
+                state = users[key] = [row[0], row[1], True] if row is not None else [0, 0, False]
+            if op[0] == "add":
+                rows.setdefault(key, []).append((key, state[0], op[2], op[3]))
+                state[0] += 1
+                state[1] = state[1] + 1 if cap is None else min(state[1] + 1, cap)
+                state[2] = True
+            elif op[0] == "clear":
+                if state[2]:
+                    rows.pop(key, None)
+                    cleared[key] = state[0]
+                    state[1] = 0
+            else:
+                # supprimé puis éventuellement recréé dans le même lot : repart de seq 0
+                rows.pop(key, None)
+                cleared.pop(key, None)
+                wiped.add(key)
+                users[key] = [0, 0, False]
+        for key in wiped:
+            self._conn.execute("DELETE FROM history WHERE user_id = ?", (key,))
+            self._conn.execute("DELETE FROM users WHERE user_id = ?", (key,))
+        self._conn.executemany(
+            "DELETE FROM history WHERE user_id = ? AND seq < ?", list(cleared.items()))
+        inserted = [row for key_rows in rows.values() for row in key_rows]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO history (user_id, seq, command, ts) VALUES (?, ?, ?, ?)", inserted)
+        live = [(key, state[0], state[1]) for key, state in users.items() if state[2]]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO users (user_id, next_seq, count) VALUES (?, ?, ?)", live)
+        if cap is not None:
+            # rétention par nombre : on ne garde que les `capacity` derniers seq
+            self._conn.executemany(
+                "DELETE FROM history WHERE user_id = ? AND seq < ?",
+                [(key, next_seq - count) for key, next_seq, count in live])
+        return len(inserted)
+
+    def flush(self):
+        """Écrit les opérations en attente en une transaction (thread). Retourne le nombre de lignes écrites."""
+        with self._lock:
+            return self._flush_locked()
+
+    def pending_count(self):
+        with self._state_lock:
+            return len(self._pending)
+
+    def load(self, data_dict):
+        # sans horodatages sauvegardés (ancien format), les commandes datent du chargement
+        now = self._clock()
+        cap = self._retention.capacity if self._retention is not None else None
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                for k, value in data_dict.items():
+                    key = str(k)
+                    cmds, stamps = unpack_entries(value)
+                    if stamps is None:
+                        stamps = [now] * len(cmds)
+                    if cap is not None:
+                        cmds, stamps = cmds[-cap:], stamps[-cap:]
+                    self._conn.execute("DELETE FROM history WHERE user_id = ?", (key,))
+                    self._conn.executemany(
+                        "INSERT INTO history (user_id, seq, command, ts) VALUES (?, ?, ?, ?)",
+                        [(key, i, c, ts) for i, (c, ts) in enumerate(zip(cmds, stamps))])
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO users (user_id, next_seq, count) VALUES (?, ?, ?)",
+                        (key, len(cmds), len(cmds)))
+                    with self._state_lock:
+                        self._cache.remove(key)
+
+    # -----------------------------
+    # Lectures
+    # -----------------------------
+    def exists(self, user_id):
+        with self._lock:
+            return self._info(str(user_id)) is not None
+
+    def count(self, user_id):
+        with self._lock:
+            _, info = self._read_info(user_id)
+            if info is None:
+                return 0
+            with self._state_lock:
+                return info.count
+
+    def get_last(self, user_id):
+        with self._lock:
+            _, info = self._read_info(user_id)
+            if info is None:
+                return None
+            with self._state_lock:
+                return info.recent.get_last()
+
+    def get_all(self, user_id):
+        with self._lock:
+            key, info = self._read_info(user_id)
+            if info is None:
+                return []
+            with self._state_lock:
+                if info.count <= len(info.recent):
+                    return info.recent.get_all()
+            self._sync(key)
+            rows = self._conn.execute(
+                "SELECT command FROM history WHERE user_id = ? ORDER BY seq", (key,)).fetchall()
+            return [r[0] for r in rows]
+
+    def iter_recent(self, user_id, offset=0):
+        with self._lock:
+            key, info = self._read_info(user_id)
+            if info is None:
+                return
+            with self._state_lock:
+                total, next_seq = info.count, info.next_seq
+                hot = info.recent.get_last_n(len(info.recent))
+        number = total - offset
+        # 1) commandes chaudes, sans requête
+        i = len(hot) - 1 - offset
+        while i >= 0 and number > 0:
+            yield number, hot[i]
+            number -= 1
+            i -= 1
+        # 2) la suite par morceaux de read_chunk, via l'index (user_id, seq)
+        while number > 0:
+            seq = next_seq - 1 - (total - number)
+            with self._lock:
+                self._sync(key)
+                rows = self._conn.execute(
+                    "SELECT command FROM history WHERE user_id = ? AND seq <= ? "
+                    "ORDER BY seq DESC LIMIT ?", (key, seq, self._read_chunk)).fetchall()
+            if not rows:
+                return
+            for (command,) in rows:
+                yield number, command
+                number -= 1
+                if number == 0:
+                    return
+
+    def dump(self):
+        cmds, stamps = {}, {}
+        with self._lock:
+            self._flush_locked()
+            for (key,) in self._conn.execute("SELECT user_id FROM users"):
+                cmds[key], stamps[key] = [], []
+            for key, command, ts in self._conn.execute(
+                    "SELECT user_id, command, ts FROM history ORDER BY user_id, seq"):
+                cmds[key].append(command)
+                stamps[key].append(ts)
+        if self._retention is None or self._retention.max_age is None:
+            return cmds
+        return {key: pack_entries(cmds[key], stamps[key]) for key in cmds}
+
+    def __len__(self):
+        """Nombre d'utilisateurs enregistrés."""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
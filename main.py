@@ -1,71 +1,346 @@
 # main.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
 import discord
 from discord.ext import commands
-from bot_config import COMMAND_PREFIX, INTENTS, get_token
+from bot_config import (COMMAND_PREFIX, INTENTS, HISTORY_MAX_ENTRIES, HISTORY_MAX_AGE,
+                        HISTORY_BACKEND, HISTORY_DB_PATH,
+                        AUTOSAVE_INTERVAL, AUTOSAVE_EVERY, SHARD_COUNT, LOCK_LEASE,
+                        LOCK_WAIT_TIMEOUT, CONVERSATION_MAX_SESSIONS, CONVERSATION_SESSION_TTL,
+                        INGEST_QUEUE_SIZE, INGEST_BATCH_SIZE, INGEST_PUT_TIMEOUT,
+                        EXPORT_GZIP_MIN_BYTES, get_token)
 
-from features.history_manager import HistoryManager
+from structures.hashtable import HashTable
+from features.history_manager import HistoryManager, RetentionPolicy
+from features.sqlite_history_storage import SqliteHistoryStorage
 from features.conversation_manager import ConversationManager
-from utils.persistence import save_json, load_json
-from utils.lock_system import LockSystem
+from features.conversation_loader import TreeValidationError
+from features.command_stats import convert_legacy_dump
+from utils.persistence import load_json
+from utils.history_log import HistoryLog
+from utils.binary_snapshot import open_snapshot, SEQ_KEY
+from utils.sharded_store import ShardedJsonStore, ShardedBinarySnapshotStore
+from utils.autosave import AutoSaver
+from utils.lock_system import LockSystem, READ, WRITE
+from utils.lease_scheduler import LeaseScheduler
+from utils.ingest_queue import IngestQueue
+from utils.export_buffer import export_to_buffer_auto
 
 # -------------------------------------
 # Initialisation du bot et des gestionnaires
 # -------------------------------------
 bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=INTENTS)
 
-history = HistoryManager()
-conversation = ConversationManager()
-locksys = LockSystem()
+retention = None
+if HISTORY_MAX_ENTRIES is not None or HISTORY_MAX_AGE is not None:
+    retention = RetentionPolicy(max_entries=HISTORY_MAX_ENTRIES, max_age=HISTORY_MAX_AGE)
+# L'historique est journalisé : data/history.log (ajout seul) + snapshots binaires découpés en shards
+# (data/history/history_NNN.bin, chargés paresseusement via mmap).
+# batch_size=None : les lots sont écrits par l'autosave, jamais sur la boucle.
+# Avec HISTORY_BACKEND = "sqlite", l'historique vit dans HISTORY_DB_PATH (pas de journal) :
+# l'autosave ne fait qu'écrire les écritures en attente en une transaction (dans son thread),
+# et les lectures des commandes passent par un thread (history_read).
+LEGACY_HISTORY_JSON = "data/history_data.json"
+LEGACY_HISTORY_BIN = "data/history_data.bin"
+LEGACY_CONVERSATION_JSON = "data/conversation_data.json"
+history_store = ShardedBinarySnapshotStore("data/history", "history", SHARD_COUNT)
+conversation_store = ShardedJsonStore("data/conversations", "conversation", SHARD_COUNT)
+history_log = HistoryLog("data/history.log", history_store, batch_size=None)
+if HISTORY_BACKEND == "sqlite":
+    history = HistoryManager(storage=SqliteHistoryStorage(HISTORY_DB_PATH, retention=retention,
+                                                          batch_size=None))
+else:
+    history = HistoryManager(retention=retention, journal=history_log)
+# arbres de conversation : conversation_trees/*.json, forme compilée en cache dans data/cache
+# sessions inactives évincées de la mémoire, relues dans leur shard au message suivant
+conversation = ConversationManager(cache_dir="data/cache",
+                                   max_sessions=CONVERSATION_MAX_SESSIONS,
+                                   session_ttl=CONVERSATION_SESSION_TTL,
+                                   spill=conversation_store.load_user)
+locksys = LockSystem(lease=LOCK_LEASE)
+
+def _log_lock_expired(resource, old, new):
+    suite = f"transféré à {new}" if new is not None else "libéré"
+    print(f"⌛ Bail expiré sur '{resource}' (détenteur {old}) : lock {suite}.")
+
+lease_scheduler = LeaseScheduler(locksys, on_expired=_log_lock_expired)
+
+# Locks hiérarchiques : "history" couvre tout l'historique, "history:<id>" celui d'un utilisateur.
+# Lire ou écrire son propre historique ne dépend que de ces deux ressources.
+LOCKED_MSG = "⛔ L'historique est verrouillé par un autre utilisateur. Réessaie plus tard."
+
+def history_resource(user_id):
+    return f"history:{user_id}"
+
+@asynccontextmanager
+async def history_access(user_id, mode):
+    """
+    Donne accès à l'historique de user_id (True), ou False après LOCK_WAIT_TIMEOUT secondes.
+    Sans conflit : vérification O(1), aucun lock posé (les lectures/écritures de
+    l'historique sont synchrones, rien ne peut s'intercaler sur la boucle).
+    En cas de conflit : on attend son tour dans la file, réveillé par la libération.
+    """
+    resource = history_resource(user_id)
+    allowed = locksys.can_read if mode == READ else locksys.can_write
+    if allowed(resource, user_id):
+        yield True
+        return
+    status = await locksys.acquire_async(resource, user_id, mode, timeout=LOCK_WAIT_TIMEOUT)
+    try:
+        yield status in ("acquired", "already")
+    finally:
+        # "already" : lock (ou place en file) demandé par l'utilisateur lui-même, il le garde
+        if status == "acquired":
+            locksys.release(resource, user_id)
+
+async def history_read(fn, *args):
+    """
+    Lecture de l'historique : dans un thread avec SQLite (requêtes disque, backend protégé
+    par son propre verrou), directement en mémoire (HashTable : boucle uniquement).
+    """
+    if history.storage.durable:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+# Sauvegarde automatique : instantané sur la boucle, écriture atomique dans un thread.
+# Seuls les utilisateurs modifiés depuis la dernière sauvegarde sont écrits (delta).
+def _restore_history_delta(prepared):
+    if prepared[1]:
+        history.restore_dirty(prepared[1])
+
+def _conversation_delta():
+    # sessions inactives : évincées avant la sauvegarde, leur dernier état part dans ce delta
+    conversation.evict_idle()
+    delta = conversation.dump_delta()
+    return delta or None
+
+def describe_save(results):
+    """Résumé d'une sauvegarde : nombre d'utilisateurs réellement écrits."""
+    records, hist_users = results.get("history", (0, 0))
+    conv_users = results.get("conversation", 0)
+    return (f"{records} commande(s) journalisée(s), "
+            f"{hist_users + conv_users} utilisateur(s) écrit(s) "
+            f"(historique: {hist_users}, conversations: {conv_users})")
+
+def _log_autosave(results):
+    print(f"💾 Autosave : {describe_save(results)}")
+
+autosaver = AutoSaver(interval=AUTOSAVE_INTERVAL, every_n=AUTOSAVE_EVERY, on_saved=_log_autosave)
+if HISTORY_BACKEND == "sqlite":
+    # (commandes écrites, 0) : même forme que HistoryLog.commit pour describe_save
+    autosaver.add_job("history", lambda: history.storage.pending_count() or None,
+                      lambda _: (history.storage.flush(), 0))
+else:
+    autosaver.add_job("history", lambda: history_log.prepare(history), history_log.commit,
+                      on_error=_restore_history_delta, on_done=history_log.reattach_snapshot)
+# compteurs de !stats : un fichier par shard, seuls les utilisateurs modifiés sont réécrits
+# (delta) ; chacun garde le dernier enregistrement du journal qu'il compte (`seq`) : la
+# relecture au démarrage ne recompte que la suite
+LEGACY_STATS_PATH = "data/stats.json"
+stats_store = ShardedJsonStore("data/stats", "stats", SHARD_COUNT)
+
+def _stats_snapshot():
+    if not history.stats.is_dirty():
+        return None
+    seq = history_log.last_seq if HISTORY_BACKEND != "sqlite" else 0
+    return seq, history.stats.dump_delta(seq)
+
+def _write_stats(prepared):
+    seq, delta = prepared
+    # les compteurs ne sont écrits que si le journal a bien écrit tout ce qu'ils comptent
+    # (job "history" juste avant) : sinon un arrêt les laisserait compter des commandes perdues
+    if HISTORY_BACKEND != "sqlite" and history_log.committed_seq < seq:
+        raise RuntimeError("journal pas encore écrit : compteurs gardés pour la prochaine sauvegarde")
+    return stats_store.save_delta(delta)[0]
+
+autosaver.add_job("stats", _stats_snapshot, _write_stats,
+                  on_error=lambda prepared: history.stats.restore_dirty(prepared[1]))
+autosaver.add_job("conversation", _conversation_delta,
+                  lambda delta: conversation_store.save_delta(delta)[0],
+                  on_error=conversation.restore_dirty)
+
+# -------------------------------------
+# Ingestion des commandes (écriture différée)
+# -------------------------------------
+# Le listener ne fait que pousser (user_id, commande, horodatage) dans une file bornée ;
+# une tâche de fond l'écrit par lots dans l'historique. Un historique verrouillé par
+# quelqu'un d'autre ne bloque pas le lot : les commandes de cet utilisateur sont mises
+# de côté, dans l'ordre, et écrites dès que le lock le permet.
+_held = HashTable()     # user_id -> [(user_id, commande, horodatage)] en attente d'un lock
+_held_tasks = set()     # tâches _write_when_unlocked en cours (la boucle ne garde qu'une référence faible)
+
+def _ingest_batch(batch):
+    ready = []
+    for entry in batch:
+        uid = entry[0]
+        held = _held.get(uid)
+        if held is not None:
+            held.append(entry)
+        elif locksys.can_write(history_resource(uid), uid):
+            ready.append(entry)
+        else:
+            _held.set(uid, [entry])
+            task = asyncio.get_running_loop().create_task(_write_when_unlocked(uid))
+            _held_tasks.add(task)
+            task.add_done_callback(_held_tasks.discard)
+    if ready:
+        history.add_commands(ready)
+        autosaver.notify(len(ready))
+
+async def _write_when_unlocked(user_id):
+    entries = None
+    try:
+        async with history_access(user_id, WRITE) as ok:
+            entries = _held.get(user_id) or []
+            _held.delete(user_id)
+            if ok:
+                history.add_commands(entries)
+    finally:
+        if entries is None:
+            # annulée pendant l'attente : commandes perdues (comptées), et les suivantes
+            # de l'utilisateur ne restent pas bloquées derrière une tâche disparue
+            ingest.dropped += len(_held.get(user_id) or [])
+            _held.delete(user_id)
+    if ok:
+        autosaver.notify(len(entries))
+    else:
+        ingest.dropped += len(entries)
+        print(f"⚠️ {len(entries)} commande(s) de {user_id} non journalisée(s) : historique verrouillé.")
+
+ingest = IngestQueue(_ingest_batch, maxsize=INGEST_QUEUE_SIZE, batch_size=INGEST_BATCH_SIZE)
 
 # -------------------------------------
 # Événements
 # -------------------------------------
+_data_loaded = False
+
+def migrate_legacy_files():
+    """Migration unique des anciens fichiers monolithiques vers les shards."""
+    if not history_store.exists():
+        snap = open_snapshot(LEGACY_HISTORY_BIN) if os.path.exists(LEGACY_HISTORY_BIN) else None
+        if snap is not None:
+            data, seq = {k: snap.read_entries(k) for k in snap.keys()}, snap.seq
+            snap.close()
+        else:
+            data = load_json(LEGACY_HISTORY_JSON)
+            seq = data.pop(SEQ_KEY, 0)
+        if data:
+            history_store.write(data, seq)
+            print(f"🔁 {len(data)} historique(s) migré(s) vers {SHARD_COUNT} shards.")
+    if not conversation_store.exists() and os.path.exists(LEGACY_CONVERSATION_JSON):
+        n = conversation_store.save_all(load_json(LEGACY_CONVERSATION_JSON))
+        print(f"🔁 {n} conversation(s) migrée(s) vers {SHARD_COUNT} shards.")
+    if not stats_store.exists() and os.path.exists(LEGACY_STATS_PATH):
+        n = stats_store.save_all(convert_legacy_dump(load_json(LEGACY_STATS_PATH)))
+        print(f"🔁 Compteurs de {n} utilisateur(s) migrés vers {SHARD_COUNT} shards.")
+
+def import_history_into_sqlite():
+    """Premier démarrage en SQLite : reprend l'historique des shards (snapshots + journal)."""
+    if len(history.storage) or not history_store.exists():
+        return 0
+    previous = HistoryManager(retention=retention)     # garde les horodatages (rétention par âge)
+    history_log.load(previous)
+    data = previous.dump_for_save()
+    history.load_from_data(data)
+    return len(data)
+
 @bot.event
 async def on_ready():
+    global _data_loaded
     print(f"✅ Connecté en tant que {bot.user}")
+    # on_ready est rappelé à chaque reconnexion : on ne recharge (et ne rejoue le journal) qu'une fois
+    if _data_loaded:
+        return
+    _data_loaded = True
+
+    try:
+        migrate_legacy_files()
+    except Exception as e:
+        print("⚠️ Erreur migration des anciens fichiers:", e)
 
-    # Chargement des données si présentes
-    hist_data = load_json("data/history_data.json")
-    conv_data = load_json("data/conversation_data.json")
+    # Chargement des données si présentes (shards lus en parallèle)
+    try:
+        # compteurs d'abord : la relecture du journal ne compte que ce qu'ils n'ont pas vu
+        history.stats.load(stats_store.load_all())
+        history_log.reserve_seq(history.stats.seq)
+    except Exception as e:
+        print("⚠️ Erreur chargement statistiques:", e)
 
     try:
-        history.load_from_data(hist_data)
+        if HISTORY_BACKEND == "sqlite":
+            # requêtes SQLite : jamais sur la boucle
+            n = await asyncio.to_thread(import_history_into_sqlite)
+            if n:
+                print(f"🔁 {n} historique(s) importé(s) dans {HISTORY_DB_PATH}.")
+        else:
+            replayed = history_log.load(history)
+            print(f"📜 Journal rejoué : {replayed} enregistrement(s).")
     except Exception as e:
         print("⚠️ Erreur chargement historique:", e)
 
+    if not stats_store.exists():
+        # première mise en place des compteurs : recomptés une fois depuis l'historique
+        try:
+            history.stats.rebuild(await history_read(history.dump_for_save),
+                                  seq=history_log.committed_seq if HISTORY_BACKEND != "sqlite" else 0)
+        except Exception as e:
+            print("⚠️ Erreur calcul des statistiques:", e)
+
     try:
-        conversation.load_from_data(conv_data)
+        conversation.load_from_data(conversation_store.load_all())
     except Exception as e:
         print("⚠️ Erreur chargement conversation:", e)
 
     print("💾 Données chargées (si présentes).")
+    autosaver.start()
+    lease_scheduler.start()
+    # les commandes reçues pendant le chargement attendaient dans la file
+    ingest.start()
 
 # -------------------------------------
 # Commandes liées à l’historique
 # -------------------------------------
+HISTORY_PAGE_SIZE = 15
+HISTORY_LINE_MAX = 100   # 15 lignes de 100 caractères : reste sous la limite de 2000 de Discord
+
 @bot.command(name="history")
-async def history_cmd(ctx):
-    # Check lock
-    holder, _ = locksys.status("history")
-    if holder is not None and holder != ctx.author.id:
-        await ctx.send("⛔ L'historique est verrouillé par un autre utilisateur. Tape `!lockhistory` pour entrer en file d'attente.")
+async def history_cmd(ctx, page: int = 1):
+    """Affiche une page de l'historique (page 1 = commandes les plus récentes)."""
+    # Check lock (attend son tour si l'historique est verrouillé)
+    async with history_access(ctx.author.id, READ) as ok:
+        if ok:
+            entries, page, pages = await history_read(history.get_page, ctx.author.id, page,
+                                                      HISTORY_PAGE_SIZE)
+    if not ok:
+        await ctx.send(LOCKED_MSG)
         return
-
-    cmds = history.get_all_commands(ctx.author.id)
-    if not cmds:
+    if not entries:
         await ctx.send("ℹ️ Ton historique est vide.")
-    else:
-        await ctx.send(f"🧾 Ton historique : {cmds}")
+        return
+
+    lines = []
+    for number, cmd in entries:
+        if len(cmd) > HISTORY_LINE_MAX:
+            cmd = cmd[:HISTORY_LINE_MAX - 1] + "…"
+        lines.append(f"{number}. {cmd}")
+    footer = f"Page {page}/{pages}"
+    if page < pages:
+        footer += f" — `!history {page + 1}` pour les plus anciennes"
+    await ctx.send("🧾 Ton historique :\n" + "\n".join(lines) + "\n" + footer)
 
 @bot.command()
 async def clearhistory(ctx):
-    # Check lock
-    holder, _ = locksys.status("history")
-    if holder is not None and holder != ctx.author.id:
-        await ctx.send("⛔ L'historique est verrouillé par un autre utilisateur. Tape `!lockhistory` pour entrer en file d'attente.")
+    # Check lock (attend son tour si l'historique est verrouillé)
+    async with history_access(ctx.author.id, WRITE) as ok:
+        if ok:
+            history.clear_history(ctx.author.id)
+    if not ok:
+        await ctx.send(LOCKED_MSG)
         return
-
-    history.clear_history(ctx.author.id)
+    autosaver.notify()
     await ctx.send("🗑️ Historique vidé.")
 
 # -------------------------------------
@@ -75,104 +350,172 @@ async def clearhistory(ctx):
 async def helpme_cmd(ctx):
     """Démarre une conversation/questionnaire."""
     msg = conversation.start_conversation(ctx.author.id)
+    autosaver.notify()
     await ctx.send(msg)
 
 @bot.command(name="reset")
 async def reset_cmd(ctx):
     """Réinitialise la conversation."""
     msg = conversation.reset(ctx.author.id)
+    autosaver.notify()
     await ctx.send(msg)
 
 @bot.command(name="speak")
 async def speak_cmd(ctx, *, topic: str = None):
-    """Vérifie si un sujet est supporté."""
+    """Cherche un sujet dans les arbres de conversation et indique comment y arriver."""
     if not topic:
         await ctx.send(f"🎯 Sujets possibles : {', '.join(conversation.supported_topics())}")
         return
-    if conversation.speak_about(topic):
-        await ctx.send("✅ Oui, je parle de ce sujet.")
-    else:
-        await ctx.send("❌ Désolé, ce sujet n'est pas traité.")
+    await ctx.send(conversation.speak_reply(topic))
 
 # -------------------------------------
 # Sauvegarde (persistance)
 # -------------------------------------
 @bot.command()
 async def save(ctx):
-    """Sauvegarde les données sur disque."""
+    """Sauvegarde les données sur disque (déclenche immédiatement l'autosave)."""
     try:
-        save_json("data/history_data.json", history.dump_for_save())
-        save_json("data/conversation_data.json", conversation.dump_for_save())
-        await ctx.send("💾 Données sauvegardées.")
+        # commandes encore dans la file d'ingestion, puis seules les nouvelles mutations (journal)
+        ingest.drain_all()
+        results = await autosaver.flush_now()
+        await ctx.send(f"💾 Données sauvegardées : {describe_save(results)}.")
     except Exception as e:
         await ctx.send(f"❌ Erreur sauvegarde: {e}")
 
+@bot.command()
+@commands.is_owner()
+async def reloadtree(ctx):
+    """Recharge les arbres de conversation (propriétaire du bot uniquement)."""
+    try:
+        migrated, lost = await conversation.reload_tree()
+    except (TreeValidationError, OSError) as e:
+        await ctx.send(f"❌ Arbres invalides, rien n'a changé : {e}")
+        return
+    if migrated == 0 and lost == 0:
+        await ctx.send("ℹ️ Arbres inchangés.")
+        return
+    autosaver.notify(lost)
+    await ctx.send(f"🌳 Arbres rechargés : {migrated} conversation(s) migrée(s), "
+                   f"{lost} renvoyée(s) au début (chemin supprimé).")
+
+@bot.command()
+@commands.is_owner()
+async def ingeststats(ctx):
+    """Compteurs de la file d'ingestion des commandes (propriétaire du bot uniquement)."""
+    st = ingest.stats()
+    await ctx.send(f"📥 File d'ingestion : {st['pending']}/{ingest.maxsize} en attente "
+                   f"(pic {st['high_water']}), {st['received']} reçue(s), {st['written']} traitée(s) "
+                   f"en {st['batches']} lot(s), {st['dropped']} perdue(s), "
+                   f"{st['overflows']} débordement(s), {st['errors']} erreur(s).")
+
 # -------------------------------------
 # Commandes de lock (intégrité)
 # -------------------------------------
+def _lock_target(ctx, scope):
+    """`all` : tout l'historique (maintenance) ; sinon l'historique de l'auteur."""
+    if scope == "all":
+        return "history", "tout l'historique"
+    return history_resource(ctx.author.id), "ton historique"
+
 @bot.command()
-async def lockhistory(ctx):
-    """Demander l'accès exclusif à l'historique."""
-    status, pos = locksys.acquire("history", ctx.author.id)
+async def lockhistory(ctx, scope: str = None):
+    """Demander l'accès exclusif à son historique (`!lockhistory all` : à tout l'historique)."""
+    resource, label = _lock_target(ctx, scope)
+    status, pos = locksys.acquire(resource, ctx.author.id)
+    lease = locksys.expires_in(resource)
+    duree = f" (bail de {round(lease / 60)} min, `!lockhistory` pour le prolonger)" if lease is not None else ""
     if status == "acquired":
-        await ctx.send("🔒 Tu as maintenant le lock sur l'historique. Tu es le seul à y accéder.")
+        await ctx.send(f"🔒 Tu as maintenant le lock sur {label}. Tu es le seul à y accéder{duree}.")
     elif status == "already":
-        await ctx.send("ℹ️ Tu possèdes déjà le lock sur l'historique.")
+        await ctx.send(f"ℹ️ Tu possèdes déjà le lock sur {label} : bail prolongé{duree}.")
     else:  # queued
         await ctx.send(f"⏳ Lock déjà pris. Tu es en file d'attente (position {pos}).")
 
 @bot.command()
-async def unlockhistory(ctx):
-    """Relâcher l'accès exclusif à l'historique."""
-    ok, info, next_id = locksys.release("history", ctx.author.id)
+async def unlockhistory(ctx, scope: str = None):
+    """Relâcher l'accès exclusif (`!unlockhistory all` pour le lock global)."""
+    resource, label = _lock_target(ctx, scope)
+    ok, info, next_id = locksys.release(resource, ctx.author.id)
     if not ok and info == "not_holder":
-        await ctx.send("❌ Tu ne possèdes pas le lock, impossible de le relâcher.")
+        if locksys.leave(resource, ctx.author.id):
+            await ctx.send("🚶 Tu as quitté la file d'attente du lock.")
+        else:
+            await ctx.send("❌ Tu ne possèdes pas le lock, impossible de le relâcher.")
     elif ok and info == "released":
-        await ctx.send("✅ Lock libéré. L'historique est maintenant libre.")
+        await ctx.send(f"✅ Lock libéré : {label} est de nouveau accessible.")
     elif ok and info == "transferred":
         await ctx.send(f"✅ Lock transféré automatiquement à l'utilisateur suivant (ID: {next_id}).")
 
 # -------------------------------------
 # Stats (bonus)
 # -------------------------------------
+STATS_TOP = 5
+LEADERBOARD_SIZE = 10
+
 @bot.command()
-async def stats(ctx):
-    """Affiche des statistiques sur ton historique."""
-    # Check lock (lecture soumise au lock pour rester cohérent)
-    holder, _ = locksys.status("history")
-    if holder is not None and holder != ctx.author.id:
-        await ctx.send("⛔ L'historique est verrouillé par un autre utilisateur. Tape `!lockhistory` pour entrer en file d'attente.")
+async def stats(ctx, view: str = None):
+    """
+    Statistiques de commandes (compteurs tenus à jour, aucun parcours d'historique) :
+    `!stats` (les tiennes), `!stats top` (commandes du serveur), `!stats classement`.
+    """
+    counters = history.stats
+    view = (view or "").lower()
+    if view == "top":
+        top = counters.top_commands(LEADERBOARD_SIZE)
+        if not top:
+            await ctx.send("ℹ️ Aucune commande comptée pour l'instant.")
+            return
+        lines = [f"{i}. `{name}` — {n}" for i, (name, n) in enumerate(top, start=1)]
+        await ctx.send(f"📈 Commandes les plus utilisées ({counters.total()} au total) :\n" + "\n".join(lines))
+        return
+    if view in ("classement", "leaderboard"):
+        top = counters.top_users(LEADERBOARD_SIZE)
+        if not top:
+            await ctx.send("ℹ️ Aucune commande comptée pour l'instant.")
+            return
+        lines = [f"{i}. <@{uid}> — {n}" for i, (uid, n) in enumerate(top, start=1)]
+        await ctx.send("🏆 Classement des utilisateurs :\n" + "\n".join(lines))
         return
 
-    cmds = history.get_all_commands(ctx.author.id)
-    if not cmds:
+    # Check lock (lecture soumise au lock pour rester cohérent)
+    async with history_access(ctx.author.id, READ) as ok:
+        if ok:
+            total = counters.total(ctx.author.id)
+            favorites = counters.top_commands(STATS_TOP, ctx.author.id)
+            rank = counters.rank_of(ctx.author.id)
+    if not ok:
+        await ctx.send(LOCKED_MSG)
+        return
+    if not total:
         await ctx.send("ℹ️ Tu n'as encore utilisé aucune commande.")
-    else:
-        await ctx.send(f"📊 Tu as utilisé **{len(cmds)}** commandes au total depuis le début.")
+        return
+    fav = ", ".join(f"`{name}` ({n})" for name, n in favorites)
+    await ctx.send(f"📊 Tu as utilisé **{total}** commandes au total depuis le début.\n"
+                   f"⭐ Tes favorites : {fav}\n"
+                   f"🏆 Classement : {rank}e sur {counters.user_count()}")
 
 # -------------------------------------
 # Export (bonus)
 # -------------------------------------
 @bot.command()
 async def export(ctx):
-    """Exporte ton historique dans un fichier texte et l'envoie."""
-    # Check lock (lecture soumise au lock pour rester cohérent)
-    holder, _ = locksys.status("history")
-    if holder is not None and holder != ctx.author.id:
-        await ctx.send("⛔ L'historique est verrouillé par un autre utilisateur. Tape `!lockhistory` pour entrer en file d'attente.")
+    """Exporte ton historique dans un fichier texte (compressé s'il est long) et l'envoie."""
+    # Check lock (lecture soumise au lock pour rester cohérent) : la copie est prise ici
+    async with history_access(ctx.author.id, READ) as ok:
+        if ok:
+            count = await history_read(history.count_commands, ctx.author.id)
+            lines = await history_read(history.iter_export_lines, ctx.author.id)
+    if not ok:
+        await ctx.send(LOCKED_MSG)
         return
-
-    cmds = history.get_all_commands(ctx.author.id)
-    if not cmds:
+    if not count:
         await ctx.send("ℹ️ Ton historique est vide, rien à exporter.")
         return
 
-    filename = f"history_{ctx.author.id}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        for i, cmd in enumerate(cmds, start=1):
-            f.write(f"{i}. {cmd}\n")
-
-    await ctx.send(file=discord.File(filename))
+    # mise en forme + compression dans un thread, en mémoire : aucun fichier laissé sur disque
+    buf, compress = await asyncio.to_thread(export_to_buffer_auto, lines, EXPORT_GZIP_MIN_BYTES)
+    filename = f"history_{ctx.author.id}.txt" + (".gz" if compress else "")
+    await ctx.send(file=discord.File(fp=buf, filename=filename))
 
 
 # -------------------------------------
@@ -189,10 +532,9 @@ async def log_and_converse(message):
 
     # 1) Commandes (préfixe) : on LOG l'historique puis on STOP.
     if content.startswith(COMMAND_PREFIX):
-        holder, _ = locksys.status("history")
-        # Autoriser l'écriture si pas de lock ou si c'est le détenteur actuel
-        if holder is None or holder == user_id:
-            history.add_command(user_id, content)
+        # O(1), sans attente tant que la file a de la place : écrite par lot par la tâche
+        # d'ingestion. File pleine : on attend au plus INGEST_PUT_TIMEOUT s, puis perdue (comptée)
+        await ingest.put((user_id, content, time.time()), timeout=INGEST_PUT_TIMEOUT)
 
         # Très important :
         # NE PAS APPELER bot.process_commands ici.
@@ -201,9 +543,10 @@ async def log_and_converse(message):
         return
 
     # 2) Messages SANS préfixe : gestion de la conversation active
-    st = conversation._state.get(user_id)
-    if st and st.get("node") is not None:
+    # (une session évincée de la mémoire est relue sur disque, hors de la boucle)
+    if await conversation.resume(user_id):
         reply = conversation.handle_user_message(user_id, content)
+        autosaver.notify()
         if reply:
             await message.channel.send(reply)
 # -------------------------------------
@@ -0,0 +1,192 @@
+# structures/frequency_counter.py
+# Compteur de fréquences fait main (clé -> nombre d'occurrences), trié en permanence
+# - les clés sont rangées dans des "paliers" (un par valeur de compte), chaînés du plus
+#   petit au plus grand compte ; HashTable clé -> palier
+# - add(clé, ±1) en O(1) : la clé passe au palier voisin (créé / supprimé au besoin)
+# - top(k) en O(k) : on lit les paliers depuis le plus grand
+# - rank(clé) en O(1) : chaque palier tient le nombre de clés des paliers au-dessus de lui
+#   ("ahead"), ajusté pendant add() sur les seuls paliers traversés (aucun pour ±1 vers un
+#   voisin, sauf l'ancien ou le nouveau palier). remove() met à jour les paliers en dessous :
+#   O(nombre de paliers en dessous), pour une opération rare (vidage d'un historique).
+
+from structures.hashtable import HashTable
+
+
+class _Bucket:
+    __slots__ = ("count", "keys", "prev", "next", "ahead")
+
+    def __init__(self, count):
+        self.count = count
+        self.keys = {}          # clés de ce palier (dict utilisé comme ensemble ordonné)
+        self.ahead = 0          # nombre de clés dans les paliers de compte supérieur
+        self.prev = None        # palier de compte inférieur
+        self.next = None        # palier de compte supérieur
+
+
+class FrequencyCounter:
+    def __init__(self, table_cls=HashTable, size=None):
+        # size : taille initiale de la table (petite pour les compteurs par utilisateur)
+        self._where = table_cls() if size is None else table_cls(size=size)
+        self._low = None        # palier du plus petit compte
+        self._high = None       # palier du plus grand compte
+        self.total = 0          # somme de tous les comptes
+
+    # -----------------------------
+    # Paliers
+    # -----------------------------
+    def _insert_after(self, bucket, new):
+        """Insère new juste au-dessus de bucket (None : tout en bas)."""
+        new.prev = bucket
+        new.next = bucket.next if bucket is not None else self._low
+        if new.next is not None:
+            new.next.prev = new
+        else:
+            self._high = new
+        if bucket is not None:
+            bucket.next = new
+        else:
+            self._low = new
+
+    def _unlink(self, bucket):
+        if bucket.prev is not None:
+            bucket.prev.next = bucket.next
+        else:
+            self._low = bucket.next
+        if bucket.next is not None:
+            bucket.next.prev = bucket.prev
+        else:
+            self._high = bucket.prev
+
+    def _leave(self, key, bucket):
+        del bucket.keys[key]
+        if not bucket.keys:
+            self._unlink(bucket)
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def add(self, key, n=1):
+        """
+        Ajoute n (éventuellement négatif) au compte de key ; à 0 ou moins, la clé disparaît.
+        O(1) pour n = ±1, sinon proportionnel au nombre de paliers traversés.
+        Retourne le nouveau compte.
+        """
+        if n == 0:
+            return self.count(key)
+        bucket = self._where.get(key)
+        old = bucket.count if bucket is not None else 0
+        new_count = old + n
+        if new_count <= 0:
+            if bucket is not None:
+                self.remove(key)
+            return 0
+        self.total += n
+        # palier juste en dessous du nouveau compte (voisin immédiat pour ±1) ; les paliers
+        # de compte compris entre l'ancien et le nouveau voient la clé passer au-dessus / en dessous
+        if n > 0:
+            if bucket is not None:
+                bucket.ahead += 1
+            below = bucket                  # None : on part d'en bas
+            above = below.next if below is not None else self._low
+            while above is not None and above.count <= new_count:
+                if above.count < new_count:
+                    above.ahead += 1
+                below, above = above, above.next
+        else:
+            below = bucket.prev
+            while below is not None and below.count > new_count:
+                below.ahead -= 1
+                below = below.prev
+        if below is not None and below.count == new_count:
+            target = below
+            if n < 0:
+                target.ahead -= 1
+            created = False
+        else:
+            target = _Bucket(new_count)
+            self._insert_after(below, target)
+            created = True
+        target.keys[key] = True
+        if bucket is not None:
+            self._leave(key, bucket)
+        if created:
+            nxt = target.next
+            target.ahead = nxt.ahead + len(nxt.keys) if nxt is not None else 0
+        self._where.set(key, target)
+        return new_count
+
+    def count(self, key):
+        bucket = self._where.get(key)
+        return bucket.count if bucket is not None else 0
+
+    def remove(self, key):
+        """Retire key ; retourne son ancien compte (0 si absente)."""
+        bucket = self._where.get(key)
+        if bucket is None:
+            return 0
+        self._where.delete(key)
+        self._leave(key, bucket)
+        self.total -= bucket.count
+        below = bucket.prev
+        while below is not None:
+            below.ahead -= 1
+            below = below.prev
+        return bucket.count
+
+    def top(self, k):
+        """[(clé, compte)] des k plus grands comptes (à égalité : arrivée la plus ancienne d'abord)."""
+        out = []
+        bucket = self._high
+        while bucket is not None and len(out) < k:
+            for key in bucket.keys:
+                out.append((key, bucket.count))
+                if len(out) == k:
+                    break
+            bucket = bucket.prev
+        return out
+
+    def rank(self, key):
+        """Place de key dans le classement (1 = premier, ex-æquo partagés), ou None si absente (O(1))."""
+        bucket = self._where.get(key)
+        return bucket.ahead + 1 if bucket is not None else None
+
+    def items(self):
+        """(clé, compte) du plus grand au plus petit compte."""
+        bucket = self._high
+        while bucket is not None:
+            for key in bucket.keys:
+                yield key, bucket.count
+            bucket = bucket.prev
+
+    @classmethod
+    def from_counts(cls, pairs, table_cls=HashTable, size=None):
+        """Construit le compteur d'un coup depuis des (clé, compte), en O(m log m)."""
+        counter = cls(table_cls, size)
+        below = None
+        for key, n in sorted(((k, n) for k, n in pairs if n > 0), key=lambda kv: kv[1]):
+            if below is None or below.count != n:
+                new = _Bucket(n)
+                counter._insert_after(below, new)
+                below = new
+            below.keys[key] = True
+            counter._where.set(key, below)
+            counter.total += n
+        ahead = 0
+        bucket = counter._high
+        while bucket is not None:
+            bucket.ahead = ahead
+            ahead += len(bucket.keys)
+            bucket = bucket.prev
+        return counter
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __contains__(self, key):
+        return self._where.get(key) is not None
+
+    def __len__(self):
+        return len(self._where)
+
+    def __repr__(self):
+        return f"FrequencyCounter({len(self)} clés, total {self.total})"
@@ -1,63 +1,234 @@
 # structures/hashtable.py
 # Implémentation simple d'une table de hachage avec chaînage
+# - agrandissement / réduction automatiques selon le facteur de charge
+# - rehash incrémental : les buckets sont déplacés petit à petit à chaque opération
+
+
+def hash_key(key):
+    """Hash brut (non réduit) d'une clé, partagé par toutes les tables."""
+    if isinstance(key, int):
+        # Les ID Discord (snowflakes) ont des bits de poids faible presque
+        # toujours nuls : on replie les bits hauts pour bien répartir.
+        return (key ^ (key >> 22) ^ (key >> 42)) & 0xFFFFFFFF
+    h = 0
+    for ch in str(key):
+        h = (h * 31 + ord(ch)) & 0xFFFFFFFF
+    return h
+
 
 class HashTable:
-    def __init__(self, size=256):
+    def __init__(self, size=256, max_load=1.0, min_load=0.125, rehash_step=4):
         # On crée une liste de buckets (chaque bucket est une liste)
         self.size = size
         self.buckets = [[] for _ in range(size)]
+        self._min_size = size
+        self._max_load = max_load
+        self._min_load = min_load
+        self._rehash_step = rehash_step
+        self._count = 0
+
+        # Ancienne table pendant un rehash incrémental (None sinon)
+        self._old_buckets = None
+        self._old_size = 0
+        self._rehash_index = 0   # prochain bucket de l'ancienne table à déplacer
+
+        # Statistiques de sondage
+        self._lookups = 0
+        self._probes = 0
 
     def _hash(self, key):
         """Calcule l'indice du bucket pour une clé donnée"""
-        if isinstance(key, int):
-            h = key
-        else:
-            h = 0
-            for ch in str(key):
-                h = (h * 31 + ord(ch)) & 0xFFFFFFFF
-        return h % self.size
+        return hash_key(key) % self.size
+
+    # -----------------------------
+    # Redimensionnement
+    # -----------------------------
+    def _start_resize(self, new_size):
+        """Démarre un rehash incrémental vers une table de new_size buckets."""
+        self._old_buckets = self.buckets
+        self._old_size = self.size
+        self._rehash_index = 0
+        self.size = new_size
+        self.buckets = [[] for _ in range(new_size)]
+
+    def _rehash_some(self, n):
+        """Déplace au plus n buckets de l'ancienne table vers la nouvelle."""
+        old = self._old_buckets
+        if old is None:
+            return
+        end = min(self._rehash_index + n, self._old_size)
+        for i in range(self._rehash_index, end):
+            for k, v in old[i]:
+                self.buckets[hash_key(k) % self.size].append((k, v))
+            old[i] = None
+        self._rehash_index = end
+        if end >= self._old_size:
+            self._old_buckets = None
+            self._old_size = 0
+            self._rehash_index = 0
+
+    def _finish_rehash(self):
+        self._rehash_some(self._old_size)
+
+    def _maybe_grow(self):
+        """Déclenche un agrandissement si nécessaire (après un ajout)."""
+        if self._old_buckets is None and self._count > self.size * self._max_load:
+            self._start_resize(self.size * 2)
+
+    def _maybe_shrink(self):
+        """
+        Déclenche une réduction si nécessaire (après une suppression seulement :
+        une table réservée puis remplie ne doit pas rétrécir entre deux ajouts).
+        """
+        if (self._old_buckets is None and self.size > self._min_size
+                and self._count < self.size * self._min_load):
+            self._start_resize(max(self._min_size, self.size // 2))
+
+    def _locate(self, key):
+        """Retourne le bucket qui contient (ou doit contenir) la clé."""
+        h = hash_key(key)
+        if self._old_buckets is not None:
+            i = h % self._old_size
+            if i >= self._rehash_index:
+                # bucket pas encore déplacé : la clé y est peut-être
+                bucket = self._old_buckets[i]
+                for k, _ in bucket:
+                    if k == key:
+                        return bucket
+        return self.buckets[h % self.size]
 
+    # -----------------------------
+    # API publique
+    # -----------------------------
     def set(self, key, value):
         """Ajoute ou met à jour une valeur associée à une clé"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        self._rehash_some(self._rehash_step)
+        bucket = self._locate(key)
+        self._lookups += 1
         for i, (k, v) in enumerate(bucket):
+            self._probes += 1
             if k == key:
                 bucket[i] = (key, value)
                 return
         bucket.append((key, value))
+        self._count += 1
+        self._maybe_grow()
 
     def get(self, key):
         """Récupère une valeur associée à une clé (ou None si absente)"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        self._rehash_some(self._rehash_step)
+        bucket = self._locate(key)
+        self._lookups += 1
         for k, v in bucket:
+            self._probes += 1
             if k == key:
                 return v
         return None
 
     def delete(self, key):
         """Supprime une clé de la table"""
-        index = self._hash(key)
-        bucket = self.buckets[index]
+        self._rehash_some(self._rehash_step)
+        bucket = self._locate(key)
+        self._lookups += 1
         for i, (k, v) in enumerate(bucket):
+            self._probes += 1
             if k == key:
                 bucket.pop(i)
+                self._count -= 1
+                self._maybe_shrink()
                 return True
         return False
 
     def keys(self):
         """Retourne la liste de toutes les clés dans la table"""
         all_keys = []
+        if self._old_buckets is not None:
+            for i in range(self._rehash_index, self._old_size):
+                for k, _ in self._old_buckets[i]:
+                    all_keys.append(k)
         for bucket in self.buckets:
             for k, _ in bucket:
                 all_keys.append(k)
         return all_keys
 
+    def items(self):
+        """Générateur paresseux des paires (clé, valeur), en une seule passe."""
+        if self._old_buckets is not None:
+            for i in range(self._rehash_index, self._old_size):
+                for pair in self._old_buckets[i]:
+                    yield pair
+        for bucket in self.buckets:
+            for pair in bucket:
+                yield pair
+
+    def values(self):
+        """Générateur paresseux des valeurs."""
+        for _, v in self.items():
+            yield v
+
+    # -----------------------------
+    # Construction en masse
+    # -----------------------------
+    def reserve(self, count):
+        """Prédimensionne la table pour count entrées (un seul rehash, pas de croissance ensuite)."""
+        self._finish_rehash()
+        size = self.size
+        while count > size * self._max_load:
+            size *= 2
+        if size == self.size:
+            return
+        self._start_resize(size)
+        self._finish_rehash()
+
+    def set_many(self, pairs):
+        """Ajoute plusieurs paires (clé, valeur) ; prédimensionne si le nombre est connu."""
+        try:
+            self.reserve(self._count + len(pairs))
+        except TypeError:
+            pass  # itérable sans longueur : la croissance reste incrémentale
+        for key, value in pairs:
+            self.set(key, value)
+
+    @classmethod
+    def from_items(cls, pairs, **kwargs):
+        """Construit une table directement à la bonne taille à partir de paires."""
+        table = cls(**kwargs)
+        table.set_many(pairs)
+        return table
+
+    def __len__(self):
+        return self._count
+
+    # -----------------------------
+    # Statistiques (pour vérifier la répartition en charge)
+    # -----------------------------
+    def bucket_lengths(self):
+        """Longueur de chaque bucket de la table courante."""
+        return [len(b) for b in self.buckets]
+
+    def stats(self):
+        """Retourne un dict de statistiques : taille, charge, buckets, sondages."""
+        lengths = self.bucket_lengths()
+        non_empty = [n for n in lengths if n]
+        return {
+            "size": self.size,
+            "count": self._count,
+            "load_factor": self._count / self.size,
+            "max_bucket_len": max(lengths) if lengths else 0,
+            "avg_bucket_len": (sum(non_empty) / len(non_empty)) if non_empty else 0.0,
+            "empty_buckets": len(lengths) - len(non_empty),
+            "lookups": self._lookups,
+            "probes": self._probes,
+            "avg_probes": (self._probes / self._lookups) if self._lookups else 0.0,
+            "rehashing": self._old_buckets is not None,
+        }
+
+    def reset_stats(self):
+        """Remet à zéro les compteurs de sondage."""
+        self._lookups = 0
+        self._probes = 0
+
     def __repr__(self):
         """Affichage lisible pour debug"""
-        pairs = []
-        for bucket in self.buckets:
-            for k, v in bucket:
-                pairs.append(f"{k}: {v}")
+        pairs = [f"{k}: {v}" for k, v in self.items()]
         return "{" + ", ".join(pairs) + "}"
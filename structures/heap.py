@@ -0,0 +1,74 @@
+# structures/heap.py
+# Tas binaire minimum (MinHeap) codé à la main sur une liste Python
+# - push / pop en O(log n), peek en O(1)
+# - chaque entrée est (priorité, valeur) ; à priorité égale, l'ordre d'insertion est conservé
+
+
+class MinHeap:
+    def __init__(self):
+        self._items = []     # (priorité, n°insertion, valeur)
+        self._counter = 0
+
+    def push(self, priority, value):
+        self._items.append((priority, self._counter, value))
+        self._counter += 1
+        self._sift_up(len(self._items) - 1)
+
+    def peek(self):
+        """(priorité, valeur) du plus petit élément, ou None si le tas est vide."""
+        if not self._items:
+            return None
+        priority, _, value = self._items[0]
+        return priority, value
+
+    def pop(self):
+        """Retire et retourne (priorité, valeur) du plus petit élément (None si vide)."""
+        items = self._items
+        if not items:
+            return None
+        last = items.pop()
+        if not items:
+            return last[0], last[2]
+        top = items[0]
+        items[0] = last
+        self._sift_down(0)
+        return top[0], top[2]
+
+    def _sift_up(self, i):
+        items = self._items
+        item = items[i]
+        while i > 0:
+            parent = (i - 1) // 2
+            if items[parent] <= item:
+                break
+            items[i] = items[parent]
+            i = parent
+        items[i] = item
+
+    def _sift_down(self, i):
+        items = self._items
+        n = len(items)
+        item = items[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and items[child + 1] < items[child]:
+                child += 1
+            if item <= items[child]:
+                break
+            items[i] = items[child]
+            i = child
+        items[i] = item
+
+    def clear(self):
+        self._items = []
+
+    def is_empty(self):
+        return not self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"MinHeap({len(self._items)} éléments)"
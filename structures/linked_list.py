@@ -1,5 +1,6 @@
 # structures/linked_list.py
 # Implémentation d'une liste chaînée simple pour stocker les commandes d'un utilisateur
+# + variante "déroulée" (UnrolledLinkedList) plus compacte, lisible depuis la fin
 
 class Node:
     def __init__(self, value):
@@ -47,3 +48,102 @@ class LinkedList:
 
     def __repr__(self):
         return " -> ".join(self.get_all()) if self.head else "Empty LinkedList"
+
+
+class _Chunk:
+    """Maillon d'une liste déroulée : un petit tableau fixe de valeurs."""
+    __slots__ = ("values", "count", "next", "prev")
+
+    def __init__(self, size):
+        self.values = [None] * size
+        self.count = 0
+        self.next = None
+        self.prev = None
+
+
+class UnrolledLinkedList:
+    """
+    Liste chaînée "déroulée" : chaque maillon contient jusqu'à chunk_size valeurs.
+    - un objet maillon pour chunk_size commandes (au lieu d'un Node par commande)
+    - doublement chaînée : lecture depuis la fin en O(k) (get_last_n, iter_reverse)
+    Même API que LinkedList (append / get_all / get_last / clear / len).
+    """
+    CHUNK_SIZE = 32
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self._chunk_size = chunk_size
+        self.head = None
+        self.tail = None
+        self.length = 0
+
+    def append(self, value):
+        """Ajoute un élément à la fin de la liste"""
+        tail = self.tail
+        if tail is None or tail.count == self._chunk_size:
+            chunk = _Chunk(self._chunk_size)
+            if tail is None:
+                self.head = chunk
+            else:
+                tail.next = chunk
+                chunk.prev = tail
+            self.tail = tail = chunk
+        tail.values[tail.count] = value
+        tail.count += 1
+        self.length += 1
+
+    def __iter__(self):
+        """Parcourt les éléments du plus ancien au plus récent"""
+        chunk = self.head
+        while chunk:
+            values = chunk.values
+            for i in range(chunk.count):
+                yield values[i]
+            chunk = chunk.next
+
+    def iter_reverse(self, skip=0):
+        """
+        Parcourt les éléments du plus récent au plus ancien (O(k) pour k éléments lus).
+        skip: nombre d'éléments récents à sauter (les maillons entiers sont sautés d'un coup)
+        """
+        chunk = self.tail
+        while chunk and skip >= chunk.count:
+            skip -= chunk.count
+            chunk = chunk.prev
+        while chunk:
+            values = chunk.values
+            for i in range(chunk.count - 1 - skip, -1, -1):
+                yield values[i]
+            skip = 0
+            chunk = chunk.prev
+
+    def get_last_n(self, k):
+        """Retourne les k derniers éléments (ordre chronologique) en O(k)"""
+        out = []
+        if k <= 0:
+            return out
+        for value in self.iter_reverse():
+            out.append(value)
+            if len(out) == k:
+                break
+        out.reverse()
+        return out
+
+    def get_all(self):
+        """Retourne tous les éléments sous forme de liste Python"""
+        return list(self)
+
+    def get_last(self):
+        """Retourne le dernier élément ajouté"""
+        return self.tail.values[self.tail.count - 1] if self.tail else None
+
+    def clear(self):
+        """Vide complètement la liste"""
+        self.head = None
+        self.tail = None
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return " -> ".join(map(str, self)) if self.head else "Empty UnrolledLinkedList"
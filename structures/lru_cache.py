@@ -0,0 +1,144 @@
+# structures/lru_cache.py
+# Cache LRU fait main : HashTable (clé -> nœud) + liste doublement chaînée
+# ordonnée du moins récemment utilisé (tête) au plus récent (queue).
+# get / put / remove en O(1) ; put retourne l'entrée évincée quand le cache déborde.
+# Chaque nœud garde un horodatage (touch) pour pouvoir évincer aussi par âge.
+
+from structures.hashtable import HashTable
+
+
+class _LRUNode:
+    __slots__ = ("key", "value", "stamp", "prev", "next")
+
+    def __init__(self, key, value, stamp):
+        self.key = key
+        self.value = value
+        self.stamp = stamp
+        self.prev = None
+        self.next = None
+
+
+class LRUCache:
+    def __init__(self, capacity=1024, table_cls=HashTable):
+        if capacity is not None and capacity <= 0:
+            raise ValueError("capacity doit être > 0")
+        self.capacity = capacity        # None : pas de plafond (éviction par âge seulement)
+        self._index = table_cls()
+        self._head = None               # moins récemment utilisé
+        self._tail = None               # plus récemment utilisé
+
+    # -----------------------------
+    # Liste chaînée interne
+    # -----------------------------
+    def _unlink(self, node):
+        if node.prev is not None:
+            node.prev.next = node.next
+        else:
+            self._head = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+        else:
+            self._tail = node.prev
+        node.prev = node.next = None
+
+    def _push_back(self, node):
+        node.prev = self._tail
+        node.next = None
+        if self._tail is not None:
+            self._tail.next = node
+        else:
+            self._head = node
+        self._tail = node
+
+    def _move_to_back(self, node):
+        if node is not self._tail:
+            self._unlink(node)
+            self._push_back(node)
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def get(self, key, default=None):
+        """Valeur associée à key (et la marque comme récemment utilisée)."""
+        node = self._index.get(key)
+        if node is None:
+            return default
+        self._move_to_back(node)
+        return node.value
+
+    def peek(self, key, default=None):
+        """Comme get, sans modifier l'ordre."""
+        node = self._index.get(key)
+        return node.value if node is not None else default
+
+    def put(self, key, value, stamp=0.0):
+        """
+        Insère ou remplace key. Retourne (clé, valeur) évincée si le cache
+        dépasse sa capacité, sinon None.
+        """
+        node = self._index.get(key)
+        if node is not None:
+            node.value = value
+            node.stamp = stamp
+            self._move_to_back(node)
+            return None
+        node = _LRUNode(key, value, stamp)
+        self._index.set(key, node)
+        self._push_back(node)
+        if self.capacity is not None and len(self._index) > self.capacity:
+            return self.pop_oldest()
+        return None
+
+    def touch(self, key, stamp):
+        """Met à jour l'horodatage de key et la marque comme récente. Retourne False si absente."""
+        node = self._index.get(key)
+        if node is None:
+            return False
+        node.stamp = stamp
+        self._move_to_back(node)
+        return True
+
+    def remove(self, key):
+        """Retire key ; retourne sa valeur (ou None)."""
+        node = self._index.get(key)
+        if node is None:
+            return None
+        self._index.delete(key)
+        self._unlink(node)
+        return node.value
+
+    def oldest(self):
+        """(clé, valeur, horodatage) du moins récemment utilisé, ou None si vide."""
+        node = self._head
+        return (node.key, node.value, node.stamp) if node is not None else None
+
+    def pop_oldest(self):
+        """Retire et retourne (clé, valeur) du moins récemment utilisé (None si vide)."""
+        node = self._head
+        if node is None:
+            return None
+        self._index.delete(node.key)
+        self._unlink(node)
+        return node.key, node.value
+
+    def items(self):
+        """(clé, valeur) du moins au plus récemment utilisé."""
+        out = []
+        node = self._head
+        while node is not None:
+            out.append((node.key, node.value))
+            node = node.next
+        return out
+
+    def clear(self):
+        self._index = type(self._index)()
+        self._head = self._tail = None
+
+    def __contains__(self, key):
+        return self._index.get(key) is not None
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"LRUCache({len(self)}/{self.capacity})"
@@ -0,0 +1,190 @@
+# structures/open_hashtable.py
+# Table de hachage à adressage ouvert, compacte :
+# - clés, valeurs et hashs rangés dans des tableaux plats parallèles
+# - pas de tuple ni de liste par bucket (moins de mémoire par entrée)
+# - suppression par "pierre tombale" (tombstone)
+# Même API que HashTable : get / set / delete / keys
+
+from array import array
+
+from structures.hashtable import hash_key
+
+_EMPTY = object()     # case jamais utilisée
+_DELETED = object()   # case libérée (tombstone) : le sondage doit continuer
+
+
+class OpenHashTable:
+    def __init__(self, size=256):
+        # capacité = puissance de 2 (masque au lieu d'un modulo)
+        capacity = 8
+        while capacity < size:
+            capacity *= 2
+        self._init_arrays(capacity)
+        self._min_capacity = capacity
+        self._lookups = 0
+        self._probes = 0
+
+    def _init_arrays(self, capacity):
+        self.size = capacity
+        self._mask = capacity - 1
+        self._keys = [_EMPTY] * capacity
+        self._values = [None] * capacity
+        self._hashes = array("I", bytes(4 * capacity))
+        self._count = 0
+        self._used = 0   # cases occupées + tombstones
+
+    def _find(self, key, h):
+        """Retourne (index de la clé ou -1, première case libre réutilisable)."""
+        keys = self._keys
+        hashes = self._hashes
+        mask = self._mask
+        free = -1
+        self._lookups += 1
+        # sondage avec perturbation (comme les dict CPython)
+        perturb = h
+        i = h & mask
+        while True:
+            self._probes += 1
+            k = keys[i]
+            if k is _EMPTY:
+                return -1, (free if free != -1 else i)
+            if k is _DELETED:
+                if free == -1:
+                    free = i
+            elif hashes[i] == h and k == key:
+                return i, i
+            perturb >>= 5
+            i = (5 * i + 1 + perturb) & mask
+
+    def _resize(self, capacity):
+        old_keys, old_values, old_hashes = self._keys, self._values, self._hashes
+        self._init_arrays(capacity)
+        keys, values, hashes = self._keys, self._values, self._hashes
+        mask = self._mask
+        for j, k in enumerate(old_keys):
+            if k is _EMPTY or k is _DELETED:
+                continue
+            h = old_hashes[j]
+            # la table neuve ne contient ni doublon ni tombstone
+            perturb = h
+            i = h & mask
+            while keys[i] is not _EMPTY:
+                perturb >>= 5
+                i = (5 * i + 1 + perturb) & mask
+            keys[i] = k
+            values[i] = old_values[j]
+            hashes[i] = h
+            self._count += 1
+        self._used = self._count
+
+    def _capacity_for(self, count):
+        capacity = self._min_capacity
+        while capacity * 2 < count * 3:
+            capacity *= 2
+        return capacity
+
+    # -----------------------------
+    # API publique
+    # -----------------------------
+    def set(self, key, value):
+        """Ajoute ou met à jour une valeur associée à une clé"""
+        h = hash_key(key)
+        i, free = self._find(key, h)
+        if i != -1:
+            self._values[i] = value
+            return
+        if self._keys[free] is _EMPTY:
+            self._used += 1
+        self._keys[free] = key
+        self._values[free] = value
+        self._hashes[free] = h
+        self._count += 1
+        # au-delà de 2/3 de cases utilisées, le sondage se dégrade
+        if self._used * 3 >= self.size * 2:
+            self._resize(self._capacity_for(self._count + 1))
+
+    def get(self, key):
+        """Récupère une valeur associée à une clé (ou None si absente)"""
+        i, _ = self._find(key, hash_key(key))
+        return self._values[i] if i != -1 else None
+
+    def delete(self, key):
+        """Supprime une clé de la table"""
+        i, _ = self._find(key, hash_key(key))
+        if i == -1:
+            return False
+        self._keys[i] = _DELETED
+        self._values[i] = None
+        self._count -= 1
+        if self.size > self._min_capacity and self._count * 8 < self.size:
+            self._resize(self._capacity_for(self._count))
+        return True
+
+    def keys(self):
+        """Retourne la liste de toutes les clés dans la table"""
+        return [k for k in self._keys if k is not _EMPTY and k is not _DELETED]
+
+    def items(self):
+        """Générateur paresseux des paires (clé, valeur), en une seule passe."""
+        values = self._values
+        for i, k in enumerate(self._keys):
+            if k is not _EMPTY and k is not _DELETED:
+                yield k, values[i]
+
+    def values(self):
+        """Générateur paresseux des valeurs."""
+        for _, v in self.items():
+            yield v
+
+    # -----------------------------
+    # Construction en masse
+    # -----------------------------
+    def reserve(self, count):
+        """Prédimensionne la table pour count entrées (un seul redimensionnement)."""
+        capacity = self._capacity_for(count + 1)
+        if capacity > self.size:
+            self._resize(capacity)
+
+    def set_many(self, pairs):
+        """Ajoute plusieurs paires (clé, valeur) ; prédimensionne si le nombre est connu."""
+        try:
+            self.reserve(self._count + len(pairs))
+        except TypeError:
+            pass  # itérable sans longueur : croissance normale
+        for key, value in pairs:
+            self.set(key, value)
+
+    @classmethod
+    def from_items(cls, pairs, **kwargs):
+        """Construit une table directement à la bonne taille à partir de paires."""
+        table = cls(**kwargs)
+        table.set_many(pairs)
+        return table
+
+    def __len__(self):
+        return self._count
+
+    # -----------------------------
+    # Statistiques
+    # -----------------------------
+    def stats(self):
+        """Retourne un dict de statistiques : taille, charge, tombstones, sondages."""
+        return {
+            "size": self.size,
+            "count": self._count,
+            "tombstones": self._used - self._count,
+            "load_factor": self._count / self.size,
+            "lookups": self._lookups,
+            "probes": self._probes,
+            "avg_probes": (self._probes / self._lookups) if self._lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        """Remet à zéro les compteurs de sondage."""
+        self._lookups = 0
+        self._probes = 0
+
+    def __repr__(self):
+        """Affichage lisible pour debug"""
+        pairs = [f"{k}: {v}" for k, v in self.items()]
+        return "{" + ", ".join(pairs) + "}"
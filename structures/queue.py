@@ -1,5 +1,10 @@
 # structures/queue.py
 # File (Queue) basée sur une liste chaînée simple — O(1) enqueue/dequeue
+# IndexedQueue : variante sans doublons avec contains/remove en O(1) et position en O(log n)
+
+from array import array
+
+from structures.hashtable import HashTable
 
 class _QNode:
     def __init__(self, value):
@@ -58,3 +63,153 @@ class Queue:
             idx += 1
             cur = cur.next
         return -1
+
+
+class _IQNode:
+    __slots__ = ("value", "seq", "prev", "next")
+
+    def __init__(self, value, seq):
+        self.value = value
+        self.seq = seq
+        self.prev = None
+        self.next = None
+
+
+class IndexedQueue:
+    """
+    File FIFO sans doublons, indexée :
+    - contains / remove d'un élément quelconque en O(1) (HashTable valeur -> nœud,
+      liste doublement chaînée)
+    - position_of en O(log n) : chaque élément reçoit un numéro de séquence croissant,
+      un arbre de Fenwick compte les éléments encore présents avant lui
+    Les numéros sont renumérotés (O(n)) quand l'arbre est plein : coût amorti O(1).
+    """
+
+    _MIN_SLOTS = 16
+
+    def __init__(self, table_cls=HashTable):
+        self._table_cls = table_cls
+        self._index = table_cls()
+        self._head = None
+        self._tail = None
+        self._size = 0
+        self._reset_tree(self._MIN_SLOTS)
+
+    # -----------------------------
+    # Arbre de Fenwick (indices 1..n) sur les numéros de séquence
+    # -----------------------------
+    def _reset_tree(self, slots):
+        self._tree = array("i", bytes(4 * (slots + 1)))
+        self._next_seq = 0      # le numéro de séquence s occupe la case s + 1
+
+    def _fen_add(self, i, delta):
+        tree = self._tree
+        n = len(tree) - 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def _fen_prefix(self, i):
+        tree = self._tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _renumber(self):
+        """Renumérote les éléments présents à partir de 0 et reconstruit l'arbre en O(n)."""
+        slots = max(self._MIN_SLOTS, 2 * (self._size + 1))
+        self._reset_tree(slots)
+        tree = self._tree
+        node = self._head
+        while node is not None:
+            node.seq = self._next_seq
+            self._next_seq += 1
+            tree[node.seq + 1] = 1
+            node = node.next
+        for i in range(1, slots + 1):
+            j = i + (i & -i)
+            if j <= slots:
+                tree[j] += tree[i]
+
+    # -----------------------------
+    # API
+    # -----------------------------
+    def enqueue(self, item):
+        """Ajoute item en queue de file (ValueError s'il y est déjà). Retourne sa position."""
+        if self._index.get(item) is not None:
+            raise ValueError(f"{item!r} est déjà dans la file")
+        if self._next_seq >= len(self._tree) - 1:
+            self._renumber()
+        node = _IQNode(item, self._next_seq)
+        self._next_seq += 1
+        node.prev = self._tail
+        if self._tail is not None:
+            self._tail.next = node
+        else:
+            self._head = node
+        self._tail = node
+        self._index.set(item, node)
+        self._size += 1
+        self._fen_add(node.seq + 1, 1)
+        return self._size
+
+    def _unlink(self, node):
+        if node.prev is not None:
+            node.prev.next = node.next
+        else:
+            self._head = node.next
+        if node.next is not None:
+            node.next.prev = node.prev
+        else:
+            self._tail = node.prev
+        self._index.delete(node.value)
+        self._size -= 1
+        if self._size == 0:
+            # file vide : on repart d'un petit arbre
+            self._reset_tree(self._MIN_SLOTS)
+        else:
+            self._fen_add(node.seq + 1, -1)
+
+    def dequeue(self):
+        node = self._head
+        if node is None:
+            return None
+        self._unlink(node)
+        return node.value
+
+    def remove(self, item):
+        """Retire item où qu'il soit dans la file. Retourne False s'il n'y était pas."""
+        node = self._index.get(item)
+        if node is None:
+            return False
+        self._unlink(node)
+        return True
+
+    def position_of(self, item):
+        """Position de item (1 = tête), ou -1 s'il n'est pas dans la file."""
+        node = self._index.get(item)
+        if node is None:
+            return -1
+        return self._fen_prefix(node.seq + 1)
+
+    def peek(self):
+        return self._head.value if self._head else None
+
+    def is_empty(self):
+        return self._size == 0
+
+    def __contains__(self, item):
+        return self._index.get(item) is not None
+
+    def __len__(self):
+        return self._size
+
+    def to_list(self):
+        out = []
+        cur = self._head
+        while cur:
+            out.append(cur.value)
+            cur = cur.next
+        return out
@@ -0,0 +1,111 @@
+# structures/ring_buffer.py
+# Tampon circulaire à capacité maximale fixe : quand il est plein, l'ajout écrase
+# l'élément le plus ancien en O(1). Le stockage grandit par doublement jusqu'à la
+# capacité : un utilisateur qui n'a que quelques commandes n'occupe que quelques cases.
+# Chaque valeur est accompagnée d'un horodatage (pour la rétention par âge).
+
+from array import array
+
+_INITIAL_SLOTS = 4
+
+
+class RingBuffer:
+    __slots__ = ("_values", "_stamps", "_capacity", "_start", "_length")
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity doit être > 0")
+        self._capacity = capacity
+        self._values = []               # cases allouées (len <= capacity)
+        self._stamps = array("d")
+        self._start = 0     # indice de l'élément le plus ancien
+        self._length = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def _grow(self):
+        """Double le stockage (sans dépasser la capacité) en remettant les éléments dans l'ordre."""
+        slots = len(self._values)
+        new_slots = min(self._capacity, max(_INITIAL_SLOTS, 2 * slots))
+        order = [(self._start + i) % slots for i in range(self._length)] if slots else []
+        values = [self._values[i] for i in order]
+        stamps = array("d", [self._stamps[i] for i in order])
+        pad = new_slots - self._length
+        values.extend([None] * pad)
+        stamps.extend(array("d", bytes(8 * pad)))
+        self._values, self._stamps, self._start = values, stamps, 0
+
+    def append(self, value, stamp=0.0):
+        """Ajoute un élément ; écrase le plus ancien si le tampon est plein."""
+        slots = len(self._values)
+        if self._length == slots and slots < self._capacity:
+            self._grow()
+            slots = len(self._values)
+        if self._length < slots:
+            i = (self._start + self._length) % slots
+            self._length += 1
+        else:
+            i = self._start
+            self._start = (self._start + 1) % slots
+        self._values[i] = value
+        self._stamps[i] = stamp
+
+    def drop_older_than(self, cutoff):
+        """Retire en tête les éléments dont l'horodatage est < cutoff. Retourne le nombre retiré."""
+        dropped = 0
+        slots = len(self._values)
+        while self._length and self._stamps[self._start] < cutoff:
+            self._values[self._start] = None
+            self._start = (self._start + 1) % slots
+            self._length -= 1
+            dropped += 1
+        if not self._length:
+            self._start = 0
+        return dropped
+
+    def iter_reverse(self, skip=0):
+        """
+        Parcourt les éléments du plus récent au plus ancien (O(k) pour k éléments lus).
+        skip: nombre d'éléments récents à sauter (en O(1))
+        """
+        slots = len(self._values)
+        for i in range(self._length - 1 - skip, -1, -1):
+            yield self._values[(self._start + i) % slots]
+
+    def get_last_n(self, k):
+        """Retourne les k derniers éléments (ordre chronologique) en O(k)"""
+        k = max(0, min(k, self._length))
+        slots = len(self._values)
+        first = self._length - k
+        return [self._values[(self._start + i) % slots] for i in range(first, self._length)]
+
+    def get_all(self):
+        """Retourne tous les éléments (du plus ancien au plus récent) sous forme de liste Python"""
+        slots = len(self._values)
+        return [self._values[(self._start + i) % slots] for i in range(self._length)]
+
+    def get_stamps(self):
+        """Horodatages des éléments, dans le même ordre que get_all()"""
+        slots = len(self._values)
+        return [self._stamps[(self._start + i) % slots] for i in range(self._length)]
+
+    def get_last(self):
+        """Retourne le dernier élément ajouté"""
+        if not self._length:
+            return None
+        return self._values[(self._start + self._length - 1) % len(self._values)]
+
+    def clear(self):
+        """Vide le tampon et rend son stockage"""
+        self._values = []
+        self._stamps = array("d")
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return " -> ".join(map(str, self.get_all())) if self._length else "Empty RingBuffer"
@@ -0,0 +1,154 @@
+# structures/trie.py
+# Arbre préfixe (Trie) fait main : mot -> valeur
+# - get(mot) en O(len(mot))
+# - prefix_value(préfixe) en O(len(préfixe)) : chaque nœud retient la valeur commune
+#   à tous les mots de son sous-arbre (ou "ambigu"), calculée à l'insertion
+# - closest(mot, max_dist) : mot le plus proche à au plus max_dist fautes
+#   (insertion, suppression, substitution, inversion de deux lettres voisines),
+#   une bande de la ligne de distance par nœud visité ; les branches trop éloignées
+#   ou dont les mots sont trop courts sont coupées
+
+_EMPTY = object()
+_AMBIGUOUS = object()
+
+
+def max_typos(length):
+    """Fautes tolérées par défaut selon la longueur du mot (aucune sur les mots très courts)."""
+    if length >= 8:
+        return 2
+    if length >= 4:
+        return 1
+    return 0
+
+
+class _TrieNode:
+    __slots__ = ("children", "value", "has_value", "only", "max_len")
+
+    def __init__(self):
+        self.children = {}          # caractère -> _TrieNode
+        self.value = None
+        self.has_value = False
+        self.only = _EMPTY          # valeur partagée par tout le sous-arbre (ou _AMBIGUOUS)
+        self.max_len = 0            # longueur du plus long mot du sous-arbre
+
+
+class Trie:
+    def __init__(self):
+        self._root = _TrieNode()
+        self._size = 0
+
+    def insert(self, word, value):
+        # un mot déjà présent fausserait les valeurs "only" de son chemin
+        if word in self:
+            raise ValueError(f"mot déjà présent : {word!r}")
+        node = self._root
+        self._merge_only(node, value)
+        node.max_len = max(node.max_len, len(word))
+        for ch in word:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            self._merge_only(child, value)
+            child.max_len = max(child.max_len, len(word))
+            node = child
+        node.value = value
+        node.has_value = True
+        self._size += 1
+
+    @staticmethod
+    def _merge_only(node, value):
+        if node.only is _EMPTY:
+            node.only = value
+        elif node.only is not _AMBIGUOUS and node.only != value:
+            node.only = _AMBIGUOUS
+
+    def _find(self, prefix):
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def get(self, word, default=None):
+        node = self._find(word)
+        if node is None or not node.has_value:
+            return default
+        return node.value
+
+    def prefix_value(self, prefix):
+        """Valeur commune à tous les mots commençant par `prefix`, ou None (aucun mot / ambigu)."""
+        node = self._find(prefix)
+        if node is None or node.only is _EMPTY or node.only is _AMBIGUOUS:
+            return None
+        return node.only
+
+    def closest(self, word, max_dist):
+        """
+        (valeur, distance) du mot le plus proche à au plus max_dist fautes, ou None
+        si aucun mot n'est assez proche ou si plusieurs valeurs différentes sont à égalité.
+        Seule une bande de 2 * max_dist + 1 cases est calculée par ligne : le coût
+        par nœud visité ne dépend pas de la longueur du mot.
+        """
+        n = len(word)
+        too_far = max_dist + 1
+        width = 2 * max_dist + 1
+        best = [max_dist, _AMBIGUOUS, False]     # borne, valeur, trouvé ?
+        # ligne de profondeur d : la colonne i est rangée en row[i - d + max_dist] ;
+        # row[width] reste à too_far (colonne hors bande de la ligne précédente)
+
+        def visit(node, depth, ch, prev_ch, prev, pprev):
+            row = [too_far] * (width + 1)
+            left = depth if depth <= max_dist else too_far    # colonne 0
+            if depth <= max_dist:
+                row[max_dist - depth] = depth
+            row_min = left
+            shift = max_dist - depth
+            for i in range(max(1, depth - max_dist), min(n, depth + max_dist) + 1):
+                j = i + shift
+                # prev[j] = colonne i - 1, prev[j + 1] = colonne i, pprev[j] = colonne i - 2
+                d = prev[j] if word[i - 1] == ch else prev[j] + 1
+                if left + 1 < d:
+                    d = left + 1
+                if prev[j + 1] + 1 < d:
+                    d = prev[j + 1] + 1
+                if i > 1 and word[i - 1] == prev_ch and word[i - 2] == ch and pprev[j] + 1 < d:
+                    d = pprev[j] + 1                    # deux lettres inversées
+                if d > too_far:
+                    d = too_far
+                row[j] = left = d
+                if d < row_min:
+                    row_min = d
+            last = n + shift
+            dist = row[last] if 0 <= last < width else too_far
+            if node.has_value and dist <= best[0]:
+                if dist < best[0] or not best[2]:
+                    best[0], best[1], best[2] = dist, node.value, True
+                elif best[1] != node.value:
+                    best[1] = _AMBIGUOUS
+            if row_min <= best[0]:
+                for next_ch, child in node.children.items():
+                    if n - child.max_len <= best[0]:     # sinon : mots trop courts
+                        visit(child, depth + 1, next_ch, ch, row, prev)
+
+        first = [too_far] * (width + 1)
+        for i in range(min(n, max_dist) + 1):
+            first[i + max_dist] = i
+        if self._root.has_value and n <= max_dist:
+            best[0], best[1], best[2] = n, self._root.value, True
+        for ch, child in self._root.children.items():
+            if n - child.max_len <= max_dist:
+                visit(child, 1, ch, None, first, None)
+        if not best[2] or best[1] is _AMBIGUOUS:
+            return None
+        return best[1], best[0]
+
+    def __contains__(self, word):
+        node = self._find(word)
+        return node is not None and node.has_value
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"Trie({self._size} mots)"
@@ -37,3 +37,185 @@ print(cm.handle_user_message(uid, "back"))     # Q2 Python ou Node
 # On répond Python
 print("\n-- Réponse: python --")
 print(cm.handle_user_message(uid, "python"))   # Feuille: back Python
+
+# ---- Table de transitions compilée : état = un entier, chemin reconstruit
+print("\n-- État compilé --")
+assert isinstance(cm._state.get(uid), int) and cm.is_active(uid)
+assert cm.get_path(uid) == ["web", "back", "python"]
+cm.start_conversation(7)
+cm.handle_user_message(7, "web")
+assert cm.handle_user_message(7, "Backend") == cm.get_current_question(7)   # synonyme
+assert cm.handle_user_message(7, "???").startswith("❓") and cm.get_path(7) == ["web", "back"]
+assert not cm.is_active(8)
+cm2 = ConversationManager()
+cm2.load_from_data(cm.dump_for_save())
+assert cm2.get_path(uid) == ["web", "back", "python"] and cm2.get_current_question(uid) is None
+print("✅ État compilé OK")
+
+# ---- Arbres chargés depuis des fichiers : validation, cache, rechargement à chaud
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+
+from features.conversation_loader import DEFAULT_TREE_DIR, TreeValidationError, load_compiled_tree
+
+tmp = tempfile.mkdtemp()
+tree_dir = os.path.join(tmp, "trees")
+cache_dir = os.path.join(tmp, "cache")
+shutil.copytree(DEFAULT_TREE_DIR, tree_dir)
+
+def edit(name, fn):
+    path = os.path.join(tree_dir, name)
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    fn(spec)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+
+def expect_invalid(fn, words):
+    edit("web.json", fn)
+    try:
+        load_compiled_tree(tree_dir)
+        raise AssertionError("arbre invalide accepté")
+    except TreeValidationError as e:
+        print("🚫", e)
+        assert words in str(e)
+    shutil.copy(os.path.join(DEFAULT_TREE_DIR, "web.json"), os.path.join(tree_dir, "web.json"))
+
+expect_invalid(lambda s: s["nodes"]["back_node"].update(options={"encore": "cote"}, question="?"), "cycle")
+expect_invalid(lambda s: s["nodes"].update(orphelin={"result": "x"}), "inaccessible")
+expect_invalid(lambda s: s["nodes"]["front"].pop("result"), "réponse")
+
+cm3 = ConversationManager(tree_dir=tree_dir, cache_dir=cache_dir)
+assert len(os.listdir(cache_dir)) == 1
+assert ConversationManager(tree_dir=tree_dir, cache_dir=cache_dir).tree_hash == cm3.tree_hash   # depuis le cache
+for u, steps in ((1, ["web", "back"]), (2, ["musique"]), (3, ["python", "non"])):
+    cm3.start_conversation(u)
+    for step in steps:
+        cm3.handle_user_message(u, step)
+cm3.dump_delta()
+
+# nouveau sujet + suppression de la branche "back" du web
+with open(os.path.join(tree_dir, "jeux.json"), "w", encoding="utf-8") as f:
+    json.dump({"topic": "jeux", "order": 4, "start": "q",
+               "nodes": {"q": {"question": "PC ou console ? (pc / console)",
+                               "options": {"pc": "pc", "console": "console"}},
+                         "pc": {"result": "🖥️ PC"}, "console": {"result": "🎮 Console"}}}, f)
+edit("web.json", lambda s: (s["nodes"]["cote"]["options"].pop("back"),
+                            [s["nodes"].pop(k) for k in ("back", "back_python", "back_node")]))
+migrated, lost = asyncio.run(cm3.reload_tree(chunk_size=1))
+print("🌳 Rechargé :", migrated, "migrée(s),", lost, "perdue(s)")
+assert (migrated, lost) == (3, 1) and cm3.get_path(1) == [] and cm3.get_path(3) == ["python", "non"]
+assert cm3.speak_about("jeux") and "jeux" in cm3.start_conversation(9)
+assert list(cm3.dump_delta()) == ["1", "9"]
+assert len(os.listdir(cache_dir)) == 1            # ancien cache remplacé
+print("✅ Arbres depuis fichiers OK")
+
+# ---- Options approchées : préfixe non ambigu, fautes de frappe (Trie par nœud)
+from structures.trie import Trie
+
+print("\n-- Options approchées --")
+trie = Trie()
+for word, value in (("front", 1), ("frontend", 1), ("back", 2), ("backend", 2)):
+    trie.insert(word, value)
+assert trie.prefix_value("fron") == 1 and trie.prefix_value("") is None
+assert trie.closest("bakc", 1) == (2, 1) and trie.closest("zzzz", 1) is None
+assert trie.closest("frontedn", 2) == (1, 1) and trie.closest("backend" * 500, 2) is None
+
+typo = ConversationManager()
+typo.start_conversation(20)
+print(typo.handle_user_message(20, "pyhton"))
+assert typo.get_path(20) == ["python"]
+typo.handle_user_message(20, "no")                     # synonyme, exact
+typo.handle_user_message(20, "flas")                   # préfixe unique
+assert typo.get_path(20) == ["python", "non", "flask"]
+typo.reset(20)
+typo.handle_user_message(20, "web")
+assert typo.handle_user_message(20, "f").startswith("❓")   # trop court pour un préfixe
+typo.handle_user_message(20, "fornt")                  # inversion
+assert typo.get_path(20) == ["web", "front"]
+print("✅ Options approchées OK")
+
+# ---- 'speak about X' : index inversé sur tout le contenu de l'arbre
+print("\n-- Recherche de sujets --")
+found = ConversationManager()
+assert found.speak_about("python") and found.speak_about("Django") and not found.speak_about("cuisine")
+assert found.search("django")[0][0] == ["python", "non", "django"]        # la feuille avant son parent
+assert found.search("frontend", 1)[0][0] == ["web", "front"]               # synonyme d'option
+assert found.search("déploiement docker")[0][0] == ["web", "back", "python"]   # texte des réponses
+print(found.handle_user_message(21, "speak about guitare"))
+print("✅ Recherche de sujets OK")
+
+# ---- Sessions inactives : plafond LRU, délai d'inactivité, reprise depuis le disque
+print("\n-- Éviction des sessions --")
+now = [0.0]
+disk = {}
+idle = ConversationManager(max_sessions=2, session_ttl=100, clock=lambda: now[0],
+                           spill=lambda uid: disk.get(str(uid)))
+for u in (1, 2):
+    idle.start_conversation(u)
+    idle.handle_user_message(u, "web")
+disk.update(idle.dump_delta())                         # 1 et 2 sauvegardés
+idle.handle_user_message(1, "back")                    # 1 plus récent que 2
+idle.start_conversation(3)                             # plafond : 2 évincé (déjà sur disque)
+assert idle.session_count() == 2 and not idle.is_active(2)   # évincé : rien en mémoire
+idle.start_conversation(4)                             # 1 évincé avec un état pas encore écrit
+delta = idle.dump_delta()
+assert delta["1"] == {"node": "web/back"} and "2" not in delta
+disk.update(delta)
+reads = []
+idle._spill = lambda uid: reads.append(uid) or disk.get(str(uid))
+
+async def come_back():
+    assert await idle.resume(2) and idle.get_path(2) == ["web"]     # reprise : relu sur disque
+    assert await idle.resume(1) and idle.get_path(1) == ["web", "back"]
+    assert not await idle.resume(9) and not await idle.resume(9)    # jamais évincé : aucune lecture
+    now[0] = 1000.0
+    assert idle.evict_idle() == 2 and idle.session_count() == 0
+    assert await idle.resume(1) and idle.get_path(1) == ["web", "back"]
+
+asyncio.run(come_back())
+assert reads == [2, 1, 1]
+
+# redémarrage : les sessions au-delà du plafond repartent sur disque et restent reprenables ;
+# sans éviction, les utilisateurs sans session ne lisent jamais le disque
+reads = []
+restarted = ConversationManager(max_sessions=1, spill=lambda uid: reads.append(uid) or disk.get(str(uid)))
+restarted.load_from_data({"1": disk["1"], "2": disk["2"]})
+unlimited = ConversationManager(spill=lambda uid: reads.append(uid))
+
+async def after_restart():
+    assert await restarted.resume(1) and restarted.get_path(1) == ["web", "back"]
+    for uid in range(100, 2100):
+        assert not await restarted.resume(uid) and not await unlimited.resume(uid)
+
+asyncio.run(after_restart())
+assert reads == [1]
+
+# sans spill : une session évincée est supprimée (aussi de la sauvegarde)
+gone = ConversationManager(max_sessions=1)
+gone.start_conversation(1)
+gone.dump_delta()
+gone.start_conversation(2)
+assert not gone.is_active(1) and gone.dump_delta() == {"1": None, "2": {"node": "_root"}}
+print("✅ Éviction des sessions OK")
+
+# ---- Sauvegarde par identifiant stable de nœud ; ancien format {"path": [...]} accepté
+print("\n-- Identifiants de nœuds --")
+saved = ConversationManager()
+saved.start_conversation(1)
+for step in ("python", "non", "django"):
+    saved.handle_user_message(1, step)
+assert saved.dump_for_save()["1"] == {"node": "python/django"}
+fresh = ConversationManager()
+fresh.load_from_data({
+    "1": {"node": "python/django"},
+    "2": {"path": ["web", "back"]},                    # ancien format : index chemin -> nœud
+    "3": {"path": ["Web", "Backend"]},                 # chemin non canonique : rejoué
+    "4": {"node": "python/disparu"},                   # nœud supprimé : racine
+})
+assert fresh.get_path(1) == ["python", "non", "django"]
+assert fresh.get_path(2) == fresh.get_path(3) == ["web", "back"] and fresh.get_path(4) == []
+print("✅ Identifiants de nœuds OK")
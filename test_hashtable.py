@@ -0,0 +1,75 @@
+# test_hashtable.py
+# Test de la table de hachage (agrandissement / réduction incrémentaux)
+
+from structures.hashtable import HashTable
+
+table = HashTable(size=8)
+
+# On insère beaucoup de clés : la table doit grandir toute seule
+for i in range(1000):
+    table.set(i, f"user-{i}")
+    table.set(f"key-{i}", i)
+
+print("📈 Stats après insertion :", table.stats())
+assert len(table) == 2000
+assert table.size > 8
+assert table.get(500) == "user-500"
+assert table.get("key-999") == 999
+
+# Mise à jour pendant un éventuel rehash
+table.set(42, "updated")
+assert table.get(42) == "updated"
+assert len(table) == 2000
+
+# On supprime presque tout : la table doit rétrécir
+for i in range(990):
+    table.delete(i)
+    table.delete(f"key-{i}")
+for _ in range(table.size):
+    table.get(0)  # laisse le rehash incrémental se terminer
+
+print("📉 Stats après suppression :", table.stats())
+assert len(table) == 20
+assert sorted(k for k in table.keys() if isinstance(k, int)) == list(range(990, 1000))
+assert table.size < 2048
+
+# ---- Variante compacte à adressage ouvert (même API)
+from structures.open_hashtable import OpenHashTable
+from features.history_manager import HistoryManager
+
+open_table = OpenHashTable(size=8)
+for i in range(1000):
+    open_table.set(i, i * 2)
+for i in range(0, 1000, 2):
+    open_table.delete(i)          # laisse des tombstones
+open_table.set(3, "updated")
+print("🧱 Stats table ouverte :", open_table.stats())
+assert len(open_table) == 500
+assert open_table.get(2) is None
+assert open_table.get(3) == "updated"
+assert open_table.get(999) == 1998
+assert sorted(open_table.keys()) == list(range(1, 1000, 2))
+
+hm = HistoryManager(table_cls=OpenHashTable)
+hm.add_command(7, "!ping")
+assert hm.get_all_commands(7) == ["!ping"]
+
+# ---- Itération en une passe et construction en masse
+pairs = [(f"user-{i}", i) for i in range(5000)]
+for cls in (HashTable, OpenHashTable):
+    bulk = cls.from_items(pairs)
+    assert len(bulk) == 5000
+    assert dict(bulk.items()) == dict(pairs)
+    assert sum(bulk.values()) == sum(range(5000))
+    bulk.set_many([("user-1", -1), ("extra", 0)])
+    assert bulk.get("user-1") == -1 and len(bulk) == 5001
+
+# une table réservée ne rétrécit pas entre deux ajouts : un seul redimensionnement
+reserved = HashTable(size=8)
+reserved.reserve(100000)
+size = reserved.size
+for i in range(100000):
+    reserved.set(i, i)
+    assert reserved.size == size
+assert not reserved.stats()["rehashing"]
+print("📦 Construction en masse OK")
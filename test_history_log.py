@@ -0,0 +1,193 @@
+# test_history_log.py
+# Test du journal d'historique (write-ahead log + compaction)
+
+import os
+import tempfile
+
+from features.history_manager import HistoryManager
+from utils.history_log import HistoryLog
+
+tmp = tempfile.mkdtemp()
+log_path = os.path.join(tmp, "history.log")
+snap_path = os.path.join(tmp, "history_data.json")
+
+uid = 111
+log = HistoryLog(log_path, snap_path, batch_size=2)
+hm = HistoryManager(journal=log)
+hm.add_command(uid, "!ping")
+hm.add_command(uid, "!help")      # lot de 2 -> écrit automatiquement
+hm.add_command(222, "!stats")
+print("📝 En attente :", log.pending_count())
+assert log.pending_count() == 1
+log.flush()
+
+# Compaction : snapshot + journal vidé
+log.compact(hm.dump_for_save())
+assert os.path.getsize(log_path) == 0
+
+# Nouvelles mutations après la compaction : seulement dans le journal
+hm.clear_history(222)
+hm.add_command(uid, "!save")
+log.flush()
+
+# Redémarrage : snapshot + fin du journal
+log2 = HistoryLog(log_path, snap_path)
+hm2 = HistoryManager(journal=log2)
+replayed = log2.load(hm2)
+print("🔁 Rejoués :", replayed, "->", hm2.get_all_commands(uid))
+assert replayed == 2
+assert hm2.get_all_commands(uid) == ["!ping", "!help", "!save"]
+assert hm2.get_all_commands(222) == []
+
+# ---- Sauvegarde automatique hors boucle (thread) + écriture atomique
+import asyncio
+import threading
+
+from utils.autosave import AutoSaver
+from utils.persistence import load_json, save_json
+
+conv_path = os.path.join(tmp, "conversation_data.json")
+writer_threads = []
+
+def write_conv(data):
+    writer_threads.append(threading.current_thread())
+    save_json(conv_path, data)
+    return len(data)
+
+async def run_autosave():
+    saver = AutoSaver(interval=3600, every_n=2)
+    saver.add_job("history", lambda: log2.prepare(hm2), log2.commit)
+    saver.add_job("conversation", lambda: {"1": {"path": ["web"]}}, write_conv)
+    saver.start()
+    hm2.add_command(uid, "!auto")
+    saver.notify(2)                    # seuil atteint -> sauvegarde en arrière-plan
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if writer_threads:
+            break
+    return await saver.flush_now()     # !save : flush immédiat
+
+results = asyncio.run(run_autosave())
+print("💾 Autosave :", results)
+assert writer_threads and writer_threads[0] is not threading.main_thread()
+assert load_json(conv_path) == {"1": {"path": ["web"]}}
+assert not [f for f in os.listdir(tmp) if f.startswith(".tmp-")]
+
+log3 = HistoryLog(log_path, snap_path)
+hm3 = HistoryManager(journal=log3)
+log3.load(hm3)
+assert hm3.get_all_commands(uid) == ["!ping", "!help", "!save", "!auto"]
+
+# ---- Suivi des utilisateurs modifiés : la compaction n'écrit que le delta
+from features.conversation_manager import ConversationManager
+from utils.persistence import save_delta_json
+
+log4 = HistoryLog(log_path, snap_path, batch_size=None, compact_after=1)
+hm4 = HistoryManager(journal=log4)
+log4.load(hm4)
+assert hm4.dirty_count() == 2          # seuls les utilisateurs du journal rejoué sont "sales"
+hm4.add_command(333, "!new")
+hm4.delete_user_history(222)
+records, users = log4.commit(log4.prepare(hm4))
+print("🧮 Compaction delta :", records, "enregistrement(s),", users, "utilisateur(s) écrit(s)")
+assert (records, users) == (2, 3) and hm4.dirty_count() == 0
+snapshot = load_json(snap_path)
+assert snapshot["333"] == ["!new"] and "222" not in snapshot
+assert snapshot[str(uid)] == ["!ping", "!help", "!save", "!auto"]
+
+cm = ConversationManager()
+cm.start_conversation(1)
+cm.start_conversation(2)
+cm.handle_user_message(2, "web")
+assert save_delta_json(conv_path, cm.dump_delta()) == 2
+cm.handle_user_message(2, "back")
+delta = cm.dump_delta()
+assert list(delta) == ["2"] and save_delta_json(conv_path, delta) == 1
+assert load_json(conv_path)["2"] == {"node": "web/back"}
+
+# ---- Snapshot binaire : conversion JSON, chargement paresseux (mmap), compaction delta
+from utils.binary_snapshot import BinarySnapshotStore, convert_json, open_snapshot
+
+bin_path = os.path.join(tmp, "history_data.bin")
+print("🔁 Converti :", convert_json(snap_path, bin_path), "utilisateur(s)")
+
+log5 = HistoryLog(log_path, BinarySnapshotStore(bin_path), batch_size=None, compact_after=1)
+hm5 = HistoryManager(journal=log5)
+log5.load(hm5)
+assert len(hm5.storage) == 0                     # rien n'est décodé au chargement
+assert hm5.count_commands(uid) == 4 and len(hm5.storage) == 0
+assert hm5.get_all_commands(uid) == ["!ping", "!help", "!save", "!auto"]
+assert len(hm5.storage) == 1                     # seul l'utilisateur lu est matérialisé
+
+hm5.add_command(444, "!bin")
+hm5.delete_user_history(333)
+records, users = log5.commit(log5.prepare(hm5))
+assert users == 2
+snap = open_snapshot(log5.snapshot.current_path())      # nouvelle génération, l'ancienne reste mappée
+assert snap.path != bin_path
+assert sorted(snap.keys()) == sorted([str(uid), "444"])
+assert snap.read("444") == ["!bin"] and snap.read(str(uid))[-1] == "!auto"
+snap.close()
+# le manager est rebranché sur le fichier réécrit (l'ancien mmap est fermé)
+old_snap = hm5.storage._snapshot
+hm5.delete_user_history(uid)                     # après la compaction : pas dans le fichier
+assert log5.reattach_snapshot() and hm5.storage._snapshot is not old_snap
+assert old_snap._mm is None and not log5.reattach_snapshot()
+assert not os.path.exists(bin_path)                 # ancienne génération supprimée une fois fermée
+assert hm5.get_all_commands(444) == ["!bin"] and not hm5.storage.exists(uid)
+
+# ---- Shards : seuls les fichiers touchés sont réécrits, chargement parallèle
+from utils.sharded_store import ShardedJsonStore, ShardedBinarySnapshotStore, shard_of
+
+conv_store = ShardedJsonStore(os.path.join(tmp, "conversations"), "conversation", n_shards=8)
+conv_store.save_all({str(i): {"path": []} for i in range(100)})
+users, shards = conv_store.save_delta({"5": {"path": ["web"]}, "6": None})
+print("🧩 Delta conversations :", users, "utilisateur(s),", shards, "shard(s)")
+assert users == 2 and shards == len({shard_of(5, 8), shard_of(6, 8)})
+merged = conv_store.load_all()
+assert len(merged) == 99 and merged["5"] == {"path": ["web"]}
+assert conv_store.load_user(5) == {"path": ["web"]} and conv_store.load_user(6) is None
+
+hist_store = ShardedBinarySnapshotStore(os.path.join(tmp, "history"), "history", n_shards=4)
+hist_store.write({str(i): [f"!c{i}"] for i in range(20)}, seq=0)
+log6 = HistoryLog(os.path.join(tmp, "sharded.log"), hist_store, batch_size=None, compact_after=1)
+hm6 = HistoryManager(journal=log6)
+log6.load(hm6)
+assert hm6.get_all_commands(7) == ["!c7"]
+before = {i: hist_store.current_path(i) for i in range(4)}
+hm6.add_command(7, "!more")
+records, users = log6.commit(log6.prepare(hm6))
+touched = [i for i in range(4) if hist_store.current_path(i) != before[i]]
+assert users == 1 and touched == [shard_of(7, 4)]
+assert log6.reattach_snapshot() and not os.path.exists(before[shard_of(7, 4)])
+
+log7 = HistoryLog(os.path.join(tmp, "sharded.log"), ShardedBinarySnapshotStore(os.path.join(tmp, "history"), "history", n_shards=4))
+hm7 = HistoryManager(journal=log7)
+log7.load(hm7)
+assert hm7.get_all_commands(7) == ["!c7", "!more"] and hm7.count_commands(19) == 1
+
+# ---- Snapshot impossible à écrire : le journal continue d'avancer (rien n'est perdu)
+class BrokenStore:
+    def load(self, manager):
+        return 0
+
+    def write(self, data, seq, delta=False):
+        raise OSError("disque plein")
+
+broken_path = os.path.join(tmp, "broken.log")
+log8 = HistoryLog(broken_path, BrokenStore(), batch_size=None, compact_after=1)
+hm8 = HistoryManager(journal=log8)
+for round_ in range(2):
+    hm8.add_command(8, f"!r{round_}")
+    prepared = log8.prepare(hm8)
+    assert prepared[1] is not None                  # compaction demandée
+    try:
+        log8.commit(prepared)
+        raise AssertionError("l'écriture du snapshot aurait dû échouer")
+    except OSError:
+        hm8.restore_dirty(prepared[1])
+    assert log8.committed_seq == log8.last_seq == round_ + 1
+assert os.path.getsize(broken_path) > 0
+hm9 = HistoryManager()
+assert HistoryLog(broken_path, BrokenStore()).load(hm9) == 2
+assert hm9.get_all_commands(8) == ["!r0", "!r1"]
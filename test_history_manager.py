@@ -28,3 +28,178 @@ print(history.export_history_text(user_id))
 history.clear_history(user_id)
 print("\\n🗑️ Après suppression :", history.get_all_commands(user_id))
 
+
+# ---- Rétention : historique borné (tampon circulaire)
+from features.history_manager import RetentionPolicy
+
+fake_now = [1000.0]
+bounded = HistoryManager(retention=RetentionPolicy(max_entries=3, max_age=60),
+                         clock=lambda: fake_now[0])
+for i in range(5):
+    bounded.add_command(user_id, f"!cmd{i}")
+print("\n♻️ Garde les 3 dernières :", bounded.get_all_commands(user_id))
+assert bounded.get_all_commands(user_id) == ["!cmd2", "!cmd3", "!cmd4"]
+
+fake_now[0] += 30
+bounded.add_command(user_id, "!recent")
+fake_now[0] += 45   # les commandes d'avant ont maintenant plus de 60 s
+print("⏱️ Après expiration :", bounded.get_all_commands(user_id))
+assert bounded.get_all_commands(user_id) == ["!recent"]
+
+# les horodatages sont sauvegardés : l'âge des commandes survit à un rechargement
+saved = bounded.dump_for_save()
+assert saved[str(user_id)] == {"cmds": ["!recent"], "ts": [1030.0]}
+reloaded = HistoryManager(retention=RetentionPolicy(max_entries=3, max_age=60),
+                          clock=lambda: fake_now[0])
+reloaded.load_from_data(saved)
+assert reloaded.get_all_commands(user_id) == ["!recent"]
+fake_now[0] += 16
+assert reloaded.get_all_commands(user_id) == []
+
+from utils.binary_snapshot import encode_commands, decode_entries
+assert decode_entries(encode_commands(["!a", "!b"], [1.5, 2.5])) == (["!a", "!b"], [1.5, 2.5])
+assert decode_entries(encode_commands(["!a"])) == (["!a"], None)
+
+# snapshot paresseux : le nombre de commandes ne compte pas celles expirées depuis
+import os
+import tempfile
+
+from utils.binary_snapshot import open_snapshot, write_snapshot
+
+snap_file = os.path.join(tempfile.mkdtemp(), "aged.bin")
+write_snapshot(snap_file, [(str(user_id), {"cmds": ["!old", "!new"], "ts": [900.0, 1080.0]})])
+aged = HistoryManager(retention=RetentionPolicy(max_entries=3, max_age=60),
+                      clock=lambda: fake_now[0])
+aged.storage.attach_snapshot(open_snapshot(snap_file))
+fake_now[0] = 1100.0
+assert aged.count_commands(user_id) == 1 and aged.get_page(user_id, 1)[2] == 1
+
+# ---- Liste déroulée : lecture depuis la fin en O(k)
+from structures.linked_list import UnrolledLinkedList
+
+ull = UnrolledLinkedList(chunk_size=4)
+for i in range(10):
+    ull.append(i)
+print("\n🧩 3 derniers :", ull.get_last_n(3))
+assert ull.get_last_n(3) == [7, 8, 9]
+assert list(ull.iter_reverse())[:2] == [9, 8]
+assert ull.get_all() == list(range(10)) and ull.get_last() == 9 and len(ull) == 10
+
+# ---- Pagination depuis la fin (page 1 = plus récentes)
+paged = HistoryManager()
+for i in range(1, 26):
+    paged.add_command(user_id, f"!c{i}")
+entries, page, pages = paged.get_page(user_id, 1, page_size=10)
+print("\n📄 Page 1 :", entries)
+assert pages == 3 and entries[0] == (16, "!c16") and entries[-1] == (25, "!c25")
+entries, page, pages = paged.get_page(user_id, 99, page_size=10)
+assert page == 3 and entries == [(i, f"!c{i}") for i in range(1, 6)]
+
+# ---- Export en mémoire : lignes générées à la demande, gzip en option, aucun fichier
+import gzip
+import os
+
+from utils.export_buffer import export_to_buffer, export_to_buffer_auto
+
+exporter = HistoryManager()
+for i in range(3):
+    exporter.add_command(user_id, f"!e{i}")
+lines = exporter.iter_export_lines(user_id)      # copie prise maintenant
+exporter.add_command(user_id, "!apres")          # n'apparaît pas dans cet export
+files_before = set(os.listdir("."))
+plain = export_to_buffer(lines)
+assert plain.read().decode("utf-8") == "1. !e0\n2. !e1\n3. !e2\n"
+packed = export_to_buffer(exporter.iter_export_lines(user_id), compress=True)
+packed_text = gzip.decompress(packed.getvalue()).decode("utf-8")
+assert packed_text.endswith("4. !apres\n")
+small, small_gz = export_to_buffer_auto(exporter.iter_export_lines(user_id), 1024)
+big, big_gz = export_to_buffer_auto(exporter.iter_export_lines(user_id), 16)   # seuil en octets
+assert not small_gz and small.getvalue() == packed_text.encode("utf-8")
+assert big_gz and gzip.decompress(big.getvalue()) == small.getvalue()
+assert set(os.listdir(".")) == files_before
+assert exporter.export_history_text(user_id).endswith("4. !apres") and exporter.export_history_text(42) == ""
+print("📦 Export en mémoire OK")
+
+# ---- Compteurs de commandes (!stats) : à jour à chaque ajout, top-k sans parcours
+import tempfile
+
+from structures.frequency_counter import FrequencyCounter
+from utils.history_log import HistoryLog
+
+fc = FrequencyCounter()
+for key in "abacab":
+    fc.add(key)
+assert fc.top(2) == [("a", 3), ("b", 2)] and fc.rank("c") == 3 and fc.total == 6
+fc.add("a", -3)
+assert "a" not in fc and fc.top(1) == [("b", 2)]
+
+# rang O(1) (compteur de clés au-dessus de chaque palier) : comparé à un recomptage complet
+import random
+
+rng = random.Random(7)
+ranked, expected = FrequencyCounter(), {}
+for step in range(2000):
+    key = rng.randrange(20)
+    if step % 97 == 0:
+        ranked.remove(key)
+        expected.pop(key, None)
+        continue
+    n = rng.choice((1, 1, 1, -1, 3, -2))
+    ranked.add(key, n)
+    if expected.get(key, 0) + n > 0:
+        expected[key] = expected.get(key, 0) + n
+    else:
+        expected.pop(key, None)
+    if step % 50 == 0:
+        for k, c in expected.items():
+            assert ranked.rank(k) == 1 + sum(v > c for v in expected.values())
+rebuilt = FrequencyCounter.from_counts(expected.items())
+assert all(rebuilt.rank(k) == ranked.rank(k) for k in expected)
+
+counted = HistoryManager()
+for uid, cmd in ((1, "!play a"), (1, "!play b"), (1, "!ping"), (2, "!help"), (2, "!PLAY")):
+    counted.add_command(uid, cmd)
+st = counted.stats
+assert st.total(1) == 3 and st.total() == 5
+assert st.top_commands(1) == [("!play", 3)] and st.top_commands(2, user_id=1) == [("!play", 2), ("!ping", 1)]
+assert st.top_users(1) == [(1, 3)] and st.rank_of(2) == 2
+counted.clear_history(1)
+assert st.total(1) == 0 and st.top_commands(5) == [("!help", 1), ("!play", 1)]
+print("\n📊 Compteurs :", st.top_commands(5), st.top_users(5))
+
+# persistance : les enregistrements du journal déjà comptés ne sont pas recomptés
+tmp_dir = tempfile.mkdtemp()
+log = HistoryLog(os.path.join(tmp_dir, "history.log"), os.path.join(tmp_dir, "snap.json"))
+journaled = HistoryManager(journal=log)
+journaled.add_command(5, "!a")
+journaled.add_command(5, "!b")
+assert log.last_seq == 2 and log.committed_seq == 0     # attribués, pas encore écrits
+log.flush()
+assert log.committed_seq == 2
+from features.command_stats import convert_legacy_dump
+from utils.sharded_store import ShardedJsonStore
+
+stats_store = ShardedJsonStore(os.path.join(tmp_dir, "stats"), "stats", 4)
+saved_stats = journaled.stats.dump_delta(seq=log.committed_seq)   # sauvegarde des compteurs ici
+assert saved_stats == {"5": {"seq": 2, "counts": {"!a": 1, "!b": 1}}} and not journaled.stats.is_dirty()
+stats_store.save_delta(saved_stats)
+journaled.add_command(5, "!c")                          # après : seulement dans le journal
+journaled.add_command(6, "!d")
+log.flush()
+restarted = HistoryManager()
+restarted.stats.load(stats_store.load_all())
+HistoryLog(log.path, os.path.join(tmp_dir, "snap.json")).load(restarted)
+assert restarted.stats.total(5) == 3 and restarted.stats.top_commands(3, 5) == [("!a", 1), ("!b", 1), ("!c", 1)]
+assert restarted.stats.total(6) == 1 and restarted.stats.seq == 2
+
+# delta : seuls les utilisateurs modifiés sont copiés ; remis à zéro -> None
+assert sorted(journaled.stats.dump_delta(seq=4)) == ["5", "6"]
+journaled.clear_history(6)
+delta = journaled.stats.dump_delta(seq=5)
+assert delta == {"6": None}
+journaled.stats.restore_dirty(delta)                    # écriture ratée : à refaire
+assert journaled.stats.dump_delta(seq=5) == {"6": None}
+restarted.stats.rebuild(restarted.dump_for_save())
+assert restarted.stats.total(5) == 3 and len(restarted.stats.dump_delta()) == 2
+assert convert_legacy_dump({"seq": 7, "users": {"5": {"!a": 2}}}) == {"5": {"seq": 7, "counts": {"!a": 2}}}
+print("✅ Compteurs de commandes OK")
@@ -0,0 +1,130 @@
+# test_history_storage.py
+# Test des backends d'historique (mémoire / SQLite) et du cache LRU
+
+import os
+import tempfile
+import threading
+
+from structures.lru_cache import LRUCache
+from features.history_manager import HistoryManager, RetentionPolicy
+from features.history_storage import MemoryHistoryStorage
+from features.sqlite_history_storage import SqliteHistoryStorage
+
+# ---- Cache LRU
+lru = LRUCache(capacity=2)
+lru.put("a", 1)
+lru.put("b", 2)
+lru.get("a")                          # "b" devient le moins récent
+evicted = lru.put("c", 3)
+print("🧹 Évincé :", evicted)
+assert evicted == ("b", 2) and "b" not in lru and len(lru) == 2
+assert lru.oldest()[0] == "a" and lru.remove("a") == 1 and lru.items() == [("c", 3)]
+
+# ---- Mémoire : utilisable seul (horloge par défaut)
+mem = MemoryHistoryStorage()
+mem.load({"1": ["!a", "!b"]})
+assert mem.get_all(1) == ["!a", "!b"] and mem.count(1) == 2
+
+# ---- SQLite : mêmes réponses que le backend mémoire
+tmp = tempfile.mkdtemp()
+db_path = os.path.join(tmp, "history.sqlite3")
+store = SqliteHistoryStorage(db_path, batch_size=3, cache_size=2, hot_size=4, read_chunk=5)
+hm = HistoryManager(storage=store)
+ref = HistoryManager()
+for i in range(30):
+    for m in (hm, ref):
+        m.add_command(1, f"!cmd{i}")
+        m.add_command(2 + i % 3, f"!autre{i}")
+print("⏳ En attente :", store.pending_count())
+assert store.pending_count() < 3                 # écrit par lots de 3
+
+assert hm.get_last_command(1) == "!cmd29" and hm.count_commands(1) == 30
+assert hm.get_all_commands(1) == ref.get_all_commands(1)
+assert hm.get_page(1, 3, 7) == ref.get_page(1, 3, 7)   # page profonde : requêtes indexées
+assert hm.get_page(4, 1, 7) == ref.get_page(4, 1, 7)
+assert hm.dump_for_save() == ref.dump_for_save()
+assert hm.dirty_count() == 0                     # rien à suivre : la base est la sauvegarde
+
+hm.clear_history(2)
+hm.delete_user_history(3)
+assert hm.get_all_commands(2) == [] and store.exists(2) and not store.exists(3)
+print("💾 Écrit :", store.flush(), "ligne(s)")
+store.close()
+
+# réouverture : rien n'est chargé, les lectures passent par la base
+hm2 = HistoryManager(storage=SqliteHistoryStorage(db_path))
+assert len(hm2.storage) == 3
+assert hm2.get_all_commands(1) == ref.get_all_commands(1)
+assert hm2.get_page(1, 2, 10)[0][0] == (11, "!cmd10")
+hm2.add_command(1, "!apres")
+assert hm2.get_last_command(1) == "!apres" and hm2.count_commands(1) == 31
+
+# ---- Rétention : seules les N dernières commandes restent en base
+capped = HistoryManager(storage=SqliteHistoryStorage(":memory:", retention=RetentionPolicy(max_entries=5)))
+for i in range(12):
+    capped.add_command(9, f"!c{i}")
+capped.storage.flush()
+assert capped.get_all_commands(9) == [f"!c{i}" for i in range(7, 12)]
+assert capped.storage._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 5
+assert [n for n, _ in capped.iter_recent(9)] == [5, 4, 3, 2, 1]
+
+# vidage / suppression : mis en attente comme les ajouts, écrits au flush
+lazy = SqliteHistoryStorage(":memory:", batch_size=None)
+lazy_hm = HistoryManager(storage=lazy)
+for uid in (1, 2):
+    lazy_hm.add_command(uid, "!a")
+lazy.flush()
+lazy_hm.clear_history(1)
+lazy_hm.delete_user_history(2)
+lazy_hm.add_command(2, "!b")                    # recréé dans le même lot
+rows = lambda: lazy._conn.execute("SELECT user_id, command FROM history ORDER BY user_id").fetchall()
+assert rows() == [("1", "!a"), ("2", "!a")] and lazy.pending_count() == 3
+assert lazy_hm.get_all_commands(1) == [] and lazy_hm.get_all_commands(2) == ["!b"]
+lazy.flush()
+assert rows() == [("2", "!b")] and lazy_hm.count_commands(2) == 1
+
+# rétention par âge : la base n'est nettoyée que si une commande a expiré
+now = [1000.0]
+aged = SqliteHistoryStorage(":memory:", retention=RetentionPolicy(max_age=60), clock=lambda: now[0])
+aged_hm = HistoryManager(storage=aged, clock=lambda: now[0])
+aged_hm.add_command(7, "!vieux")
+now[0] += 50
+aged_hm.add_command(7, "!recent")
+aged.flush()
+statements = []
+aged._conn.set_trace_callback(statements.append)
+assert aged_hm.get_all_commands(7) == ["!vieux", "!recent"]
+assert not any(q.startswith("DELETE") for q in statements)
+now[0] += 20
+assert aged_hm.get_all_commands(7) == ["!recent"] and aged_hm.count_commands(7) == 1
+assert sum(q.startswith("DELETE") for q in statements) == 1
+assert aged_hm.dump_for_save() == {"7": {"cmds": ["!recent"], "ts": [1050.0]}}
+
+# écritures de la boucle : jamais bloquées par un flush ou une lecture en cours (connexion occupée)
+busy = SqliteHistoryStorage(":memory:", batch_size=None)
+busy_hm = HistoryManager(storage=busy)
+busy_hm.add_command(5, "!a")
+busy_hm.get_all_commands(5)                     # en cache
+held, done = threading.Event(), threading.Event()
+
+def hold_connection():
+    with busy._lock:
+        held.set()
+        done.wait(5)
+
+holder = threading.Thread(target=hold_connection)
+holder.start()
+held.wait(5)
+writer = threading.Thread(target=lambda: (busy_hm.add_command(5, "!b"), busy_hm.add_command(6, "!c"),
+                                          busy_hm.clear_history(6), busy_hm.delete_user_history(7)))
+writer.start()
+writer.join(2)
+blocked = writer.is_alive()
+done.set()
+holder.join()
+writer.join()
+assert not blocked and busy.pending_count() == 4
+assert busy_hm.get_all_commands(5) == ["!a", "!b"] and busy_hm.get_all_commands(6) == []
+assert busy.exists(6) and not busy.exists(7) and busy.pending_count() == 0
+
+print("✅ Backends d'historique OK")
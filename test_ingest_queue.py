@@ -0,0 +1,71 @@
+# test_ingest_queue.py
+# Test de la file d'ingestion bornée (écriture différée par lots vers l'historique)
+
+import asyncio
+
+from features.history_manager import HistoryManager
+from utils.ingest_queue import IngestQueue
+
+hm = HistoryManager()
+batches = []
+
+def sink(batch):
+    batches.append(len(batch))
+    hm.add_commands(batch)
+
+# ---- Sans boucle : push O(1), file pleine -> refus compté, vidage par lots
+q = IngestQueue(sink, maxsize=5, batch_size=2)
+for i in range(7):
+    q.push((1, f"!c{i}", float(i)))
+assert len(q) == 5 and q.dropped == 2 and q.overflows == 2 and q.high_water == 5
+assert q.drain_all() == 5 and batches == [2, 2, 1]
+assert hm.get_all_commands(1) == [f"!c{i}" for i in range(5)]
+q.push((2, "!apres", None))                 # le tableau circulaire repart après le vidage
+q.drain_once()
+assert hm.get_last_command(2) == "!apres"
+print("📥 Compteurs :", q.stats())
+
+# ---- Tâche de fond : rafale vidée par lots, put() attend une place (contre-pression)
+async def burst():
+    hm2 = HistoryManager()
+    q2 = IngestQueue(lambda b: hm2.add_commands(b), maxsize=100, batch_size=32)
+    q2.start()
+    for i in range(100):
+        q2.push((3, f"!r{i}", None))        # file pleine
+    assert not q2.push((3, "!perdue", None))
+    assert await q2.put((3, "!attend", None), timeout=1)     # place libérée par la tâche
+    await asyncio.sleep(0.01)
+    assert len(q2) == 0 and q2.batches >= 4
+    await q2.stop()
+    return hm2.get_all_commands(3), q2.stats()
+
+cmds, stats = asyncio.run(burst())
+assert cmds == [f"!r{i}" for i in range(100)] + ["!attend"]
+assert stats["dropped"] == 1 and stats["written"] == 101
+
+# ---- Avant start() (chargement) : put() attend le démarrage au lieu de perdre l'élément
+async def early():
+    q4 = IngestQueue(lambda b: None, maxsize=2, batch_size=2)
+    q4.push((5, "!a", None))
+    q4.push((5, "!b", None))
+    waiting = asyncio.create_task(q4.put((5, "!c", None), timeout=1))
+    await asyncio.sleep(0.01)
+    assert not waiting.done() and q4.dropped == 0
+    q4.start()
+    assert await waiting and q4.dropped == 0
+    await q4.stop()
+    return q4.stats()
+
+stats = asyncio.run(early())
+assert stats["written"] == 3 and stats["dropped"] == 0
+
+# ---- Erreur du sink : comptée, la file continue
+def failing(batch):
+    raise RuntimeError("disque plein")
+
+q3 = IngestQueue(failing, maxsize=4, batch_size=4)
+q3.push((4, "!x", None))
+q3.drain_all()
+assert q3.errors == 1 and len(q3) == 0
+
+print("✅ File d'ingestion OK")
@@ -0,0 +1,181 @@
+# test_lock_system.py
+# Test du système de lock (file d'attente indexée, FIFO)
+
+from utils.lock_system import LockSystem
+
+ls = LockSystem()
+print(ls.acquire("history", 1))          # ('acquired', 0)
+print(ls.acquire("history", 2))          # ('queued', 1)
+print(ls.acquire("history", 3))          # ('queued', 2)
+print(ls.acquire("history", 4))          # ('queued', 3)
+assert ls.acquire("history", 3) == ("queued", 2)     # relance : pas de doublon
+assert ls.holder_of("history") == 1
+
+# un utilisateur qui quitte la file : les suivants avancent
+assert ls.leave("history", 2) and not ls.leave("history", 2)
+assert ls.position_of("history", 3) == 1 and ls.position_of("history", 4) == 2
+print("📋 Statut :", ls.status("history"))
+
+# FIFO conservé au relâchement
+assert ls.release("history", 1) == (True, "transferred", 3)
+assert ls.release("history", 4) == (False, "not_holder", None)
+assert ls.release("history", 3) == (True, "transferred", 4)
+assert ls.release("history", 4) == (True, "released", None)
+assert ls.holder_of("history") is None and ls.status("history") == (None, [])
+
+# beaucoup de relances pendant une rafale : la position reste exacte
+ls.acquire("history", 0)
+for uid in range(1, 2001):
+    ls.acquire("history", uid)
+for uid in range(1, 1001, 2):
+    ls.leave("history", uid)
+assert ls.acquire("history", 2000) == ("queued", 1500)
+assert ls.position_of("history", 2) == 1
+print("✅ LockSystem OK")
+
+# ---- Bail : expiration et passage automatique au suivant
+import asyncio
+
+from structures.heap import MinHeap
+from utils.lease_scheduler import LeaseScheduler
+
+h = MinHeap()
+for p in (5, 1, 4, 1, 3):
+    h.push(p, f"v{p}")
+assert [h.pop()[0] for _ in range(5)] == [1, 1, 3, 4, 5] and h.pop() is None
+
+now = [0.0]
+ls = LockSystem(lease=10, clock=lambda: now[0])
+ls.acquire("history", 1)
+ls.acquire("history", 2)
+now[0] = 8
+assert ls.acquire("history", 1) == ("already", 0)      # renouvelle jusqu'à 18
+now[0] = 15
+assert ls.holder_of("history") == 1
+now[0] = 18
+assert ls.holder_of("history") == 2                     # expiration vérifiée à la lecture
+assert ls.expires_in("history") == 10
+assert ls.release("history", 2) == (True, "released", None)
+assert ls.next_deadline() is None                       # lock libre : plus aucune échéance
+
+async def scenario():
+    lk = LockSystem(lease=0.05)
+    expired = []
+    sched = LeaseScheduler(lk, on_expired=lambda r, old, new: expired.append((old, new)))
+    sched.start()
+    lk.acquire("history", "a")
+    lk.acquire("history", "b")
+    await asyncio.sleep(0.2)
+    sched.stop()
+    return expired, lk.holder_of("history")
+
+expired, holder = asyncio.run(scenario())
+print("⌛ Expirations :", expired)
+assert expired == [("a", "b"), ("b", None)] and holder is None
+
+# expiration constatée à la consultation, avant la minuterie : notifiée elle aussi
+async def lazy_expiry():
+    clock = [0.0]
+    lk = LockSystem(lease=10, clock=lambda: clock[0])
+    expired = []
+    sched = LeaseScheduler(lk, on_expired=lambda r, old, new: expired.append((r, old, new)))
+    sched.start()
+    lk.acquire("doc", "a")
+    lk.acquire("doc", "b")
+    clock[0] = 10
+    assert lk.holder_of("doc") == "b"
+    sched.stop()
+    return expired
+
+assert asyncio.run(lazy_expiry()) == [("doc", "a", "b")]
+print("✅ Baux OK")
+
+# ---- Lecteurs / écrivain et ressources hiérarchiques
+ls = LockSystem()
+assert ls.acquire("history:1", 1)[0] == "acquired"
+assert ls.acquire("history:2", 2)[0] == "acquired"      # utilisateurs différents : pas d'attente
+assert ls.can_write("history:2", 2) and not ls.can_read("history:1", 2)
+assert ls.acquire("doc", 1, "read")[0] == "acquired"
+assert ls.acquire("doc", 2, "read")[0] == "acquired"    # lecteurs simultanés
+assert ls.acquire("doc", 3, "write") == ("queued", 1)
+assert ls.acquire("doc", 4, "read") == ("queued", 2)    # pas de dépassement de l'écrivain
+ls.release("doc", 1)
+assert ls.release("doc", 2) == (True, "transferred", 3)
+assert ls.release("doc", 3) == (True, "transferred", 4) and ls.readers_of("doc") == [4]
+
+# lecteur en file pour passer en écriture : servi, il ne reste pas compté comme lecteur
+up = LockSystem()
+up.acquire("doc", 1, "read")
+up.acquire("doc", 2, "read")
+assert up.acquire("doc", 1, "write") == ("queued", 1)
+assert up.release("doc", 2) == (True, "transferred", 1)
+assert up.holder_of("doc") == 1 and up.readers_of("doc") == []
+up.release("doc", 1)
+assert len(up._locks) == 0 and up.acquire("doc", 3, "write") == ("acquired", 0)
+
+# le lock global attend la fin des locks par utilisateur, puis bloque tout le monde
+assert ls.acquire("history", 9) == ("queued", 1)
+ls.release("history:1", 1)
+assert ls.release("history:2", 2) == (True, "transferred", 9)
+assert not ls.can_write("history:5", 5) and ls.can_read("history:5", 9)
+assert ls.acquire("history:5", 5) == ("queued", 1)
+assert ls.release("history", 9) == (True, "transferred", 5)
+
+# un écrivain global en file n'est pas doublé par les nouvelles demandes par utilisateur
+ls = LockSystem()
+ls.acquire("history:1", 1)
+assert ls.acquire("history", 9) == ("queued", 1)
+assert ls.acquire("history:2", 2) == ("queued", 1)
+assert ls.acquire("history:2", 3, "read") == ("queued", 2)
+assert ls.release("history:1", 1) == (True, "transferred", 9)
+assert ls.position_of("history:2", 2) == 1
+ok, info, _ = ls.release("history", 9)
+assert ok and ls.holder_of("history:2") == 2 and ls.position_of("history:2", 3) == 1
+assert ls.release("history:2", 2) == (True, "transferred", 3)
+# l'écrivain qui abandonne la file débloque les sous-ressources derrière lui
+ls.acquire("history:4", 4)
+ls.acquire("history", 9)
+ls.acquire("history:5", 5)
+assert ls.leave("history", 9) and ls.holder_of("history:5") == 5
+# les locks libérés ne restent pas en mémoire
+for resource, uid in (("history:2", 3), ("history:4", 4), ("history:5", 5)):
+    ls.release(resource, uid)
+assert len(ls._locks) == 0 and ls.status("history:2") == (None, [])
+print("✅ Lecteurs / écrivain OK")
+
+# ---- Attente asynchrone : réveil à la libération, timeout
+async def waiting():
+    lk = LockSystem()
+    lk.acquire("history", "admin")
+    order = []
+
+    async def reader(uid):
+        status = await lk.acquire_async("history:" + uid, uid, "read", timeout=1)
+        order.append((uid, status))
+
+    tasks = [asyncio.create_task(reader(u)) for u in ("a", "b")]
+    await asyncio.sleep(0.01)
+    assert order == []                                  # parqués, sans réessayer
+    lk.release("history", "admin")
+    await asyncio.gather(*tasks)
+    assert sorted(order) == [("a", "acquired"), ("b", "acquired")]
+
+    lk.acquire("doc", "x")
+    assert await lk.acquire_async("doc", "y", timeout=0.02) == "timeout"
+    assert lk.position_of("doc", "y") == -1             # retiré de la file
+    waiter = asyncio.create_task(lk.acquire_async("doc", "z"))
+    await asyncio.sleep(0)
+    assert lk.release("doc", "x") == (True, "transferred", "z")
+    assert await waiter == "acquired" and lk.holder_of("doc") == "z"
+
+    # place prise explicitement (!lockhistory) : l'attente passagère ne la rend pas
+    lk.acquire("doc", "w")
+    assert await lk.acquire_async("doc", "w", timeout=0.02) == "timeout"
+    assert lk.position_of("doc", "w") == 1
+    waiter = asyncio.create_task(lk.acquire_async("doc", "w"))
+    await asyncio.sleep(0)
+    lk.release("doc", "z")
+    assert await waiter == "already" and lk.holder_of("doc") == "w"
+
+asyncio.run(waiting())
+print("✅ Attente asynchrone OK")
@@ -30,3 +30,17 @@ hm2.load_from_data(load_json("data/history_data.json"))
 cm2.load_from_data(load_json("data/conversation_data.json"))
 print("✅ Rechargement effectué.")
 print("Historique rechargé:", hm2.get_all_commands(uid))
+
+# les fichiers réécrits gardent leurs droits (mkstemp crée en 0600)
+import os
+import stat
+import tempfile
+
+mode_dir = tempfile.mkdtemp()
+fresh = os.path.join(mode_dir, "fresh.json")
+save_json(fresh, {})
+assert stat.S_IMODE(os.stat(fresh).st_mode) == 0o644
+os.chmod(fresh, 0o640)
+save_json(fresh, {"a": 1})
+assert stat.S_IMODE(os.stat(fresh).st_mode) == 0o640 and load_json(fresh) == {"a": 1}
+print("✅ Droits des fichiers conservés.")
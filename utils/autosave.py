@@ -0,0 +1,103 @@
+# utils/autosave.py
+# Sauvegarde automatique hors de la boucle asyncio
+# - chaque "job" = (snapshot_fn, write_fn, on_error, on_done)
+#     snapshot_fn() : appelé sur la boucle, retourne une copie cohérente des données (ou None)
+#     write_fn(data): appelé dans un thread, fait les écritures disque (atomiques)
+#     on_error(data): appelé sur la boucle si write_fn échoue (ex: remarquer les utilisateurs "sales")
+#     on_done(res)  : appelé sur la boucle après une écriture réussie (ex: rebrancher un snapshot)
+# - déclenchement : toutes les `interval` secondes, ou après `every_n` mutations (notify)
+# - une seule sauvegarde à la fois ; !save appelle flush_now()
+
+import asyncio
+
+
+class AutoSaver:
+    def __init__(self, interval=60.0, every_n=500, on_saved=None):
+        self.interval = interval
+        self.every_n = every_n
+        self.on_saved = on_saved     # on_saved(résultats) après chaque sauvegarde automatique
+        self._jobs = []              # (nom, snapshot_fn, write_fn, on_error, on_done)
+        self._mutations = 0
+        self._task = None
+        self._wake = None            # asyncio.Event, créé au démarrage (dans la boucle)
+        self._save_lock = None       # asyncio.Lock, idem
+
+    def add_job(self, name, snapshot_fn, write_fn, on_error=None, on_done=None):
+        self._jobs.append((name, snapshot_fn, write_fn, on_error, on_done))
+
+    def notify(self, n=1):
+        """Signale n mutations ; réveille la sauvegarde au-delà de every_n."""
+        self._mutations += n
+        if self._wake is not None and self.every_n and self._mutations >= self.every_n:
+            self._wake.set()
+
+    # -----------------------------
+    # Cycle de vie
+    # -----------------------------
+    def start(self):
+        """Démarre la tâche de fond (à appeler depuis la boucle asyncio)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._save_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Arrête la tâche de fond puis fait une dernière sauvegarde."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_now()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                results = await self.flush_now()
+                if results and self.on_saved is not None:
+                    self.on_saved(results)
+            except Exception as e:
+                print("⚠️ Erreur sauvegarde automatique:", e)
+
+    # -----------------------------
+    # Sauvegarde
+    # -----------------------------
+    async def flush_now(self):
+        """
+        Sauvegarde immédiate : instantanés pris sur la boucle (tous au même instant),
+        écritures dans un thread. Retourne {nom_job: résultat de write_fn}.
+        """
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        async with self._save_lock:
+            # 1) instantanés synchrones : aucune mutation ne peut s'intercaler
+            snapshots = [(name, snapshot_fn(), write_fn, on_error, on_done)
+                         for name, snapshot_fn, write_fn, on_error, on_done in self._jobs]
+            self._mutations = 0
+            # 2) écritures hors de la boucle
+            results = {}
+            error = None
+            for name, data, write_fn, on_error, on_done in snapshots:
+                if data is None:
+                    continue
+                try:
+                    results[name] = await asyncio.to_thread(write_fn, data)
+                except Exception as e:
+                    # de retour sur la boucle : on peut rendre l'instantané au manager
+                    if on_error is not None:
+                        on_error(data)
+                    error = error or e
+                    continue
+                if on_done is not None:
+                    on_done(results[name])
+            if error is not None:
+                raise error
+            return results
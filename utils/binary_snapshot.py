@@ -0,0 +1,343 @@
+# utils/binary_snapshot.py
+# Snapshot binaire compact de l'historique, lu paresseusement via mmap
+#
+# Format (entiers little-endian) :
+#   en-tête : MAGIC (8 o) | nb_utilisateurs u32 | log_seq u64 | offset_index u64
+#   données : pour chaque utilisateur : nb_commandes u32, puis (longueur u32 + utf-8) par commande,
+#             puis, si le bit de poids fort de nb_commandes est levé, un horodatage f64 par commande
+#   index   : pour chaque utilisateur : longueur_clé u16 | clé utf-8 | offset u64 | longueur u32
+#
+# Au chargement, seul l'index est lu ; l'historique d'un utilisateur n'est décodé
+# que la première fois que HistoryManager y touche (attach_snapshot).
+#
+# Générations : un fichier mappé ne peut pas être remplacé sous Windows. Chaque réécriture
+# crée donc un nouveau fichier "<chemin>.<n>" (le chemin lui-même est la génération 0) ;
+# le plus récent fait foi, les anciens sont supprimés dès qu'ils ne sont plus ouverts.
+#
+# Conversion depuis l'ancien JSON :
+#   python -m utils.binary_snapshot data/history_data.json data/history_data.bin
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+from structures.hashtable import HashTable
+from utils.persistence import ensure_parent_dir, load_json, replace_file
+
+MAGIC = b"HSNAP1\x00\x00"
+_HEADER = struct.Struct("<8sIQQ")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_INDEX_ENTRY = struct.Struct("<QI")
+_STAMPED = 0x80000000      # bit de nb_commandes : les horodatages suivent les commandes
+
+SEQ_KEY = "__log_seq__"   # même clé réservée que le snapshot JSON du journal
+
+
+def encode_commands(cmds, stamps=None):
+    """
+    Encode une liste de commandes en bloc binaire (nb + chaînes préfixées par leur longueur),
+    suivies de leurs horodatages s'ils sont donnés.
+    """
+    parts = [_U32.pack(len(cmds) | (_STAMPED if stamps is not None else 0))]
+    for c in cmds:
+        raw = c.encode("utf-8")
+        parts.append(_U32.pack(len(raw)))
+        parts.append(raw)
+    if stamps is not None:
+        parts.append(struct.pack(f"<{len(cmds)}d", *stamps))
+    return b"".join(parts)
+
+
+def decode_entries(buf, offset=0):
+    """Décode un bloc produit par encode_commands : (commandes, horodatages ou None)."""
+    (n,) = _U32.unpack_from(buf, offset)
+    stamped, n = n & _STAMPED, n & ~_STAMPED
+    pos = offset + 4
+    out = []
+    for _ in range(n):
+        (size,) = _U32.unpack_from(buf, pos)
+        pos += 4
+        out.append(bytes(buf[pos:pos + size]).decode("utf-8"))
+        pos += size
+    stamps = list(struct.unpack_from(f"<{n}d", buf, pos)) if stamped else None
+    return out, stamps
+
+
+def decode_commands(buf, offset=0):
+    """Commandes seules d'un bloc produit par encode_commands."""
+    return decode_entries(buf, offset)[0]
+
+
+def _encode_value(value):
+    """Bloc d'une valeur d'historique : bloc déjà encodé, liste, ou {"cmds", "ts"}."""
+    if isinstance(value, (bytes, bytearray)):
+        return value
+    if isinstance(value, dict):
+        return encode_commands(value["cmds"], value.get("ts"))
+    return encode_commands(value)
+
+
+class BinarySnapshot:
+    """Vue en lecture seule d'un fichier snapshot (mmap + index clé -> (offset, longueur))."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._lock = threading.Lock()
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # fichier vide : pas de mmap possible
+            self._file.close()
+            raise ValueError(f"snapshot vide : {path}")
+        magic, count, seq, index_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"format de snapshot inconnu : {path}")
+        self.seq = seq
+        self._index = HashTable()
+        self._keys = []
+        pos = index_offset
+        mm = self._mm
+        for _ in range(count):
+            (klen,) = _U16.unpack_from(mm, pos)
+            pos += 2
+            key = mm[pos:pos + klen].decode("utf-8")
+            pos += klen
+            self._index.set(key, _INDEX_ENTRY.unpack_from(mm, pos))
+            pos += _INDEX_ENTRY.size
+            self._keys.append(key)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return self._index.get(str(key)) is not None
+
+    def keys(self):
+        """Clés (str) présentes dans le fichier."""
+        return list(self._keys)
+
+    def count(self, key):
+        """Nombre de commandes d'un utilisateur sans rien décoder (0 si absent)."""
+        entry = self._index.get(str(key))
+        if entry is None:
+            return 0
+        with self._lock:
+            return _U32.unpack_from(self._mm, entry[0])[0] & ~_STAMPED
+
+    def read_raw(self, key):
+        """Bloc binaire brut d'un utilisateur (None si absent) : recopié tel quel à la compaction."""
+        entry = self._index.get(str(key))
+        if entry is None:
+            return None
+        offset, length = entry
+        with self._lock:
+            return self._mm[offset:offset + length]
+
+    def read(self, key):
+        """Commandes décodées d'un utilisateur (None si absent)."""
+        raw = self.read_raw(key)
+        return decode_commands(raw) if raw is not None else None
+
+    def read_entries(self, key):
+        """
+        Valeur sauvegardée d'un utilisateur (None si absent) : liste de commandes,
+        ou {"cmds": [...], "ts": [...]} si le bloc porte les horodatages.
+        """
+        raw = self.read_raw(key)
+        if raw is None:
+            return None
+        cmds, stamps = decode_entries(raw)
+        return cmds if stamps is None else {"cmds": cmds, "ts": stamps}
+
+    def close(self):
+        with self._lock:
+            if getattr(self, "_mm", None) is not None:
+                self._mm.close()
+                self._mm = None
+            self._file.close()
+
+
+def open_snapshot(path: str):
+    """Ouvre un snapshot binaire, ou retourne None s'il est absent ou vide."""
+    try:
+        return BinarySnapshot(path)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        if os.path.getsize(path) == 0:
+            return None
+        raise
+
+
+def write_snapshot(path: str, entries, seq=0):
+    """
+    Écrit un snapshot de façon atomique (temp + fsync + rename).
+    entries : itérable de (clé, valeur) où valeur est une liste de commandes,
+              {"cmds": [...], "ts": [...]}, ou un bloc déjà encodé (bytes, recopié sans décodage).
+    Retourne le nombre d'utilisateurs écrits.
+    """
+    ensure_parent_dir(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\x00" * _HEADER.size)          # en-tête réécrit à la fin
+            index = []
+            offset = _HEADER.size
+            for key, value in entries:
+                blob = _encode_value(value)
+                f.write(blob)
+                index.append((str(key).encode("utf-8"), offset, len(blob)))
+                offset += len(blob)
+            index_offset = offset
+            for kraw, off, length in index:
+                f.write(_U16.pack(len(kraw)))
+                f.write(kraw)
+                f.write(_INDEX_ENTRY.pack(off, length))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, len(index), seq, index_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(index)
+
+
+def snapshot_files(path: str):
+    """Générations présentes d'un snapshot : [(numéro, chemin)], de la plus ancienne à la plus récente."""
+    directory = os.path.dirname(path) or "."
+    prefix = os.path.basename(path) + "."
+    out = [(0, path)] if os.path.exists(path) else []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return out
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and suffix.isdigit():
+            out.append((int(suffix), os.path.join(directory, name)))
+    out.sort()
+    return out
+
+
+def current_snapshot_path(path: str):
+    """Fichier de la génération la plus récente (path lui-même s'il n'y en a aucune)."""
+    files = snapshot_files(path)
+    return files[-1][1] if files else path
+
+
+def remove_stale_snapshots(path: str, keep: str):
+    """
+    Supprime les générations autres que keep. Un fichier encore mappé (Windows) ne
+    peut pas l'être : il est laissé en place et supprimé à une prochaine occasion.
+    """
+    for _, name in snapshot_files(path):
+        if name != keep:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+
+class BinarySnapshotStore:
+    """
+    Snapshot binaire utilisable par utils.history_log.HistoryLog :
+    - load(manager) attache le fichier au manager (chargement paresseux)
+    - write(data, seq, delta) écrit une nouvelle génération en recopiant tels quels
+      les blocs des utilisateurs non modifiés, puis ouvre le nouveau fichier
+    - reattach() (sur la boucle) branche ce nouveau fichier sur le manager, ferme
+      l'ancien mmap puis supprime l'ancien fichier
+    Le fichier mappé n'est jamais remplacé ni modifié : fonctionne aussi sous Windows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._manager = None     # manager auquel le snapshot est attaché (load)
+        self._snap = None        # snapshot attaché
+        self._fresh = None       # snapshot réécrit, pas encore rebranché
+
+    def current_path(self):
+        """Fichier de la génération la plus récente."""
+        return current_snapshot_path(self.path)
+
+    def load(self, manager):
+        self._manager = manager
+        current = self.current_path()
+        remove_stale_snapshots(self.path, current)     # restes d'un arrêt avant le nettoyage
+        snap = open_snapshot(current)
+        if snap is None:
+            return 0
+        manager.attach_snapshot(snap)
+        self._snap = snap
+        return snap.seq
+
+    def write(self, data: dict, seq: int, delta=False):
+        """Écrit une nouvelle génération (peut tourner dans un thread). Retourne le nombre d'utilisateurs écrits."""
+        files = snapshot_files(self.path)
+        source = files[-1][1] if files else None
+        target = f"{self.path}.{files[-1][0] + 1}" if files else self.path
+        written = self._write(data, seq, delta, source, target)
+        if self._manager is not None:
+            # index du nouveau fichier lu ici, hors de la boucle ; branché par reattach()
+            if self._fresh is not None:
+                self._fresh.close()
+            self._fresh = open_snapshot(target)
+        # les générations précédentes encore mappées restent jusqu'à reattach()
+        remove_stale_snapshots(self.path, target)
+        return written
+
+    def reattach(self):
+        """Sur la boucle : branche le snapshot réécrit et ferme l'ancien. Retourne True si changé."""
+        fresh, self._fresh = self._fresh, None
+        if fresh is None:
+            return False
+        self._manager.attach_snapshot(fresh)
+        if self._snap is not None:
+            self._snap.close()
+        self._snap = fresh
+        remove_stale_snapshots(self.path, fresh.path)
+        return True
+
+    def _write(self, data, seq, delta, source, target):
+        if not delta:
+            return write_snapshot(target, data.items(), seq)
+        old = open_snapshot(source) if source is not None else None
+
+        def entries():
+            if old is not None:
+                for key in old.keys():
+                    if key not in data:
+                        yield key, old.read_raw(key)   # non modifié : recopie brute
+            for k, v in data.items():
+                if v is not None:
+                    yield k, v
+
+        try:
+            write_snapshot(target, entries(), seq)
+        finally:
+            if old is not None:
+                old.close()
+        return len(data)
+
+
+def convert_json(json_path: str, bin_path: str):
+    """Convertit un snapshot JSON ({user_id: [commandes]}) en snapshot binaire. Retourne le nb d'utilisateurs."""
+    data = load_json(json_path)
+    seq = data.pop(SEQ_KEY, 0)
+    return write_snapshot(bin_path, data.items(), seq)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage : python -m utils.binary_snapshot <entrée.json> <sortie.bin>")
+        sys.exit(1)
+    n = convert_json(sys.argv[1], sys.argv[2])
+    print(f"✅ {n} utilisateur(s) converti(s) -> {sys.argv[2]}")
@@ -0,0 +1,36 @@
+# utils/export_buffer.py
+# Export en mémoire : les lignes d'un générateur sont encodées au fil de l'eau dans un
+# tampon BytesIO (gzip en option, ou selon la taille du texte), sans fichier temporaire sur disque.
+# Prévu pour tourner dans un thread (asyncio.to_thread) : rien ne touche à la boucle.
+
+import gzip
+import io
+
+
+def export_to_buffer(lines, compress=False, encoding="utf-8"):
+    """
+    Écrit les lignes (str) dans un BytesIO, compressé en gzip si `compress`.
+    Retourne le tampon rembobiné, prêt à être lu (ex: discord.File(fp=...)).
+    """
+    buf = io.BytesIO()
+    if compress:
+        # mtime=0 : même contenu -> mêmes octets
+        with gzip.GzipFile(fileobj=buf, mode="wb", mtime=0) as gz:
+            for line in lines:
+                gz.write(line.encode(encoding))
+    else:
+        for line in lines:
+            buf.write(line.encode(encoding))
+    buf.seek(0)
+    return buf
+
+
+def export_to_buffer_auto(lines, gzip_min_bytes, encoding="utf-8"):
+    """
+    Comme export_to_buffer, mais compressé seulement si le texte atteint gzip_min_bytes
+    (la taille n'est connue qu'une fois les lignes encodées). Retourne (tampon, compressé).
+    """
+    buf = export_to_buffer(lines, encoding=encoding)
+    if buf.getbuffer().nbytes < gzip_min_bytes:
+        return buf, False
+    return io.BytesIO(gzip.compress(buf.getvalue(), mtime=0)), True
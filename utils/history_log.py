@@ -0,0 +1,247 @@
+# utils/history_log.py
+# Journal d'historique en ajout seul (write-ahead log) :
+# - chaque add_command / clear_history / suppression devient un petit enregistrement JSON (une ligne) ;
+#   un ajout garde son horodatage ("ts"), pour que la rétention par âge survive au redémarrage
+# - les enregistrements sont écrits par lots (flush), sans réécrire tout l'historique
+# - la compaction replie le journal dans un instantané (snapshot) puis vide le journal
+# - au démarrage : snapshot + relecture de la fin du journal
+#
+# Chaque enregistrement porte un numéro de séquence ; le snapshot mémorise le dernier
+# numéro qu'il contient. Si l'arrêt survient entre l'écriture du snapshot et le vidage
+# du journal, la relecture ignore les enregistrements déjà inclus (pas de doublon).
+#
+# Découpage pour la sauvegarde hors de la boucle asyncio :
+#   prepare(manager)  -> sur la boucle : prend le lot (+ delta des utilisateurs modifiés si compaction)
+#   commit(prepared)  -> dans un thread : écritures disque (le delta est fusionné dans le snapshot)
+
+import json
+import os
+import threading
+
+from utils.persistence import ensure_parent_dir, save_json, load_json, apply_delta
+
+SEQ_KEY = "__log_seq__"   # clé réservée du snapshot : dernier numéro de séquence inclus
+
+
+class JsonSnapshotStore:
+    """Snapshot JSON {user_id: [commandes]} (format historique de data/history_data.json)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, manager):
+        """Charge le snapshot dans le manager. Retourne le dernier numéro de séquence inclus."""
+        data = load_json(self.path)
+        seq = data.pop(SEQ_KEY, 0)
+        manager.load_from_data(data)
+        return seq
+
+    def write(self, data: dict, seq: int, delta=False):
+        """Écrit le snapshot (complet, ou delta fusionné). Retourne le nombre d'utilisateurs écrits."""
+        if delta:
+            store = load_json(self.path)
+            apply_delta(store, data)
+        else:
+            store = dict(data)
+        store[SEQ_KEY] = seq
+        save_json(self.path, store)
+        return len(data)
+
+
+class HistoryLog:
+    def __init__(self, path: str, snapshot, batch_size=100, compact_after=50_000):
+        """
+        snapshot : chemin d'un snapshot JSON, ou un objet "store" (load / write),
+                   ex: utils.binary_snapshot.BinarySnapshotStore
+        """
+        self.path = path
+        self.snapshot = JsonSnapshotStore(snapshot) if isinstance(snapshot, str) else snapshot
+        self.batch_size = batch_size          # flush automatique tous les N enregistrements (None = jamais)
+        self.compact_after = compact_after    # compaction conseillée au-delà de N enregistrements
+        self._pending = []                    # enregistrements pas encore écrits
+        self._failed = []                     # lot dont l'écriture a échoué (réessayé au prochain lot)
+        self._records_in_log = 0              # enregistrements présents dans le fichier
+        self._seq = 0                         # dernier numéro de séquence attribué
+        self._committed = 0                   # dernier numéro écrit sur disque (journal ou snapshot)
+        self._io_lock = threading.Lock()      # les écritures peuvent venir d'un thread
+
+    # -----------------------------
+    # Écriture
+    # -----------------------------
+    def record(self, op: str, user_id, cmd=None, ts=None):
+        """Ajoute un enregistrement (op ∈ {"add","clear","delete"}) au lot en cours."""
+        self._seq += 1
+        rec = {"seq": self._seq, "op": op, "user": str(user_id)}
+        if cmd is not None:
+            rec["cmd"] = cmd
+        if ts is not None:
+            rec["ts"] = ts
+        self._pending.append(rec)
+        if self.batch_size is not None and len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def pending_count(self):
+        return len(self._pending)
+
+    @property
+    def last_seq(self):
+        """Dernier numéro de séquence attribué."""
+        return self._seq
+
+    @property
+    def committed_seq(self):
+        """Dernier numéro de séquence écrit sur disque (les suivants peuvent encore être perdus)."""
+        return self._committed
+
+    def reserve_seq(self, seq):
+        """Garantit que les prochains numéros seront > seq (ex: déjà cités par une autre sauvegarde)."""
+        self._seq = max(self._seq, seq)
+
+    def take_batch(self):
+        """Retire et retourne le lot en attente (à appeler sur la boucle)."""
+        with self._io_lock:
+            failed, self._failed = self._failed, []
+        batch, self._pending = self._pending, []
+        return failed + batch if failed else batch
+
+    def write_batch(self, batch):
+        """Ajoute un lot à la fin du journal (peut tourner dans un thread). Retourne sa taille."""
+        if not batch:
+            return 0
+        with self._io_lock:
+            ensure_parent_dir(self.path)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in batch))
+                f.flush()
+                os.fsync(f.fileno())
+            self._records_in_log += len(batch)
+            # le lot contient aussi les lots échoués avant lui : tout ce qui précède est écrit
+            self._committed = max(self._committed, max(rec["seq"] for rec in batch))
+        return len(batch)
+
+    def flush(self):
+        """Écrit le lot en attente à la fin du journal. Retourne le nombre d'enregistrements écrits."""
+        return self.write_batch(self.take_batch())
+
+    # -----------------------------
+    # Compaction
+    # -----------------------------
+    def needs_compaction(self, extra=0):
+        return self._records_in_log + extra >= self.compact_after
+
+    def write_snapshot(self, snapshot_data: dict, seq: int, delta=False):
+        """
+        Écrit le snapshot (atomique) puis vide le journal (peut tourner dans un thread).
+        delta=True : snapshot_data ne contient que les utilisateurs modifiés (None = supprimé),
+        fusionnés dans le snapshot existant. Retourne le nombre d'utilisateurs écrits.
+        """
+        with self._io_lock:
+            written = self.snapshot.write(snapshot_data, seq, delta=delta)
+            ensure_parent_dir(self.path)
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+            self._records_in_log = 0
+            self._committed = max(self._committed, seq)
+        return written
+
+    def compact(self, snapshot_data: dict):
+        """
+        Écrit l'instantané complet puis vide le journal.
+        snapshot_data doit refléter tous les enregistrements déjà passés à record().
+        """
+        self._pending = []
+        self.write_snapshot(snapshot_data, self._seq)
+        self.reattach_snapshot()
+
+    def reattach_snapshot(self, _result=None):
+        """
+        Sur la boucle, après une compaction : rebranche le manager sur le snapshot réécrit
+        (si le store le permet, ex: snapshots binaires paresseux). Retourne True si changé.
+        """
+        reattach = getattr(self.snapshot, "reattach", None)
+        return reattach() if reattach is not None else False
+
+    def prepare(self, manager):
+        """
+        Sur la boucle : prend le lot en attente et, si le journal est long,
+        le delta des utilisateurs modifiés depuis la dernière compaction,
+        pris au même instant (donc cohérent).
+        """
+        batch = self.take_batch()
+        delta = None
+        if self.needs_compaction(len(batch)):
+            delta = manager.dump_delta()
+        return batch, delta, self._seq
+
+    def commit(self, prepared):
+        """
+        Dans un thread : écrit ce que prepare() a préparé.
+        Retourne (enregistrements traités, utilisateurs écrits dans le snapshot).
+        En cas d'échec, le lot est gardé ; le delta est à rendre au manager (restore_dirty).
+        Le lot est toujours ajouté au journal avant la compaction : si le snapshot ne peut
+        pas être écrit, rien n'est perdu et le journal continue d'avancer.
+        """
+        batch, delta, seq = prepared
+        try:
+            written = self.write_batch(batch)
+        except Exception:
+            # on garde le lot pour la prochaine tentative plutôt que de le perdre
+            with self._io_lock:
+                self._failed = batch + self._failed
+            raise
+        if delta is None:
+            return written, 0
+        return len(batch), self.write_snapshot(delta, seq, delta=True)
+
+    # -----------------------------
+    # Relecture au démarrage
+    # -----------------------------
+    def replay(self, manager, after_seq=0, seq_for=None):
+        """
+        Rejoue le journal sur le manager (apply_log_record), en ignorant les
+        enregistrements déjà inclus dans le snapshot. Retourne le nombre rejoué.
+        seq_for(user) : seuil propre à chaque utilisateur (snapshot découpé en shards).
+        """
+        count = 0
+        in_log = 0
+        last_seq = after_seq
+        good_offset = 0      # fin de la dernière ligne valide
+        truncated = False
+        try:
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    line = raw.strip()
+                    if not line:
+                        good_offset += len(raw)
+                        continue
+                    try:
+                        rec = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        # dernière ligne tronquée (arrêt brutal pendant l'écriture) : on s'arrête là
+                        truncated = True
+                        break
+                    good_offset += len(raw)
+                    in_log += 1
+                    seq = rec.get("seq", 0)
+                    limit = seq_for(rec.get("user")) if seq_for is not None else after_seq
+                    if seq and seq <= limit:
+                        continue
+                    manager.apply_log_record(rec)
+                    last_seq = max(last_seq, seq)
+                    count += 1
+        except FileNotFoundError:
+            pass
+        if truncated:
+            # on coupe la ligne abîmée pour que les prochains ajouts restent lisibles
+            os.truncate(self.path, good_offset)
+        self._records_in_log = in_log
+        self._seq = max(self._seq, last_seq)
+        self._committed = max(self._committed, last_seq)
+        return count
+
+    def load(self, manager):
+        """Charge le snapshot puis rejoue la fin du journal. Retourne le nombre d'enregistrements rejoués."""
+        seq = self.snapshot.load(manager)
+        self._seq = max(self._seq, seq)
+        self._committed = max(self._committed, seq)
+        return self.replay(manager, after_seq=seq, seq_for=getattr(self.snapshot, "seq_for", None))
@@ -0,0 +1,168 @@
+# utils/ingest_queue.py
+# File d'ingestion bornée entre le listener on_message et l'historique (écriture différée)
+# - push() en O(1) sans await : le chemin des messages reste minimal, même en rafale
+# - tableau circulaire de taille fixe : aucune allocation par message
+# - une tâche de fond vide la file par lots de batch_size et les passe à sink(lot)
+# - file pleine : push() refuse (compté dans `dropped`), put() attend une place (contre-pression),
+#   y compris avant start() : l'attente se termine quand la tâche démarre et vide la file
+# - compteurs : reçus, écrits, refusés, débordements, lots, erreurs, pic de remplissage
+
+import asyncio
+
+
+class IngestQueue:
+    def __init__(self, sink, maxsize=10000, batch_size=256):
+        if maxsize <= 0 or batch_size <= 0:
+            raise ValueError("maxsize et batch_size doivent être > 0")
+        self.sink = sink                 # sink(liste d'éléments) : appelé sur la boucle
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self._slots = [None] * maxsize
+        self._head = 0                   # prochain élément à sortir
+        self._size = 0
+        self._task = None
+        self._ready = None               # asyncio.Event : des éléments attendent
+        self._space = None               # asyncio.Event : de la place s'est libérée
+        # compteurs
+        self.received = 0
+        self.written = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.batches = 0
+        self.errors = 0
+        self.high_water = 0
+
+    # -----------------------------
+    # Production
+    # -----------------------------
+    def push(self, item):
+        """Ajoute un élément en O(1). Retourne False (élément perdu) si la file est pleine."""
+        if self._size == self.maxsize:
+            self.overflows += 1
+            self.dropped += 1
+            return False
+        self._append(item)
+        return True
+
+    async def put(self, item, timeout=None):
+        """
+        Comme push, mais attend (au plus timeout secondes) qu'une place se libère
+        quand la file est pleine. Retourne False si l'élément a finalement été perdu.
+        """
+        if self._size < self.maxsize:
+            return self.push(item)
+        if self._space is None:
+            # pas encore démarrée (chargement en cours) : start() reprendra cet Event
+            self._space = asyncio.Event()
+        self.overflows += 1
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self._size == self.maxsize:
+            self._space.clear()
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                self.dropped += 1
+                return False
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+        self._append(item)
+        return True
+
+    def _append(self, item):
+        self._slots[(self._head + self._size) % self.maxsize] = item
+        self._size += 1
+        self.received += 1
+        if self._size > self.high_water:
+            self.high_water = self._size
+        if self._ready is not None:
+            self._ready.set()
+
+    # -----------------------------
+    # Consommation
+    # -----------------------------
+    def _take(self, n):
+        n = min(n, self._size)
+        batch = []
+        slots, size = self._slots, self.maxsize
+        for _ in range(n):
+            batch.append(slots[self._head])
+            slots[self._head] = None
+            self._head = (self._head + 1) % size
+        self._size -= n
+        return batch
+
+    def drain_once(self):
+        """Passe un lot (au plus batch_size éléments) au sink. Retourne la taille du lot."""
+        batch = self._take(self.batch_size)
+        if not batch:
+            return 0
+        self.batches += 1
+        try:
+            self.sink(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.errors += 1
+            print("⚠️ Erreur d'ingestion:", e)
+        if self._space is not None:
+            self._space.set()
+        return len(batch)
+
+    def drain_all(self):
+        """Vide toute la file (arrêt, sauvegarde forcée). Retourne le nombre d'éléments traités."""
+        total = 0
+        while self._size:
+            total += self.drain_once()
+        return total
+
+    # -----------------------------
+    # Cycle de vie
+    # -----------------------------
+    def start(self):
+        """Démarre la tâche de fond (à appeler depuis la boucle asyncio)."""
+        if self._task is not None and not self._task.done():
+            return
+        self._ready = asyncio.Event()
+        if self._space is None:
+            self._space = asyncio.Event()
+        if self._size:
+            self._ready.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Arrête la tâche de fond puis écrit ce qui reste dans la file."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.drain_all()
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._size:
+                self.drain_once()
+                await asyncio.sleep(0)   # un lot à la fois : les messages passent entre deux lots
+
+    def stats(self):
+        return {
+            "pending": self._size,
+            "received": self.received,
+            "written": self.written,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+            "batches": self.batches,
+            "errors": self.errors,
+            "high_water": self.high_water,
+        }
+
+    def __len__(self):
+        return self._size
+
+    def __repr__(self):
+        return f"IngestQueue({self._size}/{self.maxsize})"
@@ -0,0 +1,61 @@
+# utils/lease_scheduler.py
+# Expiration des baux de LockSystem sur la boucle asyncio
+# - une seule minuterie (loop.call_at) armée sur la prochaine échéance du tas
+# - aucun lock avec bail : aucune minuterie, aucun coût
+# - à l'échéance : LockSystem.expire_due() passe le lock au suivant, puis on réarme
+# - on_expired est branché sur LockSystem.on_expired : une expiration constatée
+#   paresseusement (consultation du lock avant la minuterie) est aussi notifiée
+
+import asyncio
+
+
+class LeaseScheduler:
+    def __init__(self, locksys, on_expired=None):
+        self.locksys = locksys
+        self.on_expired = on_expired    # on_expired(ressource, ancien_holder, nouveau_holder)
+        self._loop = None
+        self._handle = None
+        self._armed_at = None           # échéance (horloge du LockSystem) de la minuterie armée
+
+    def start(self):
+        """Branche le planificateur (à appeler depuis la boucle asyncio)."""
+        self._loop = asyncio.get_running_loop()
+        self.locksys.on_deadline = self.reschedule
+        self.locksys.on_expired = self._notify
+        self.reschedule()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = None
+        self._armed_at = None
+        self.locksys.on_deadline = None
+        self.locksys.on_expired = None
+
+    def reschedule(self):
+        """(Ré)arme la minuterie sur la prochaine échéance valide, si elle a changé."""
+        if self._loop is None:
+            return
+        deadline = self.locksys.next_deadline()
+        if deadline == self._armed_at:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._armed_at = deadline
+        if deadline is not None:
+            delay = max(0.0, deadline - self.locksys.clock())
+            self._handle = self._loop.call_at(self._loop.time() + delay, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._armed_at = None
+        self.locksys.expire_due()       # notifie via _notify
+        self.reschedule()
+
+    def _notify(self, resource, old, new):
+        if self.on_expired is not None:
+            try:
+                self.on_expired(resource, old, new)
+            except Exception as e:
+                print("⚠️ Erreur notification d'expiration:", e)
@@ -1,17 +1,127 @@
 # utils/lock_system.py
-# Système de verrouillage par ressource (ex: "history") avec file d'attente
-from structures.queue import Queue
+# Système de verrouillage par ressource avec file d'attente
+#
+# Ressources hiérarchiques : "history" est le parent de "history:<user_id>".
+# Deux modes :
+#   - "write" (exclusif) : un seul détenteur, personne d'autre ne lit ni n'écrit
+#   - "read"  (partagé)  : plusieurs lecteurs simultanés, aucun écrivain
+# Un lock sur un parent couvre tous ses enfants : verrouiller "history" en écriture
+# bloque tout le monde, "history:42" ne gêne que l'historique de l'utilisateur 42.
+# Chaque nœud compte les locks tenus sous lui (par mode et par utilisateur), si bien
+# que can_read / can_write / acquire ne regardent que la ressource et ses ancêtres :
+# O(profondeur), soit O(1) pour "history:<id>".
+#
+# La file d'attente est une IndexedQueue : "suis-je déjà en file ?" et "à quelle position ?"
+# coûtent O(1) / O(log n) au lieu d'un parcours de la file à chaque !lockhistory.
+# Premier arrivé, premier servi : un nouveau venu passe derrière la file même si le
+# lock est compatible (un écrivain en attente n'est pas doublé par les lecteurs), et une
+# sous-ressource ne double pas un écrivain en attente sur un ancêtre ("history:2" attend
+# derrière "history" demandé en écriture, sinon le lock global n'arriverait jamais).
+# Une libération ne réexamine que les files concernées : la ressource, ses ancêtres et
+# ses descendants en attente (chaque nœud connaît les sous-ressources qui ont une file).
+#
+# Les tables d'un lock sont créées à la demande et un lock redevenu libre est supprimé :
+# la mémoire suit le nombre de locks tenus ou attendus, pas le nombre de ressources vues.
+#
+# Bail (lease) optionnel : un lock expire `lease` secondes après sa prise ou son
+# dernier renouvellement, et passe alors automatiquement au suivant de la file.
+# Les échéances sont rangées dans un MinHeap ; les entrées périmées (lock relâché
+# ou renouvelé depuis) sont ignorées quand elles sortent du tas.
+# L'expiration est déclenchée par utils.lease_scheduler.LeaseScheduler (minuterie
+# asyncio), et vérifiée paresseusement (coût O(1)) à chaque consultation du lock ;
+# dans les deux cas, expire_due() prévient on_expired.
+#
+# acquire_async : au lieu de renvoyer une position et de laisser l'utilisateur réessayer,
+# l'appelant attend sur un Future asyncio, résolu au moment précis où son tour arrive.
+import asyncio
+import time
+
+from structures.queue import IndexedQueue
 from structures.hashtable import HashTable
+from structures.heap import MinHeap
+
+SEPARATOR = ":"
+READ = "read"
+WRITE = "write"
+
+
+def parent_resources(resource: str):
+    """Ancêtres d'une ressource, du plus proche au plus lointain ("a:b:c" -> ["a:b", "a"])."""
+    out = []
+    i = resource.rfind(SEPARATOR)
+    while i > 0:
+        resource = resource[:i]
+        out.append(resource)
+        i = resource.rfind(SEPARATOR)
+    return out
+
+
+def _get(table, key):
+    """table.get(key), une table pas encore créée (None) étant vide."""
+    return table.get(key) if table is not None else None
+
 
 class _Lock:
+    # les tables valent None tant qu'elles sont vides (voir table() et _discard)
+    __slots__ = ("holder", "readers", "n_readers", "queue", "modes", "queued_writers",
+                 "sub_write", "sub_read", "sub_write_by", "sub_read_by", "leases",
+                 "waiting_below")
+
     def __init__(self):
-        self.holder = None       # user_id courant
-        self.queue = Queue()     # file d'attente des user_id
+        self.holder = None       # user_id de l'écrivain courant
+        self.readers = None      # user_id -> True (lecteurs courants)
+        self.n_readers = 0
+        self.queue = None        # IndexedQueue des user_id en attente (FIFO, sans doublons)
+        self.modes = None        # user_id en attente -> mode demandé
+        self.queued_writers = 0  # écrivains dans la file
+        # locks tenus dans les sous-ressources : totaux et par utilisateur
+        self.sub_write = 0
+        self.sub_read = 0
+        self.sub_write_by = None
+        self.sub_read_by = None
+        # bail : user_id -> (échéance, token) ; le token invalide les vieilles échéances
+        self.leases = None
+        # sous-ressources dont la file n'est pas vide -> True
+        self.waiting_below = None
+
+    def table(self, name):
+        """Table `name` du lock, créée au premier besoin."""
+        t = getattr(self, name)
+        if t is None:
+            t = HashTable(size=8)
+            setattr(self, name, t)
+        return t
+
+    def is_free(self):
+        return (self.holder is None and self.n_readers == 0 and self.queue is None
+                and not self.sub_write and not self.sub_read and self.waiting_below is None)
+
+
+def _discard(lk, name, key):
+    """Retire key de la table `name` du lock (libérée si elle se vide). Retourne True si key y était."""
+    table = getattr(lk, name)
+    if table is None or not table.delete(key):
+        return False
+    if len(table) == 0:
+        setattr(lk, name, None)
+    return True
+
 
 class LockSystem:
-    def __init__(self):
+    def __init__(self, table_cls=HashTable, lease=None, clock=time.monotonic):
         # ressource(string) -> _Lock
-        self._locks = HashTable()
+        self._locks = table_cls()
+        self.lease = lease       # durée du bail en secondes (None : le lock n'expire jamais)
+        self.clock = clock
+        self._deadlines = MinHeap()   # (échéance, (ressource, user_id, token))
+        self._token = 0
+        # appelé quand une nouvelle échéance est posée (ex: LeaseScheduler.reschedule)
+        self.on_deadline = None
+        # appelé pour chaque bail expiré, par la minuterie comme par la vérification
+        # paresseuse : on_expired(ressource, ancien_holder, nouveau_holder)
+        self.on_expired = None
+        # (ressource, user_id) -> asyncio.Future des appelants de acquire_async en attente
+        self._futures = table_cls()
 
     def _get_or_create(self, resource: str) -> _Lock:
         lk = self._locks.get(resource)
@@ -20,44 +130,375 @@ class LockSystem:
             self._locks.set(resource, lk)
         return lk
 
+    # -----------------------------
+    # Compatibilité des modes
+    # -----------------------------
+    @staticmethod
+    def _others_read(lk, user_id):
+        return lk.n_readers - (1 if _get(lk.readers, user_id) is not None else 0)
+
+    def _blocked_by_path(self, resource, user_id, mode):
+        """True si la ressource ou un ancêtre est tenu par un autre en mode incompatible."""
+        for key in [resource] + parent_resources(resource):
+            lk = self._locks.get(key)
+            if lk is None:
+                continue
+            if lk.holder is not None and lk.holder != user_id:
+                return True
+            if mode == WRITE and self._others_read(lk, user_id) > 0:
+                return True
+        return False
+
+    def _conflicts(self, resource, user_id, mode):
+        if self._blocked_by_path(resource, user_id, mode):
+            return True
+        lk = self._locks.get(resource)
+        if lk is None:
+            return False
+        # sous-ressources tenues par d'autres
+        others_write = lk.sub_write - (_get(lk.sub_write_by, user_id) or 0)
+        if others_write > 0:
+            return True
+        return mode == WRITE and lk.sub_read - (_get(lk.sub_read_by, user_id) or 0) > 0
+
+    def _writer_waiting_above(self, resource, user_id):
+        """True si un autre écrivain attend un ancêtre (un nouveau venu passe derrière lui)."""
+        for key in parent_resources(resource):
+            lk = self._locks.get(key)
+            if lk is None or not lk.queued_writers:
+                continue
+            own = 1 if _get(lk.modes, user_id) == WRITE else 0
+            if lk.queued_writers - own > 0:
+                return True
+        return False
+
+    def _count_sub(self, resource, user_id, mode, delta):
+        for key in parent_resources(resource):
+            lk = self._get_or_create(key)
+            if mode == WRITE:
+                lk.sub_write += delta
+                name = "sub_write_by"
+            else:
+                lk.sub_read += delta
+                name = "sub_read_by"
+            n = (_get(getattr(lk, name), user_id) or 0) + delta
+            if n:
+                lk.table(name).set(user_id, n)
+            else:
+                _discard(lk, name, user_id)
+
+    def can_read(self, resource: str, user_id):
+        """True si user_id peut lire la ressource maintenant (aucun écrivain étranger sur le chemin)."""
+        self._check_expiry()
+        return not self._blocked_by_path(resource, user_id, READ)
+
+    def can_write(self, resource: str, user_id):
+        """True si user_id peut écrire la ressource maintenant (aucun autre détenteur sur le chemin)."""
+        self._check_expiry()
+        return not self._blocked_by_path(resource, user_id, WRITE)
+
+    # -----------------------------
+    # Attribution / libération
+    # -----------------------------
+    def _grant(self, resource, lk, user_id, mode):
+        if mode == WRITE:
+            lk.holder = user_id
+        else:
+            lk.table("readers").set(user_id, True)
+            lk.n_readers += 1
+        self._count_sub(resource, user_id, mode, +1)
+        self._start_lease(resource, lk, user_id)
+        self._wake(resource, user_id, True)
+
+    def _wake(self, resource, user_id, granted):
+        """Réveille l'appelant de acquire_async qui attend ce lock (s'il y en a un)."""
+        fut = self._futures.get((resource, user_id))
+        if fut is not None:
+            self._futures.delete((resource, user_id))
+            if not fut.done():
+                fut.set_result(granted)
+
+    def _drop(self, resource, lk, user_id):
+        """Retire user_id des détenteurs de la ressource. Retourne False s'il n'en faisait pas partie."""
+        if lk.holder == user_id:
+            lk.holder = None
+            mode = WRITE
+        elif _discard(lk, "readers", user_id):
+            lk.n_readers -= 1
+            mode = READ
+        else:
+            return False
+        _discard(lk, "leases", user_id)
+        self._count_sub(resource, user_id, mode, -1)
+        return True
+
+    # -----------------------------
+    # Files d'attente
+    # -----------------------------
+    def _enqueue(self, resource, lk, user_id, mode):
+        if lk.queue is None:
+            lk.queue = IndexedQueue()
+            for key in parent_resources(resource):
+                self._get_or_create(key).table("waiting_below").set(resource, True)
+        lk.table("modes").set(user_id, mode)
+        if mode == WRITE:
+            lk.queued_writers += 1
+        return lk.queue.enqueue(user_id)
+
+    def _unqueue(self, resource, lk, user_id):
+        """Retire user_id de la file (O(1)). Retourne le mode demandé, ou None s'il n'y était pas."""
+        if lk.queue is None or not lk.queue.remove(user_id):
+            return None
+        mode = lk.modes.get(user_id)
+        _discard(lk, "modes", user_id)
+        if mode == WRITE:
+            lk.queued_writers -= 1
+        if lk.queue.is_empty():
+            lk.queue = None
+            for key in parent_resources(resource):
+                _discard(self._locks.get(key), "waiting_below", resource)
+        return mode
+
+    def _drain(self, resource):
+        """Sert la tête de file tant qu'elle est compatible. Retourne les user_id servis."""
+        lk = self._locks.get(resource)
+        granted = []
+        while lk is not None and lk.queue is not None:
+            user_id = lk.queue.peek()
+            if self._conflicts(resource, user_id, lk.modes.get(user_id)):
+                break
+            mode = self._unqueue(resource, lk, user_id)
+            if mode == WRITE and _get(lk.readers, user_id) is not None:
+                # lecteur qui passe en écriture : il abandonne sa lecture (comme dans acquire)
+                self._drop(resource, lk, user_id)
+            self._grant(resource, lk, user_id, mode)
+            granted.append(user_id)
+            if mode == WRITE:
+                break
+        return granted
+
+    def _drain_related(self, resource):
+        """
+        Après une libération (ou un départ de file) : la ressource, puis ses ancêtres
+        (un parent attend la fin des locks de ses enfants), puis ses descendants en attente
+        (bloqués par ce lock ou par un écrivain qui attendait au-dessus).
+        Les autres files ne peuvent pas être débloquées. Retourne les user_id servis.
+        """
+        granted = self._drain(resource)
+        for key in parent_resources(resource):
+            granted.extend(self._drain(key))
+        lk = self._locks.get(resource)
+        if lk is not None and lk.waiting_below is not None:
+            for key in lk.waiting_below.keys():
+                granted.extend(self._drain(key))
+        self._prune(resource)
+        return granted
+
+    def _prune(self, resource):
+        """Supprime les locks redevenus libres sur le chemin de la ressource."""
+        for key in [resource] + parent_resources(resource):
+            lk = self._locks.get(key)
+            if lk is not None and lk.is_free():
+                self._locks.delete(key)
+
+    # -----------------------------
+    # Bail
+    # -----------------------------
+    def _start_lease(self, resource, lk, user_id):
+        if self.lease is None:
+            return
+        self._token += 1
+        deadline = self.clock() + self.lease
+        lk.table("leases").set(user_id, (deadline, self._token))
+        self._deadlines.push(deadline, (resource, user_id, self._token))
+        if self.on_deadline is not None:
+            self.on_deadline()
+
+    def _is_current(self, resource, user_id, token):
+        lk = self._locks.get(resource)
+        if lk is None:
+            return False
+        lease = _get(lk.leases, user_id)
+        return lease is not None and lease[1] == token
+
+    def next_deadline(self):
+        """Prochaine échéance encore valide (ou None) ; purge les échéances périmées en tête."""
+        while True:
+            top = self._deadlines.peek()
+            if top is None:
+                return None
+            if self._is_current(*top[1]):
+                return top[0]
+            self._deadlines.pop()
+
+    def expire_due(self, now=None):
+        """
+        Fait expirer les baux échus et prévient on_expired pour chacun.
+        Retourne [(ressource, ancien_holder, nouveau_holder)],
+        nouveau_holder = None si personne n'a été servi (lock libéré).
+        """
+        if now is None:
+            now = self.clock()
+        expired = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return expired
+            _, (resource, user_id, _) = self._deadlines.pop()
+            self._drop(resource, self._locks.get(resource), user_id)
+            granted = self._drain_related(resource)
+            event = (resource, user_id, granted[0] if granted else None)
+            expired.append(event)
+            if self.on_expired is not None:
+                self.on_expired(*event)
+
+    def _check_expiry(self):
+        # O(1) tant que rien n'est échu : on ne regarde que la tête du tas
+        top = self._deadlines.peek()
+        if top is not None and top[0] <= self.clock():
+            self.expire_due()
+
+    def renew(self, resource: str, user_id):
+        """Prolonge le bail de user_id (écrivain ou lecteur). Retourne False s'il ne détient pas le lock."""
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        if lk is None or (lk.holder != user_id and _get(lk.readers, user_id) is None):
+            return False
+        self._start_lease(resource, lk, user_id)
+        return True
+
+    def expires_in(self, resource: str, user_id=None):
+        """Secondes restantes avant expiration du bail (de l'écrivain par défaut ; None si pas de bail)."""
+        lk = self._locks.get(resource)
+        if lk is None:
+            return None
+        lease = _get(lk.leases, user_id if user_id is not None else lk.holder)
+        if lease is None:
+            return None
+        return max(0.0, lease[0] - self.clock())
+
+    # -----------------------------
+    # API
+    # -----------------------------
     def status(self, resource: str):
         """Retourne (holder, queue_list)."""
-        lk = self._get_or_create(resource)
-        return lk.holder, lk.queue.to_list()
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        if lk is None:
+            return None, []
+        return lk.holder, lk.queue.to_list() if lk.queue is not None else []
+
+    def holder_of(self, resource: str):
+        """Écrivain actuel de la ressource (ou None), sans copier la file d'attente."""
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        return lk.holder if lk is not None else None
+
+    def readers_of(self, resource: str):
+        """Lecteurs actuels de la ressource."""
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        return lk.readers.keys() if lk is not None and lk.readers is not None else []
+
+    def position_of(self, resource: str, user_id):
+        """Position de user_id dans la file (1 = tête), ou -1 s'il n'y est pas."""
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        if lk is None or lk.queue is None:
+            return -1
+        return lk.queue.position_of(user_id)
 
-    def acquire(self, resource: str, user_id: int):
+    def acquire(self, resource: str, user_id, mode=WRITE):
         """
         Retourne (status, position)
         status ∈ {"acquired","already","queued"}
         position = 0 si acquired/already, sinon position dans la file (1 = tête)
+        mode ∈ {"write","read"} ; "already" renouvelle le bail.
         """
+        if mode not in (READ, WRITE):
+            raise ValueError(f"mode inconnu : {mode!r}")
+        self._check_expiry()
         lk = self._get_or_create(resource)
-        if lk.holder is None:
-            lk.holder = user_id
-            return "acquired", 0
-        if lk.holder == user_id:
+        if lk.holder == user_id or (mode == READ and _get(lk.readers, user_id) is not None):
+            self._start_lease(resource, lk, user_id)
             return "already", 0
 
         # déjà dans la queue ?
-        pos = lk.queue.position_of(user_id)
-        if pos == -1:
-            lk.queue.enqueue(user_id)
-            pos = len(lk.queue)
-        return "queued", pos
+        pos = lk.queue.position_of(user_id) if lk.queue is not None else -1
+        if pos != -1:
+            return "queued", pos
+        if (lk.queue is None and not self._conflicts(resource, user_id, mode)
+                and not self._writer_waiting_above(resource, user_id)):
+            if _get(lk.readers, user_id) is not None:
+                # lecteur qui passe en écriture : il abandonne sa lecture
+                self._drop(resource, lk, user_id)
+            self._grant(resource, lk, user_id, mode)
+            return "acquired", 0
+        return "queued", self._enqueue(resource, lk, user_id, mode)
 
-    def release(self, resource: str, user_id: int):
+    def leave(self, resource: str, user_id):
+        """Retire user_id de la file d'attente (O(1)). Retourne False s'il n'y était pas."""
+        lk = self._locks.get(resource)
+        if lk is None or self._unqueue(resource, lk, user_id) is None:
+            return False
+        self._wake(resource, user_id, False)
+        # un écrivain qui part peut débloquer les lecteurs derrière lui (et les sous-ressources)
+        self._drain_related(resource)
+        return True
+
+    async def acquire_async(self, resource: str, user_id, mode=WRITE, timeout=None):
+        """
+        Comme acquire, mais attend son tour sans réessayer : l'appelant est réveillé
+        par la libération (ou l'expiration) qui lui passe le lock.
+        Retourne "acquired", "already", "timeout" (retiré de la file après `timeout`
+        secondes) ou "left" (a quitté la file entre-temps, ex: !unlockhistory).
+        Seul "acquired" donne un lock que l'appelant doit relâcher. Si user_id était déjà
+        en file (ex: !lockhistory), on attend sa place sans se l'approprier : servi, on
+        renvoie "already" ; au timeout ou à l'annulation, sa place reste dans la file.
         """
-        Libère le lock si user_id est le holder.
+        joined = self.position_of(resource, user_id) != -1
+        status, _ = self.acquire(resource, user_id, mode)
+        if status != "queued":
+            return status
+        key = (resource, user_id)
+        fut = self._futures.get(key)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._futures.set(key, fut)
+        try:
+            # shield : un timeout n'annule pas le Future partagé
+            granted = await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and fut.result():
+                # servi au moment même du timeout
+                return "already" if joined else "acquired"
+            if not joined:
+                self.leave(resource, user_id)
+            return "timeout"
+        except asyncio.CancelledError:
+            if joined:
+                raise
+            if fut.done() and fut.result():
+                self.release(resource, user_id)
+            else:
+                self.leave(resource, user_id)
+            raise
+        if not granted:
+            return "left"
+        return "already" if joined else "acquired"
+
+    def release(self, resource: str, user_id):
+        """
+        Libère le lock (écriture ou lecture) tenu par user_id.
         Retourne (ok, info, next_id)
         info ∈ {"not_holder","released","transferred"}
+        next_id = premier utilisateur servi grâce à cette libération
         """
-        lk = self._get_or_create(resource)
-        if lk.holder != user_id:
+        self._check_expiry()
+        lk = self._locks.get(resource)
+        if lk is None or not self._drop(resource, lk, user_id):
             return False, "not_holder", None
-
-        if lk.queue.is_empty():
-            lk.holder = None
+        granted = self._drain_related(resource)
+        if not granted:
             return True, "released", None
-        next_id = lk.queue.dequeue()
-        lk.holder = next_id
-        return True, "transferred", next_id
+        return True, "transferred", granted[0]
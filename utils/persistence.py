@@ -1,19 +1,64 @@
 # utils/persistence.py
 # Sauvegarde / chargement JSON simple
+# Les écritures sont atomiques : fichier temporaire + fsync + rename (+ fsync du dossier),
+# un arrêt brutal pendant la sauvegarde ne peut donc pas tronquer le fichier.
 
 import json
 import os
+import tempfile
 
 def ensure_parent_dir(path: str):
     parent = os.path.dirname(path)
     if parent and not os.path.exists(parent):
         os.makedirs(parent, exist_ok=True)
 
+DEFAULT_FILE_MODE = 0o644
+
+def _fsync_dir(directory: str):
+    """Rend le rename durable (entrée de dossier écrite sur disque) ; sans effet hors POSIX."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def replace_file(tmp: str, path: str):
+    """
+    Remplace path par le fichier temporaire tmp (même dossier), de façon durable.
+    mkstemp crée le temporaire en 0600 : il reprend d'abord les droits de l'ancien
+    fichier (0644 s'il n'existait pas).
+    """
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = DEFAULT_FILE_MODE
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path) or ".")
+
+def atomic_write_text(path: str, text: str):
+    """Écrit un texte dans path de façon atomique (temp + fsync + rename)."""
+    ensure_parent_dir(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
 def save_json(path: str, data: dict):
     """Sauvegarde un dict en JSON (avec création auto du dossier)."""
-    ensure_parent_dir(path)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    atomic_write_text(path, json.dumps(data, indent=2, ensure_ascii=False))
 
 def load_json(path: str) -> dict:
     """Charge un dict depuis un fichier JSON (retourne {} si absent)."""
@@ -22,3 +67,21 @@ def load_json(path: str) -> dict:
             return json.load(f)
     except FileNotFoundError:
         return {}
+
+def apply_delta(store: dict, delta: dict) -> int:
+    """Fusionne un delta {clé: valeur | None} dans store (None = suppression). Retourne le nb de clés."""
+    for k, v in delta.items():
+        if v is None:
+            store.pop(k, None)
+        else:
+            store[k] = v
+    return len(delta)
+
+def save_delta_json(path: str, delta: dict) -> int:
+    """Fusionne un delta dans le fichier JSON existant. Retourne le nombre d'utilisateurs écrits."""
+    if not delta:
+        return 0
+    store = load_json(path)
+    count = apply_delta(store, delta)
+    save_json(path, store)
+    return count
@@ -0,0 +1,216 @@
+# utils/sharded_store.py
+# Stockage sur disque découpé en N fichiers ("shards") selon le hash de l'user_id
+# - le shard d'un utilisateur = hash_key(user_id) % N (même hash que HashTable)
+# - une sauvegarde ne réécrit que les shards qui contiennent des utilisateurs modifiés
+# - au démarrage, les shards sont chargés en parallèle (pool de threads)
+#
+# ShardedJsonStore           -> données {user_id: valeur} (ex: conversations)
+# ShardedBinarySnapshotStore -> snapshots binaires de l'historique (store pour HistoryLog)
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from structures.hashtable import hash_key
+from utils.persistence import load_json, save_json, save_delta_json
+from utils.binary_snapshot import (BinarySnapshotStore, current_snapshot_path, open_snapshot,
+                                   remove_stale_snapshots, snapshot_files)
+
+
+def _parse_user_id(k):
+    try:
+        return int(k)
+    except (TypeError, ValueError):
+        return k
+
+
+def shard_of(user_id, n_shards):
+    """Indice du shard d'un utilisateur (clé int ou str JSON, même résultat)."""
+    return hash_key(_parse_user_id(user_id)) % n_shards
+
+
+def split_by_shard(data: dict, n_shards):
+    """Répartit un dict {user_id: valeur} en {indice_shard: sous-dict}."""
+    parts = {}
+    for k, v in data.items():
+        parts.setdefault(shard_of(k, n_shards), {})[k] = v
+    return parts
+
+
+class ShardedJsonStore:
+    def __init__(self, directory: str, prefix: str, n_shards=16, max_workers=8):
+        self.directory = directory
+        self.prefix = prefix
+        self.n_shards = n_shards
+        self.max_workers = max_workers
+
+    def shard_path(self, i):
+        return os.path.join(self.directory, f"{self.prefix}_{i:03d}.json")
+
+    def exists(self):
+        return any(os.path.exists(self.shard_path(i)) for i in range(self.n_shards))
+
+    def load_all(self) -> dict:
+        """Charge tous les shards en parallèle et retourne le dict fusionné."""
+        out = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for part in pool.map(load_json, [self.shard_path(i) for i in range(self.n_shards)]):
+                out.update(part)
+        return out
+
+    def load_user(self, user_id):
+        """Valeur sauvegardée d'un seul utilisateur (lit uniquement son shard), ou None."""
+        return load_json(self.shard_path(shard_of(user_id, self.n_shards))).get(str(user_id))
+
+    def save_delta(self, delta: dict):
+        """
+        Fusionne un delta ({user_id: valeur | None}) dans les seuls shards concernés.
+        Retourne (utilisateurs écrits, shards réécrits).
+        """
+        parts = split_by_shard(delta, self.n_shards)
+        users = 0
+        for i, part in parts.items():
+            users += save_delta_json(self.shard_path(i), part)
+        return users, len(parts)
+
+    def save_all(self, data: dict):
+        """Réécrit tous les shards à partir d'un dict complet (migration)."""
+        parts = split_by_shard(data, self.n_shards)
+        for i in range(self.n_shards):
+            save_json(self.shard_path(i), parts.get(i, {}))
+        return len(data)
+
+
+class ShardedSnapshotView:
+    """Vue unique sur N snapshots binaires (même interface que BinarySnapshot, pour attach_snapshot)."""
+
+    def __init__(self, snapshots, n_shards):
+        self._snapshots = snapshots      # liste indexée par shard (None si absent)
+        self._n = n_shards
+
+    def _snap(self, key):
+        return self._snapshots[shard_of(key, self._n)]
+
+    def __contains__(self, key):
+        snap = self._snap(key)
+        return snap is not None and key in snap
+
+    def __len__(self):
+        return sum(len(s) for s in self._snapshots if s is not None)
+
+    def keys(self):
+        out = []
+        for snap in self._snapshots:
+            if snap is not None:
+                out.extend(snap.keys())
+        return out
+
+    def count(self, key):
+        snap = self._snap(key)
+        return snap.count(key) if snap is not None else 0
+
+    def read_raw(self, key):
+        snap = self._snap(key)
+        return snap.read_raw(key) if snap is not None else None
+
+    def read(self, key):
+        snap = self._snap(key)
+        return snap.read(key) if snap is not None else None
+
+    def read_entries(self, key):
+        snap = self._snap(key)
+        return snap.read_entries(key) if snap is not None else None
+
+    def replace(self, i, snap):
+        """Remplace le snapshot du shard i (après réécriture) et ferme l'ancien (le fichier reste)."""
+        old, self._snapshots[i] = self._snapshots[i], snap
+        if old is not None:
+            old.close()
+
+    def close(self):
+        for snap in self._snapshots:
+            if snap is not None:
+                snap.close()
+
+
+class ShardedBinarySnapshotStore:
+    """
+    Store de snapshot pour utils.history_log.HistoryLog, découpé en N fichiers binaires.
+    Chaque shard mémorise son propre numéro de séquence : à la relecture du journal,
+    un enregistrement est ignoré s'il est déjà inclus dans le shard de son utilisateur.
+    """
+
+    def __init__(self, directory: str, prefix: str, n_shards=16, max_workers=8):
+        self.directory = directory
+        self.prefix = prefix
+        self.n_shards = n_shards
+        self.max_workers = max_workers
+        self._seqs = [0] * n_shards
+        self._manager = None     # manager auquel la vue est attachée (load)
+        self._view = None
+        self._fresh = {}         # shard -> snapshot réécrit, pas encore rebranché
+
+    def shard_path(self, i):
+        return os.path.join(self.directory, f"{self.prefix}_{i:03d}.bin")
+
+    def current_path(self, i):
+        """Fichier de la génération la plus récente du shard i (voir utils.binary_snapshot)."""
+        return current_snapshot_path(self.shard_path(i))
+
+    def exists(self):
+        return any(snapshot_files(self.shard_path(i)) for i in range(self.n_shards))
+
+    def _open_shard(self, i):
+        current = self.current_path(i)
+        remove_stale_snapshots(self.shard_path(i), current)
+        return open_snapshot(current)
+
+    def load(self, manager):
+        """Ouvre les shards en parallèle (lecture des index) et les attache au manager."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            snapshots = list(pool.map(self._open_shard, range(self.n_shards)))
+        self._seqs = [s.seq if s is not None else 0 for s in snapshots]
+        self._manager = manager
+        self._view = ShardedSnapshotView(snapshots, self.n_shards)
+        manager.attach_snapshot(self._view)
+        return max(self._seqs)
+
+    def seq_for(self, user_id):
+        """Dernier numéro de séquence inclus dans le shard de cet utilisateur."""
+        return self._seqs[shard_of(user_id, self.n_shards)]
+
+    def write(self, data: dict, seq: int, delta=False):
+        """Réécrit seulement les shards touchés (tous si delta=False), en parallèle."""
+        parts = split_by_shard(data, self.n_shards)
+        if not delta:
+            for i in range(self.n_shards):
+                parts.setdefault(i, {})
+
+        def write_one(i):
+            store = BinarySnapshotStore(self.shard_path(i))
+            store.write(parts[i], seq, delta=delta)
+            self._seqs[i] = seq
+            if self._view is not None:
+                # index du shard réécrit lu ici, hors de la boucle ; branché par reattach()
+                return i, open_snapshot(store.current_path())
+            return i, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for i, snap in pool.map(write_one, list(parts)):
+                if snap is not None:
+                    stale = self._fresh.pop(i, None)
+                    if stale is not None:
+                        stale.close()
+                    self._fresh[i] = snap
+        return len(data)
+
+    def reattach(self):
+        """Sur la boucle : branche les shards réécrits et ferme les anciens. Retourne True si changé."""
+        fresh, self._fresh = self._fresh, {}
+        if not fresh:
+            return False
+        for i, snap in fresh.items():
+            self._view.replace(i, snap)
+            # ancien fichier fermé : il peut enfin être supprimé (Windows)
+            remove_stale_snapshots(self.shard_path(i), snap.path)
+        self._manager.attach_snapshot(self._view)
+        return True